@@ -1,13 +1,20 @@
+import asyncio
 import os
+from concurrent.futures import Executor
 from pathlib import Path
 from typing import Optional, Self
 
 from metadock import exceptions
+from metadock.cache import MetadockCachePruneResult, MetadockCacheTierStats
 from metadock.engine import (
+    MetadockBuildPlan,
+    MetadockContextMemoryReport,
     MetadockProject,
     MetadockProjectBuildResult,
     MetadockProjectValidationResult,
+    MetadockShardManifest,
 )
+from metadock.watch import MetadockWatcher
 
 
 class Metadock:
@@ -33,12 +40,33 @@ class Metadock:
 
         return cls(working_directory)
 
-    def __init__(self, working_directory: Path | str = Path.cwd()):
+    def __init__(
+        self,
+        working_directory: Path | str = Path.cwd(),
+        persist_fragments: bool = False,
+        compact_contexts: bool = False,
+        executor: Optional[Executor] = None,
+        cache_dir: Optional[Path | str] = None,
+        cache_max_size: Optional[int] = None,
+        cache_max_age: Optional[float] = None,
+    ):
         """Instantiate a new Metadock instance in `working_directory`, or the current working directory. Expects there
         to exist a `.metadock` directory in `working_directory.`
 
         Args:
             working_directory (Path | str, optional): Location to parse metadock project. Defaults to Path.cwd().
+            persist_fragments (bool, optional): Whether to persist the fragments rendered by `{% cache %}` blocks
+                between builds. Defaults to False.
+            compact_contexts (bool, optional): Whether to store the contexts of content schematics compactly, with
+                tuples in place of lists. Defaults to False.
+            executor (Optional[Executor], optional): Executor in which to parse content schematics files concurrently.
+                Defaults to None (parse them one after another).
+            cache_dir (Optional[Path | str], optional): Directory of a render cache shared between builds, from which
+                documents whose inputs are unchanged are copied instead of rendered. Defaults to None.
+            cache_max_size (Optional[int], optional): Size cap in bytes of the .metadock/.cache store, beyond which
+                builds evict the least recently used entries. Defaults to None (no cap).
+            cache_max_age (Optional[float], optional): Seconds after which builds evict unused entries of the
+                .metadock/.cache store. Defaults to None.
         """
         working_directory = Path(working_directory)
         metadock_directory = working_directory / ".metadock"
@@ -49,7 +77,15 @@ class Metadock:
         self.working_directory = working_directory
         self.metadock_directory = metadock_directory
 
-        self.project = MetadockProject(self.metadock_directory)
+        self.project = MetadockProject(
+            self.metadock_directory,
+            persist_fragments=persist_fragments,
+            compact_contexts=compact_contexts,
+            executor=executor,
+            render_cache_directory=cache_dir,
+            cache_max_size=cache_max_size,
+            cache_max_age=cache_max_age,
+        )
 
     def validate(self) -> MetadockProjectValidationResult:
         return self.project.validate()
@@ -57,10 +93,176 @@ class Metadock:
     def clean(self):
         return self.project.clean()
 
-    def build(self, schematic_globs: list[str] = [], template_globs: list[str] = []) -> MetadockProjectBuildResult:
-        return self.project.build(self.list(schematic_globs, template_globs))
+    def compile(self) -> list[str]:
+        return self.project.compile()
 
-    def list(self, schematic_globs: list[str] = [], template_globs: list[str] = []) -> list[str]:
+    def build(
+        self,
+        schematic_globs: list[str] = [],
+        template_globs: list[str] = [],
+        write: bool = True,
+        shard: Optional[tuple[int, int]] = None,
+        since: Optional[str] = None,
+    ) -> MetadockProjectBuildResult:
+        """Build the documents of the selected content schematics.
+
+        Args:
+            schematic_globs (list[str], optional): Schematic name glob(s) to build. Defaults to all schematics.
+            template_globs (list[str], optional): Template glob(s) to build. Defaults to all schematics.
+            write (bool, optional): Whether to write new and updated documents. Defaults to True.
+            shard (Optional[tuple[int, int]], optional): Only build shard `i` of `N` of the selected schematics, given
+                as `(i, N)`, and write the shard's manifest for `merge_shards` (if `write` is set). Defaults to None.
+            since (Optional[str], optional): Only build the selected schematics which are affected by the files changed
+                since this git revision, e.g. `origin/main`. Defaults to None.
+
+        Returns:
+            MetadockProjectBuildResult: The build result.
+        """
+        schematics = self.list(schematic_globs, template_globs, since)
+        if shard is None:
+            return self.project.build(schematics, write=write)
+
+        schematics = self.project.shard(schematics, *shard)
+        build_result = self.project.build(schematics, write=write)
+        if write:
+            self.project.write_shard_manifest(build_result, schematics, *shard)
+        return build_result
+
+    def plan(
+        self,
+        schematic_globs: list[str] = [],
+        template_globs: list[str] = [],
+        shard: Optional[tuple[int, int]] = None,
+        since: Optional[str] = None,
+    ) -> MetadockBuildPlan:
+        """Plan a build of the selected content schematics without writing any document, telling whether each document
+        would be new, updated or unchanged, and why. Documents which are unchanged since the last build are skipped
+        without rendering them.
+
+        Args:
+            schematic_globs (list[str], optional): Schematic name glob(s) to plan. Defaults to all schematics.
+            template_globs (list[str], optional): Template glob(s) to plan. Defaults to all schematics.
+            shard (Optional[tuple[int, int]], optional): Only plan shard `i` of `N` of the selected schematics, given
+                as `(i, N)`. Defaults to None.
+            since (Optional[str], optional): Only plan the selected schematics which are affected by the files changed
+                since this git revision. Defaults to None.
+
+        Returns:
+            MetadockBuildPlan: The build plan.
+        """
+        schematics = self.list(schematic_globs, template_globs, since)
+        if shard is not None:
+            schematics = self.project.shard(schematics, *shard)
+        return self.project.plan(schematics)
+
+    def merge_shards(self, manifest_paths: list[Path | str]) -> MetadockShardManifest:
+        """Merge the manifests written by every shard of a sharded build, once their generated documents have been
+        gathered into the generated_documents directory.
+
+        Args:
+            manifest_paths (list[Path | str]): Paths to the manifests of the shards.
+
+        Returns:
+            MetadockShardManifest: The merged manifest.
+        """
+        return self.project.merge_shard_manifests(manifest_paths)
+
+    def cache_stats(self) -> list[MetadockCacheTierStats]:
+        """Report the size, hits and misses of each tier of the project's cache.
+
+        Returns:
+            list[MetadockCacheTierStats]: The stats of each tier.
+        """
+        return self.project.cache_stats()
+
+    def prune_cache(self, max_size: Optional[int] = None, max_age: Optional[float] = None) -> MetadockCachePruneResult:
+        """Evict the least recently used entries of the project's cache until it is within its limits.
+
+        Args:
+            max_size (Optional[int], optional): Size cap of the cache in bytes. Defaults to `cache_max_size`.
+            max_age (Optional[float], optional): Seconds after which unused entries are evicted. Defaults to
+                `cache_max_age`.
+
+        Returns:
+            MetadockCachePruneResult: Summary of the evicted entries.
+        """
+        return self.project.prune_cache(max_size, max_age)
+
+    def clear_cache(self, tier_names: Optional[list[str]] = None):
+        """Evict every entry of some tiers of the project's cache.
+
+        Args:
+            tier_names (Optional[list[str]], optional): Names of the tiers to clear. Defaults to all tiers.
+        """
+        self.project.clear_cache(tier_names)
+
+    def render(self, schematic_name: str, target_format: Optional[str] = None) -> dict[str, str | bytes]:
+        return self.project.render(schematic_name, target_format)
+
+    async def abuild(
+        self, schematic_globs: list[str] = [], template_globs: list[str] = [], write: bool = True
+    ) -> MetadockProjectBuildResult:
+        schematics = await asyncio.to_thread(self.list, schematic_globs, template_globs)
+        return await self.project.abuild(schematics, write=write)
+
+    async def arender(self, schematic_name: str, target_format: Optional[str] = None) -> dict[str, str | bytes]:
+        return await self.project.arender(schematic_name, target_format)
+
+    def watch(
+        self,
+        schematic_globs: list[str] = [],
+        template_globs: list[str] = [],
+        interval: float = 0.5,
+        debounce: float = 0.2,
+    ):
+        """Watch the project for changes, rebuilding the documents affected by each change until interrupted.
+
+        Args:
+            schematic_globs (list[str], optional): Schematic name glob(s) to rebuild. Defaults to all schematics.
+            template_globs (list[str], optional): Template glob(s) to rebuild. Defaults to all schematics.
+            interval (float, optional): Seconds between polls of the project files. Defaults to 0.5.
+            debounce (float, optional): Seconds the project files must remain unchanged before rebuilding. Defaults
+                to 0.2.
+        """
+        MetadockWatcher(self.project, schematic_globs, template_globs, interval, debounce).run()
+
+    def refresh(self) -> list[str]:
+        """Bring the project up to date with the files on disk, re-parsing only what has changed.
+
+        Returns:
+            list[str]: Names of the content schematics affected by the changes.
+        """
+        return self.project.refresh()
+
+    def memory_report(self) -> MetadockContextMemoryReport:
+        """Measure the memory held by the contexts of the project's content schematics.
+
+        Returns:
+            MetadockContextMemoryReport: The memory report.
+        """
+        return self.project.memory_report()
+
+    def list(
+        self, schematic_globs: list[str] = [], template_globs: list[str] = [], since: Optional[str] = None
+    ) -> list[str]:
+        """List the content schematics selected by name and template globs, or every content schematic if there are
+        no globs.
+
+        Args:
+            schematic_globs (list[str], optional): Schematic name glob(s) to select. Defaults to [].
+            template_globs (list[str], optional): Template glob(s) to select. Defaults to [].
+            since (Optional[str], optional): Only list the selected schematics which are affected by the files changed
+                since this git revision, e.g. `origin/main`, according to the git repository containing the project.
+                Defaults to None.
+
+        Returns:
+            list[str]: Names of the selected content schematics.
+        """
         if schematic_globs or template_globs:
-            return self.project.list(schematic_globs, template_globs)
-        return list(self.project.content_schematics.keys())
+            schematics = self.project.list(schematic_globs, template_globs)
+        else:
+            schematics = list(self.project.content_schematics.keys())
+        if since is not None:
+            affected = set(self.project.affected_since(since))
+            schematics = [schematic for schematic in schematics if schematic in affected]
+        return schematics
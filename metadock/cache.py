@@ -0,0 +1,423 @@
+import contextlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Iterable, Iterator, NamedTuple, Optional
+
+import pydantic
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover (Windows)
+    fcntl = None
+
+
+def write_atomically(path: Path, content: bytes):
+    """Writes a file through a hidden temporary file in the same directory, which is then moved into place, so that
+    concurrent readers never see a partially written file.
+
+    Args:
+        path (Path): Path to the file.
+        content (bytes): Content of the file.
+
+    Raises:
+        OSError: If the file cannot be written.
+    """
+    os.makedirs(path.parent, exist_ok=True)
+    with tempfile.NamedTemporaryFile("wb", dir=path.parent, prefix=".tmp-", delete=False) as handle:
+        handle.write(content)
+    os.replace(handle.name, path)
+
+
+class MetadockCacheEntry(NamedTuple):
+    """A file held by a cache tier, as found by `MetadockCacheTier.entries`."""
+
+    path: Path
+    size: int
+    last_used: float
+
+
+class MetadockCacheTierStats(pydantic.BaseModel):
+    """Size and usage of one tier of a cache store.
+
+    Attributes:
+        name (str): Name of the tier.
+        entries (int): Number of entries held by the tier.
+        size (int): Total size of the tier's entries, in bytes.
+        hits (int): Number of lookups which found an entry, over every run since the cache was last cleared.
+        misses (int): Number of lookups which found no entry, over every run since the cache was last cleared.
+    """
+
+    name: str
+    entries: int = 0
+    size: int = 0
+    hits: int = 0
+    misses: int = 0
+
+    @property
+    def hit_rate(self) -> Optional[float]:
+        """Fraction of the tier's lookups which found an entry, or None if there were no lookups."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else None
+
+
+class MetadockCachePruneResult(pydantic.BaseModel):
+    """Summary of the entries evicted from a cache store by `MetadockCacheStore.prune`.
+
+    Attributes:
+        evicted_entries (int): Number of entries evicted.
+        evicted_size (int): Total size of the evicted entries, in bytes.
+        remaining_size (int): Total size of the entries left in the cache, in bytes.
+    """
+
+    evicted_entries: int = 0
+    evicted_size: int = 0
+    remaining_size: int = 0
+
+
+class MetadockCacheTier:
+    """One tier of a cache store: a directory of entries keyed by relative path. Entries are written atomically, so
+    concurrent runs never read a partially written entry, and reads and writes of entries evicted by a concurrent run
+    are treated as misses. The modification time of an entry is bumped whenever it is used, so that `prune` can evict
+    the least recently used entries first.
+
+    Attributes:
+        name (str): Name of the tier.
+        directory (Path): Directory holding the tier's entries.
+        fan_out (bool): Whether entries are fanned out into subdirectories by the first two characters of their key.
+        pinned (frozenset[str]): Keys of entries which are never evicted by `prune`, e.g. a manifest.
+        hits (int): Number of lookups which found an entry, since the tier's usage was last recorded.
+        misses (int): Number of lookups which found no entry, since the tier's usage was last recorded.
+    """
+
+    name: str
+    directory: Path
+    fan_out: bool
+    pinned: frozenset[str]
+    hits: int
+    misses: int
+
+    def __init__(self, name: str, directory: Path, fan_out: bool = False, pinned: Iterable[str] = ()):
+        """Open a cache tier, creating its directory when the first entry is added.
+
+        Args:
+            name (str): Name of the tier.
+            directory (Path): Directory holding the tier's entries.
+            fan_out (bool, optional): Whether to fan entries out into subdirectories by the first two characters of
+                their key, to keep directories small. Defaults to False.
+            pinned (Iterable[str], optional): Keys of entries which are never evicted by `prune`. Defaults to none.
+        """
+        self.name = name
+        self.directory = directory
+        self.fan_out = fan_out
+        self.pinned = frozenset(pinned)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def path(self, key: str) -> Path:
+        """Path of an entry.
+
+        Args:
+            key (str): Key of the entry.
+
+        Returns:
+            Path: Path to the entry, whether or not it exists.
+        """
+        return self.directory / key[:2] / key if self.fan_out else self.directory / key
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Reads an entry, recording a hit or a miss.
+
+        Args:
+            key (str): Key of the entry.
+
+        Returns:
+            Optional[bytes]: Content of the entry, or None if the tier doesn't hold it.
+        """
+        try:
+            content = self.path(key).read_bytes()
+        except OSError:
+            self.record(hit=False)
+            return None
+        self.record(hit=True)
+        self.touch(key)
+        return content
+
+    def set(self, key: str, content: bytes):
+        """Adds or replaces an entry. Failures to write the entry (e.g. a full disk or a read-only checkout) are
+        ignored.
+
+        Args:
+            key (str): Key of the entry.
+            content (bytes): Content of the entry.
+        """
+        try:
+            # The hidden temporary file is skipped by `entries` until it is moved into place.
+            write_atomically(self.path(key), content)
+        except OSError:
+            pass
+
+    def touch(self, key: str):
+        """Marks an entry as just used, so that `prune` evicts it last.
+
+        Args:
+            key (str): Key of the entry.
+        """
+        try:
+            os.utime(self.path(key))
+        except OSError:
+            pass
+
+    def record(self, hit: bool):
+        """Records a lookup of the tier which was answered elsewhere, e.g. from a loader reading the entry itself.
+
+        Args:
+            hit (bool): Whether the lookup found an entry.
+        """
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def take_usage(self) -> tuple[int, int]:
+        """Returns the hits and misses recorded since the last call, resetting them.
+
+        Returns:
+            tuple[int, int]: Number of hits and misses.
+        """
+        with self._lock:
+            usage = (self.hits, self.misses)
+            self.hits = self.misses = 0
+        return usage
+
+    def entries(self) -> list[MetadockCacheEntry]:
+        """Lists the entries held by the tier, skipping temporary files which are still being written.
+
+        Returns:
+            list[MetadockCacheEntry]: The entries of the tier.
+        """
+        entries = []
+        for dirpath, dirnames, filenames in os.walk(self.directory):
+            dirnames[:] = [dirname for dirname in dirnames if not dirname.startswith(".")]
+            for filename in filenames:
+                if filename.startswith("."):
+                    continue
+                path = Path(dirpath) / filename
+                try:
+                    stat_result = path.stat()
+                except OSError:
+                    continue
+                entries.append(MetadockCacheEntry(path, stat_result.st_size, stat_result.st_mtime))
+        return entries
+
+    def evictable(self, entry: MetadockCacheEntry) -> bool:
+        """Whether `prune` may evict an entry of the tier.
+
+        Args:
+            entry (MetadockCacheEntry): An entry of the tier.
+
+        Returns:
+            bool: False if the entry is pinned, True otherwise.
+        """
+        return entry.path.relative_to(self.directory).as_posix() not in self.pinned
+
+    def clear(self):
+        """Evicts every entry of the tier, including pinned ones."""
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class MetadockCacheStore:
+    """The cache of a Metadock project, under .metadock/.cache, divided into tiers:
+
+    - `templates`: templates precompiled by `metadock compile`.
+    - `schematics`: snapshots of parsed content schematics files.
+    - `fragments`: fragments rendered by `{% cache %}` blocks (with `persist_fragments`).
+    - `renders`: documents rendered by `build` (with a render cache directory, which may be shared between builds).
+
+    Every tier may be evicted at any time, since its entries are regenerated when they are missed. `prune` keeps the
+    cache within a size cap by evicting the least recently used entries across all tiers, along with any entry unused
+    for longer than a maximum age. Hits and misses are accumulated over runs in a stats file, so that `stats` reports
+    each tier's hit rate. Updates of the stats file are serialized with a lock file where the platform supports it.
+
+    Attributes:
+        directory (Path): Directory of the cache store.
+        tiers (dict[str, MetadockCacheTier]): Tiers of the cache, keyed by name.
+        max_size (Optional[int]): Size cap of the cache in bytes, applied by `prune`, or None for no cap.
+        max_age (Optional[float]): Seconds after which unused entries are evicted by `prune`, or None to keep them.
+    """
+
+    tier_names: tuple[str, ...] = ("templates", "schematics", "fragments", "renders")
+    stats_filename: str = "stats.json"
+    lock_filename: str = ".lock"
+
+    directory: Path
+    tiers: dict[str, MetadockCacheTier]
+    max_size: Optional[int]
+    max_age: Optional[float]
+
+    def __init__(
+        self,
+        directory: Path,
+        max_size: Optional[int] = None,
+        max_age: Optional[float] = None,
+        renders_directory: Optional[Path] = None,
+    ):
+        """Open the cache store in a directory, creating it when the first entry is added.
+
+        Args:
+            directory (Path): Directory of the cache store.
+            max_size (Optional[int], optional): Size cap of the cache in bytes. Defaults to None (no cap).
+            max_age (Optional[float], optional): Seconds after which unused entries are evicted. Defaults to None.
+            renders_directory (Optional[Path], optional): Directory of the `renders` tier, e.g. one shared between CI
+                jobs. Defaults to None (the `renders` directory of the store).
+        """
+        self.directory = directory
+        self.max_size = max_size
+        self.max_age = max_age
+        self.tiers = {
+            "templates": MetadockCacheTier("templates", directory / "templates", pinned=["manifest.json"]),
+            "schematics": MetadockCacheTier("schematics", directory / "schematics"),
+            "fragments": MetadockCacheTier("fragments", directory / "fragments", fan_out=True),
+            "renders": MetadockCacheTier("renders", renders_directory or directory / "renders", fan_out=True),
+        }
+
+    def __getitem__(self, tier_name: str) -> MetadockCacheTier:
+        return self.tiers[tier_name]
+
+    def stats(self) -> list[MetadockCacheTierStats]:
+        """Measures the size of every tier, along with its hits and misses over every recorded run and the current one.
+
+        Returns:
+            list[MetadockCacheTierStats]: The stats of each tier.
+        """
+        recorded_usage = self._read_usage()
+        tier_stats = []
+        for tier in self.tiers.values():
+            entries = tier.entries()
+            recorded_hits, recorded_misses = recorded_usage.get(tier.name, (0, 0))
+            tier_stats.append(
+                MetadockCacheTierStats(
+                    name=tier.name,
+                    entries=len(entries),
+                    size=sum(entry.size for entry in entries),
+                    hits=recorded_hits + tier.hits,
+                    misses=recorded_misses + tier.misses,
+                )
+            )
+        return tier_stats
+
+    def record_usage(self):
+        """Adds the hits and misses of every tier since they were last recorded to the stats file. Failures to write the
+        stats file (e.g. in a read-only checkout) are ignored."""
+        usage = {tier.name: tier.take_usage() for tier in self.tiers.values()}
+        if not any(hits or misses for hits, misses in usage.values()):
+            return
+        try:
+            with self.locked():
+                recorded_usage = self._read_usage()
+                for tier_name, (hits, misses) in usage.items():
+                    recorded_hits, recorded_misses = recorded_usage.get(tier_name, (0, 0))
+                    recorded_usage[tier_name] = (recorded_hits + hits, recorded_misses + misses)
+                self._write_usage(recorded_usage)
+        except OSError:
+            pass
+
+    def prune(self, max_size: Optional[int] = None, max_age: Optional[float] = None) -> MetadockCachePruneResult:
+        """Evicts the entries unused for longer than the maximum age, and then the least recently used entries of all
+        tiers until the cache fits within its size cap. Pinned entries are never evicted, but count towards the cap.
+
+        Args:
+            max_size (Optional[int], optional): Size cap of the cache in bytes. Defaults to the store's `max_size`.
+            max_age (Optional[float], optional): Seconds after which unused entries are evicted. Defaults to the
+                store's `max_age`.
+
+        Returns:
+            MetadockCachePruneResult: Summary of the evicted entries.
+        """
+        max_size = self.max_size if max_size is None else max_size
+        max_age = self.max_age if max_age is None else max_age
+
+        entries = [(tier, entry) for tier in self.tiers.values() for entry in tier.entries()]
+        result = MetadockCachePruneResult(remaining_size=sum(entry.size for _, entry in entries))
+        oldest_kept = time.time() - max_age if max_age is not None else None
+        for tier, entry in sorted(entries, key=lambda tier_entry: tier_entry[1].last_used):
+            if not tier.evictable(entry):
+                continue
+            expired = oldest_kept is not None and entry.last_used < oldest_kept
+            oversized = max_size is not None and result.remaining_size > max_size
+            if not (expired or oversized):
+                break
+            self._evict(tier, entry)
+            result.evicted_entries += 1
+            result.evicted_size += entry.size
+            result.remaining_size -= entry.size
+        return result
+
+    def clear(self, tier_names: Optional[Iterable[str]] = None):
+        """Evicts every entry of some tiers, and forgets their recorded hits and misses.
+
+        Args:
+            tier_names (Optional[Iterable[str]], optional): Names of the tiers to clear. Defaults to all tiers.
+
+        Raises:
+            KeyError: If a tier name is unknown.
+        """
+        tiers = [self.tiers[tier_name] for tier_name in tier_names] if tier_names is not None else self.tiers.values()
+        for tier in tiers:
+            tier.clear()
+            tier.take_usage()
+        try:
+            with self.locked():
+                recorded_usage = self._read_usage()
+                for tier in tiers:
+                    recorded_usage.pop(tier.name, None)
+                self._write_usage(recorded_usage)
+        except OSError:
+            pass
+
+    def _evict(self, tier: MetadockCacheTier, entry: MetadockCacheEntry):
+        """Removes an entry, along with its fan-out directory once that is empty. Entries already evicted by a
+        concurrent run are skipped."""
+        try:
+            os.remove(entry.path)
+            if entry.path.parent != tier.directory:
+                os.rmdir(entry.path.parent)
+        except OSError:
+            pass
+
+    def _read_usage(self) -> dict[str, tuple[int, int]]:
+        """Reads the hits and misses of each tier from the stats file, or none if there is no readable stats file."""
+        try:
+            stats = json.loads((self.directory / self.stats_filename).read_text())
+            return {tier_name: (usage["hits"], usage["misses"]) for tier_name, usage in stats["tiers"].items()}
+        except (OSError, ValueError, KeyError, TypeError):
+            return {}
+
+    def _write_usage(self, usage: dict[str, tuple[int, int]]):
+        """Atomically replaces the stats file with the hits and misses of each tier."""
+        stats = {"tiers": {name: {"hits": hits, "misses": misses} for name, (hits, misses) in sorted(usage.items())}}
+        write_atomically(self.directory / self.stats_filename, json.dumps(stats, indent=2).encode())
+
+    @contextlib.contextmanager
+    def locked(self) -> Iterator[None]:
+        """Holds the store's lock file, serializing read-modify-write updates of the files in the store (e.g. the
+        stats file) between concurrent runs.
+
+        Raises:
+            OSError: If the lock file cannot be opened.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.directory / self.lock_filename, "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
@@ -1,7 +1,86 @@
 import argparse
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import Optional
 
 from metadock import Metadock, exceptions
+from metadock.cache import MetadockCacheStore
+
+_SIZE_UNITS: dict[str, int] = {"": 1, "K": 1024, "M": 1024**2, "G": 1024**3, "T": 1024**4}
+_AGE_UNITS: dict[str, int] = {"": 1, "s": 1, "m": 60, "h": 60 * 60, "d": 24 * 60 * 60, "w": 7 * 24 * 60 * 60}
+
+
+def _shard_argument(value: str) -> tuple[int, int]:
+    """Parses a shard of a sharded build, given as `I/N`.
+
+    Args:
+        value (str): The shard argument.
+
+    Raises:
+        argparse.ArgumentTypeError: If the shard is malformed, or I is not between 1 and N.
+
+    Returns:
+        tuple[int, int]: The shard index I and the number of shards N.
+    """
+    try:
+        index, shard_count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected a shard as I/N, e.g. 1/8, but got: %s" % value)
+    if not 1 <= index <= shard_count:
+        raise argparse.ArgumentTypeError("expected 1 <= I <= N, but got: %s" % value)
+    return index, shard_count
+
+
+def _size_argument(value: str) -> int:
+    """Parses a size in bytes, optionally suffixed with a binary unit, e.g. `500M` or `2GiB`.
+
+    Args:
+        value (str): The size argument.
+
+    Raises:
+        argparse.ArgumentTypeError: If the size is malformed.
+
+    Returns:
+        int: The size in bytes.
+    """
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)\s*([KMGT]?)(?:i?B)?", value.strip(), re.IGNORECASE)
+    if match is None:
+        raise argparse.ArgumentTypeError("expected a size, e.g. 500M or 2G, but got: %s" % value)
+    return int(float(match.group(1)) * _SIZE_UNITS[match.group(2).upper()])
+
+
+def _age_argument(value: str) -> float:
+    """Parses a duration in seconds, optionally suffixed with a unit (s, m, h, d or w), e.g. `12h` or `7d`.
+
+    Args:
+        value (str): The duration argument.
+
+    Raises:
+        argparse.ArgumentTypeError: If the duration is malformed.
+
+    Returns:
+        float: The duration in seconds.
+    """
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)\s*([smhdw]?)", value.strip())
+    if match is None:
+        raise argparse.ArgumentTypeError("expected a duration, e.g. 12h or 7d, but got: %s" % value)
+    return float(match.group(1)) * _AGE_UNITS[match.group(2)]
+
+
+def _format_size(size: int) -> str:
+    """Formats a size in bytes with the largest binary unit which keeps it at or above 1, e.g. `1.5 MiB`."""
+    for unit in ("T", "G", "M", "K"):
+        if size >= _SIZE_UNITS[unit]:
+            return "%.1f %siB" % (size / _SIZE_UNITS[unit], unit)
+    return "%d B" % size
+
+
+def _format_hit_rate(hit_rate: Optional[float]) -> str:
+    """Formats the hit rate of a cache tier as a percentage, or `n/a` if the tier was never used."""
+    return "%.1f%%" % (hit_rate * 100) if hit_rate is not None else "n/a"
 
 
 def parse_arguments():
@@ -36,6 +115,25 @@ def parse_arguments():
         )
         return parser
 
+    def _add_since_argument(parser: argparse.ArgumentParser) -> argparse.ArgumentParser:
+        parser.add_argument(
+            "--since",
+            action="store",
+            dest="since",
+            metavar="REF",
+            help="Only select the schematics affected by the files changed in the git repository since REF.",
+        )
+        return parser
+
+    def _add_compact_contexts_argument(parser: argparse.ArgumentParser) -> argparse.ArgumentParser:
+        parser.add_argument(
+            "--compact-contexts",
+            action="store_true",
+            dest="compact_contexts",
+            help="Store the contexts of content schematics compactly, with tuples in place of lists.",
+        )
+        return parser
+
     arg_parser = argparse.ArgumentParser(
         prog="metadock",
         description="Generates and formats Jinja documentation templates from yaml sources.",
@@ -49,6 +147,31 @@ def parse_arguments():
         help="Project directory containing a .metadock directory.",
         default=Path.cwd(),
     )
+    arg_parser.add_argument(
+        "-j",
+        "--jobs",
+        action="store",
+        dest="jobs",
+        type=int,
+        help="Number of worker processes with which to parse content schematics files, up to the number of CPUs.",
+        default=1,
+    )
+    arg_parser.add_argument(
+        "--cache-max-size",
+        action="store",
+        dest="cache_max_size",
+        type=_size_argument,
+        metavar="SIZE",
+        help="Size cap of the .metadock/.cache directory (e.g. 500M), enforced after each writing build.",
+    )
+    arg_parser.add_argument(
+        "--cache-max-age",
+        action="store",
+        dest="cache_max_age",
+        type=_age_argument,
+        metavar="AGE",
+        help="Age (e.g. 7d) after which builds evict unused entries of the .metadock/.cache directory.",
+    )
     cmd_sub_parsers = arg_parser.add_subparsers(help="Metadock command", dest="command")
 
     init_parser = cmd_sub_parsers.add_parser(
@@ -62,11 +185,136 @@ def parse_arguments():
         "build", help="Build a Metadock project, rendering some or all documents."
     )
     build_parser = _add_selector_argument_group(build_parser)
+    build_parser = _add_since_argument(build_parser)
+    build_output_group = build_parser.add_mutually_exclusive_group()
+    build_output_group.add_argument(
+        "--stdout",
+        action="store_true",
+        dest="stdout",
+        help="Print the rendered documents to stdout instead of writing them to the generated_documents directory.",
+    )
+    build_output_group.add_argument(
+        "--no-write",
+        action="store_false",
+        dest="write",
+        help="Report the change status of each document without writing it to the generated_documents directory.",
+    )
+    build_output_group.add_argument(
+        "--plan",
+        action="store_true",
+        dest="plan",
+        help="Print a JSON plan of what the build would change and why, rendering only documents which may have "
+        "changed, and exit non-zero if any document would change.",
+    )
+    build_parser.add_argument(
+        "--shard",
+        action="store",
+        dest="shard",
+        type=_shard_argument,
+        metavar="I/N",
+        help="Only build shard I of N, keeping documents connected by ref() on the same shard, and write its manifest.",
+    )
+    build_parser.add_argument(
+        "--cache-dir",
+        action="store",
+        dest="cache_dir",
+        type=Path,
+        help="Render cache directory shared between builds, from which documents with unchanged inputs are copied.",
+    )
+    build_parser.add_argument(
+        "--persist-fragments",
+        action="store_true",
+        dest="persist_fragments",
+        help="Persist the fragments rendered by {%% cache %%} blocks in the .metadock/.cache directory between builds.",
+    )
+    build_parser = _add_compact_contexts_argument(build_parser)
     list_parser = cmd_sub_parsers.add_parser(
         "list",
         help="List all recognized documents which can be generated from a given selection.",
     )
     list_parser = _add_selector_argument_group(list_parser)
+    list_parser = _add_since_argument(list_parser)
+    list_parser.add_argument(
+        "--memory-report",
+        action="store_true",
+        dest="memory_report",
+        help="Report the memory held by the contexts of the project's content schematics.",
+    )
+    list_parser = _add_compact_contexts_argument(list_parser)
+    compile_parser = cmd_sub_parsers.add_parser(
+        "compile",
+        help="Precompile the templated documents of a Metadock project, to speed up subsequent builds.",
+    )
+    watch_parser = cmd_sub_parsers.add_parser(
+        "watch",
+        help="Watch a Metadock project, rebuilding the documents affected by each change.",
+    )
+    watch_parser = _add_selector_argument_group(watch_parser)
+    watch_parser.add_argument(
+        "--interval",
+        default=0.5,
+        type=float,
+        dest="interval",
+        help="Seconds to wait between polls of the project files.",
+    )
+    watch_parser.add_argument(
+        "--debounce",
+        default=0.2,
+        type=float,
+        dest="debounce",
+        help="Seconds the project files must remain unchanged before a rebuild starts.",
+    )
+    merge_shards_parser = cmd_sub_parsers.add_parser(
+        "merge-shards",
+        help="Merge the manifests of every shard of a sharded build, checking their generated documents.",
+    )
+    merge_shards_parser.add_argument(
+        "manifests",
+        nargs="+",
+        type=Path,
+        help="Manifests written by the shards of the build.",
+    )
+    cache_parser = cmd_sub_parsers.add_parser(
+        "cache",
+        help="Report the size and hit rates of the .metadock/.cache directory, or evict entries from it.",
+    )
+    cache_parser.add_argument(
+        "cache_command",
+        choices=["stats", "prune", "clear"],
+        help="stats: report the size and hit rate of each tier, prune: evict entries beyond the limits, clear: evict all.",
+    )
+    cache_parser.add_argument(
+        "--max-size",
+        action="store",
+        dest="max_size",
+        type=_size_argument,
+        metavar="SIZE",
+        help="Size cap to prune the cache to (e.g. 500M). Defaults to --cache-max-size.",
+    )
+    cache_parser.add_argument(
+        "--max-age",
+        action="store",
+        dest="max_age",
+        type=_age_argument,
+        metavar="AGE",
+        help="Age (e.g. 7d) beyond which to prune unused entries. Defaults to --cache-max-age.",
+    )
+    cache_parser.add_argument(
+        "--tier",
+        default=None,
+        nargs="+",
+        dest="tiers",
+        choices=MetadockCacheStore.tier_names,
+        metavar="TIER",
+        help="Tier(s) to clear: %s. Defaults to every tier." % ", ".join(MetadockCacheStore.tier_names),
+    )
+    cache_parser.add_argument(
+        "--cache-dir",
+        action="store",
+        dest="cache_dir",
+        type=Path,
+        help="Render cache directory shared between builds, holding the renders tier.",
+    )
     clean_parser = cmd_sub_parsers.add_parser(
         "clean",
         help="Cleans the generated_documents directory for the Metadock project.",
@@ -87,7 +335,17 @@ def main():
         print("Initialized new Metadock directory at %s" % metadock.metadock_directory)
         exit(0)
 
-    metadock: Metadock = Metadock(working_directory=arguments.project_dir)
+    # More workers than CPUs only add the cost of starting them and transferring their results.
+    jobs = min(arguments.jobs, os.cpu_count() or 1)
+    metadock: Metadock = Metadock(
+        working_directory=arguments.project_dir,
+        persist_fragments=getattr(arguments, "persist_fragments", False),
+        compact_contexts=getattr(arguments, "compact_contexts", False),
+        executor=ProcessPoolExecutor(jobs) if jobs > 1 else None,
+        cache_dir=getattr(arguments, "cache_dir", None),
+        cache_max_size=arguments.cache_max_size,
+        cache_max_age=arguments.cache_max_age,
+    )
 
     if arguments.command == "validate":
         validation_result = metadock.validate()
@@ -110,22 +368,136 @@ def main():
         exit(0)
 
     if arguments.command == "build":
+        if arguments.stdout:
+            schematic_names = metadock.list(arguments.schematic_globs, arguments.template_globs, arguments.since)
+            if arguments.shard is not None:
+                schematic_names = metadock.project.shard(schematic_names, *arguments.shard)
+            for schematic_name in schematic_names:
+                for compiled_document in metadock.render(schematic_name).values():
+                    print(str(compiled_document))
+            exit(0)
+
+        if arguments.plan:
+            build_plan = metadock.plan(
+                schematic_globs=arguments.schematic_globs,
+                template_globs=arguments.template_globs,
+                shard=arguments.shard,
+                since=arguments.since,
+            )
+            print(json.dumps({"changes": build_plan.changes} | build_plan.model_dump(mode="json"), indent=2))
+            exit(1 if build_plan.changes else 0)
+
         build_result = metadock.build(
             schematic_globs=arguments.schematic_globs,
             template_globs=arguments.template_globs,
+            write=arguments.write,
+            shard=arguments.shard,
+            since=arguments.since,
         )
         for generated_document in build_result.generated_documents:
             print("Generated document (%s): \t%s" % (generated_document.status.value, generated_document.path))
-        print("Build successful!")
+        if build_result.fragment_cache_hits or build_result.fragment_cache_misses:
+            print(
+                "Fragment cache: %d hit(s), %d miss(es)"
+                % (build_result.fragment_cache_hits, build_result.fragment_cache_misses)
+            )
+        if build_result.render_cache_hits or build_result.render_cache_misses:
+            print(
+                "Render cache: %d hit(s), %d miss(es)"
+                % (build_result.render_cache_hits, build_result.render_cache_misses)
+            )
+        if build_result.cache_evictions:
+            print("Evicted %d cache entries to stay within the cache limits." % build_result.cache_evictions)
+        if arguments.shard is not None and arguments.write:
+            print("Wrote shard manifest: %s" % metadock.project.shard_manifest_path(*arguments.shard))
+        print("Build successful!" if arguments.write else "Build successful! (no documents were written)")
+        exit(0)
+
+    if arguments.command == "compile":
+        compiled_templates = metadock.compile()
+        print(
+            "Compiled %d templates into %s" % (len(compiled_templates), metadock.project.cache_directory / "templates")
+        )
+        exit(0)
+
+    if arguments.command == "watch":
+        print("Watching for changes in %s (press Ctrl+C to stop)..." % metadock.metadock_directory)
+        try:
+            metadock.watch(
+                schematic_globs=arguments.schematic_globs,
+                template_globs=arguments.template_globs,
+                interval=arguments.interval,
+                debounce=arguments.debounce,
+            )
+        except KeyboardInterrupt:
+            print("Stopped watching.")
+        exit(0)
+
+    if arguments.command == "merge-shards":
+        manifest = metadock.merge_shards(arguments.manifests)
+        print(
+            "Merged %d shard manifests, covering %d documents from %d content schematics."
+            % (len(arguments.manifests), len(manifest.documents), len(manifest.schematics))
+        )
+        exit(0)
+
+    if arguments.command == "cache":
+        if arguments.cache_command == "stats":
+            cache_stats = metadock.cache_stats()
+            print("Cache stats for %s:" % metadock.project.cache.directory)
+            for tier_stats in cache_stats:
+                print(
+                    "- %s: \t%d entries (%s), %d hit(s), %d miss(es), hit rate %s"
+                    % (
+                        tier_stats.name,
+                        tier_stats.entries,
+                        _format_size(tier_stats.size),
+                        tier_stats.hits,
+                        tier_stats.misses,
+                        _format_hit_rate(tier_stats.hit_rate),
+                    )
+                )
+            print("- Total: \t%s" % _format_size(sum(tier_stats.size for tier_stats in cache_stats)))
+            exit(0)
+
+        if arguments.cache_command == "prune":
+            max_size = arguments.max_size if arguments.max_size is not None else arguments.cache_max_size
+            max_age = arguments.max_age if arguments.max_age is not None else arguments.cache_max_age
+            if max_size is None and max_age is None:
+                print("Nothing to prune: expected --max-size or --max-age.")
+                exit(1)
+            prune_result = metadock.prune_cache(max_size, max_age)
+            print(
+                "Evicted %d cache entries (%s), leaving %s."
+                % (
+                    prune_result.evicted_entries,
+                    _format_size(prune_result.evicted_size),
+                    _format_size(prune_result.remaining_size),
+                )
+            )
+            exit(0)
+
+        metadock.clear_cache(arguments.tiers)
+        print("Cleared cache tier(s): %s" % ", ".join(arguments.tiers or metadock.project.cache.tier_names))
         exit(0)
 
     if arguments.command == "list":
         list_results = metadock.list(
             schematic_globs=arguments.schematic_globs,
             template_globs=arguments.template_globs,
+            since=arguments.since,
         )
         print("List picked up the following content schematics:")
         print(*("- %s" % result for result in list_results), sep="\n")
+        if arguments.memory_report:
+            memory_report = metadock.memory_report()
+            print("Context memory report (%d contexts):" % memory_report.contexts)
+            print("- Containers: \t%d (%d bytes)" % (memory_report.containers, memory_report.container_bytes))
+            print(
+                "- Strings: \t%d, %d distinct (%d bytes)"
+                % (memory_report.strings, memory_report.distinct_strings, memory_report.string_bytes)
+            )
+            print("- Total: \t%d bytes" % memory_report.total_bytes)
         exit(0)
 
     raise exceptions.MetadockException("Unrecognized command: %s" % arguments.command)
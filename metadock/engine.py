@@ -1,20 +1,245 @@
+import asyncio
+import datetime
 import fnmatch
+import hashlib
+import json
 import os
 import shutil
+import sys
+import threading
+from concurrent.futures import Executor, Future
 from enum import StrEnum, auto
-from functools import cached_property
+from functools import cached_property, partial, reduce
 from pathlib import Path
-from typing import Any, Optional
+from stat import S_ISREG
+from typing import Any, Callable, Iterable, Iterator, Mapping, MutableMapping, Optional
 
 import jinja2
+import jinja2.meta
 import pydantic
 import yaml
 
-from metadock import exceptions, yaml_utils
-from metadock.env import MetadockEnv
+from metadock import exceptions, git, yaml_utils
+from metadock.cache import (
+    MetadockCachePruneResult,
+    MetadockCacheStore,
+    MetadockCacheTier,
+    MetadockCacheTierStats,
+    write_atomically,
+)
+from metadock.env import MetadockFragmentCache, metadock_version, project_jinja_environment, template_from_string
 from metadock.target_formats import MetadockTargetFormat, MetadockTargetFormatFactory
 
 
+FileSignature = tuple[int, int]
+
+
+def file_signature(path: Path) -> Optional[FileSignature]:
+    """Cheaply fingerprints a file by its modification time and size, for detecting changes without reading it.
+
+    Args:
+        path (Path): Path to the file.
+
+    Returns:
+        Optional[FileSignature]: Modification time (ns) and size of the file, or None if it is not an existing file.
+    """
+    try:
+        stat = path.stat()
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    if not S_ISREG(stat.st_mode):
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def scan_directories(*directories: Path) -> dict[Path, FileSignature]:
+    """Recursively lists the regular files in some directories with `os.scandir`, fingerprinting each one as it goes.
+    The directory entries tell files and directories apart without extra system calls, so each file is stat'ed once.
+    Like `Path.glob("**/*")`, symlinks to files are listed but symlinks to directories are not followed, and entries
+    which cannot be read are skipped.
+
+    Args:
+        *directories (Path): Directories to scan. Directories which don't exist are skipped.
+
+    Returns:
+        dict[Path, FileSignature]: Modification time (ns) and size of each file, keyed by normalized path.
+    """
+    signatures: dict[Path, FileSignature] = {}
+    pending = [os.path.normpath(directory) for directory in directories]
+    while pending:
+        try:
+            entries = os.scandir(pending.pop())
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(entry.path)
+                    elif entry.is_file():
+                        stat = entry.stat()
+                        signatures[Path(entry.path)] = (stat.st_mtime_ns, stat.st_size)
+                except OSError:
+                    # E.g. the entry was deleted while scanning, or is a symlink loop.
+                    continue
+    return signatures
+
+
+def _source_digest(source: str) -> str:
+    """Digest identifying the content of a source file.
+
+    Args:
+        source (str): Content of the source file.
+
+    Returns:
+        str: Hex digest of the content.
+    """
+    return hashlib.sha256(source.encode("utf-8")).hexdigest()
+
+
+def _file_digest(path: Path) -> Optional[str]:
+    """Digest identifying the content of a file. The file is read in chunks, so large data files are never held in
+    memory.
+
+    Args:
+        path (Path): Path to the file.
+
+    Returns:
+        Optional[str]: Hex digest of the file's content, or None if the file cannot be read.
+    """
+    try:
+        with path.open("rb") as handle:
+            return hashlib.file_digest(handle, "sha256").hexdigest()
+    except OSError:
+        return None
+
+
+def _inputs_digest(inputs: dict[str, str]) -> str:
+    """Digest of the inputs of the documents built from a content schematic.
+
+    Args:
+        inputs (dict[str, str]): Digest of each content schematic and template the documents depend on.
+
+    Returns:
+        str: Hex digest of the inputs.
+    """
+    return _source_digest(json.dumps(sorted(inputs.items())))
+
+
+def _render_digest(inputs_digest: str, target_format: str) -> str:
+    """Digest identifying a rendered document, from the digest of its inputs and its target format.
+
+    Args:
+        inputs_digest (str): Digest of the content schematics and templates the document depends on.
+        target_format (str): Identifier of the target format.
+
+    Returns:
+        str: Hex digest identifying the document, which also covers the Metadock and Jinja2 versions.
+    """
+    return _source_digest(json.dumps([metadock_version(), jinja2.__version__, target_format, inputs_digest]))
+
+
+def _snapshotted_file_unchanged(path: Path, signature: Optional[FileSignature], snapshotted: "list[Any]") -> bool:
+    """Tells whether a file is unchanged since it was snapshotted, comparing its signature before its digest.
+
+    Args:
+        path (Path): Path to the file.
+        signature (Optional[FileSignature]): Current signature of the file.
+        snapshotted (list[Any]): Signature and digest of the file when it was snapshotted.
+
+    Returns:
+        bool: Whether the file is unchanged.
+    """
+    snapshotted_signature, snapshotted_digest = snapshotted
+    if signature is None:
+        return False
+    if snapshotted_signature is not None and tuple(snapshotted_signature) == signature:
+        return True
+    return _file_digest(path) == snapshotted_digest
+
+
+_SNAPSHOT_TAG = "$snapshot"
+# datetime is a subclass of date, so it is checked first.
+_SNAPSHOT_TIME_TYPES: dict[str, type] = {
+    "datetime": datetime.datetime,
+    "date": datetime.date,
+    "time": datetime.time,
+}
+
+
+def _snapshot_encode(value: Any) -> Any:
+    """Encodes a resolved context as JSON for a snapshot, tagging the values which JSON cannot represent. Tuples become
+    lists, since compacted contexts are compacted again as they are loaded.
+
+    Args:
+        value (Any): The resolved context.
+
+    Raises:
+        TypeError: If the context holds a value which cannot be snapshotted.
+
+    Returns:
+        Any: The JSON serializable context.
+    """
+    if value is None or isinstance(value, (str, bool, int, float)):
+        return value
+    if isinstance(value, dict):
+        if not all(isinstance(key, str) for key in value):
+            raise TypeError("Cannot snapshot a mapping with non-string keys")
+        encoded = {key: _snapshot_encode(item) for key, item in value.items()}
+        # Mappings which happen to hold the tag key are stored as pairs, so that they aren't mistaken for tagged values.
+        return {_SNAPSHOT_TAG: "dict", "items": list(encoded.items())} if _SNAPSHOT_TAG in value else encoded
+    if isinstance(value, (list, tuple)):
+        return [_snapshot_encode(item) for item in value]
+    if isinstance(value, yaml_utils.StreamedRows):
+        return {_SNAPSHOT_TAG: "rows", "path": str(value.path), "key": value.key, "normalize": value.normalize}
+    for tag, value_type in _SNAPSHOT_TIME_TYPES.items():
+        if isinstance(value, value_type):
+            return {_SNAPSHOT_TAG: tag, "value": value.isoformat()}
+    raise TypeError("Cannot snapshot a value of type %s" % type(value).__name__)
+
+
+def _snapshot_object_hook(obj: dict, directory: Path) -> Any:
+    """Decodes the values tagged by `_snapshot_encode`, as a `json.loads` object hook (bound with `functools.partial`).
+
+    Args:
+        obj (dict): A decoded JSON object.
+        directory (Path): Directory of the project, outside of which snapshotted data files may not be streamed.
+
+    Raises:
+        ValueError: If a snapshotted data file is outside of the project directory.
+
+    Returns:
+        Any: The decoded value.
+    """
+    tag = obj.get(_SNAPSHOT_TAG)
+    if tag is None:
+        return obj
+    if tag == "dict":
+        return dict(obj["items"])
+    if tag == "rows":
+        path = Path(obj["path"])
+        if not Path(os.path.abspath(path)).is_relative_to(os.path.abspath(directory)):
+            raise ValueError("Snapshotted data file %s is outside of the project directory" % path)
+        return yaml_utils.StreamedRows(path, obj["key"], obj["normalize"])
+    return _SNAPSHOT_TIME_TYPES[tag].fromisoformat(obj["value"])
+
+
+def _read_text_if_exists(path: Path) -> Optional[str]:
+    """Reads the text content of a file, if it exists.
+
+    Args:
+        path (Path): Path to the file.
+
+    Returns:
+        Optional[str]: Content of the file, or None if it does not exist.
+    """
+    try:
+        with path.open("r") as handle:
+            return handle.read()
+    except FileNotFoundError:
+        return None
+
+
 class ValidationStatus(StrEnum):
     """Enumerated type for different top-level summary status values for project validation."""
 
@@ -99,15 +324,45 @@ class MetadockGeneratedDocument(pydantic.BaseModel):
             path (Path): Path to the built document
             content (str): Content of the built document
         """
-        status = GeneratedDocumentChangeStatus.NEW
+        old_content = None
         if path.exists():
             with path.open("r") as handle:
                 old_content = handle.read()
-            if hash(old_content) == hash(content):
-                status = GeneratedDocumentChangeStatus.NOCHANGE
-            else:
-                status = GeneratedDocumentChangeStatus.UPDATE
-        return super().__init__(status=status, path=path)
+        return super().__init__(status=self._change_status(content, old_content), path=path)
+
+    @classmethod
+    def from_previous_content(
+        cls, path: Path, content: str, previous_content: Optional[str]
+    ) -> "MetadockGeneratedDocument":
+        """Creates a MetadockGeneratedDocument from previously read content of the built document, without touching the
+        filesystem.
+
+        Args:
+            path (Path): Path to the built document
+            content (str): Content of the built document
+            previous_content (Optional[str]): Content of the document before the build, or None if it did not exist
+
+        Returns:
+            MetadockGeneratedDocument: The generated document, with its change status.
+        """
+        return cls.model_construct(status=cls._change_status(content, previous_content), path=path)
+
+    @staticmethod
+    def _change_status(content: str, previous_content: Optional[str]) -> GeneratedDocumentChangeStatus:
+        """Computes the change status of a built document from the hash of its new and previous content.
+
+        Args:
+            content (str): Content of the built document
+            previous_content (Optional[str]): Content of the document before the build, or None if it did not exist
+
+        Returns:
+            GeneratedDocumentChangeStatus: The change status of the built document.
+        """
+        if previous_content is None:
+            return GeneratedDocumentChangeStatus.NEW
+        if hash(previous_content) == hash(content):
+            return GeneratedDocumentChangeStatus.NOCHANGE
+        return GeneratedDocumentChangeStatus.UPDATE
 
 
 class MetadockProjectBuildResult(pydantic.BaseModel):
@@ -115,9 +370,222 @@ class MetadockProjectBuildResult(pydantic.BaseModel):
 
     Attributes:
         generated_documents (list[MetadockGeneratedDocument]): List of generated documents and their change statuses
+        fragment_cache_hits (int): Number of `{% cache %}` blocks whose output was reused during the build
+        fragment_cache_misses (int): Number of `{% cache %}` blocks which were rendered during the build
+        render_cache_hits (int): Number of content schematics whose documents were copied from the render cache
+        render_cache_misses (int): Number of content schematics which were rendered and added to the render cache
+        cache_evictions (int): Number of entries evicted from the project's cache store to keep it within its limits
     """
 
     generated_documents: list[MetadockGeneratedDocument]
+    fragment_cache_hits: int = 0
+    fragment_cache_misses: int = 0
+    render_cache_hits: int = 0
+    render_cache_misses: int = 0
+    cache_evictions: int = 0
+
+
+class MetadockBuildManifestEntry(pydantic.BaseModel):
+    """Record of a generated document in the build manifest.
+
+    Attributes:
+        schematic (str): Name of the content schematic the document was built from.
+        target_format (str): Identifier of the document's target format.
+        render_digest (Optional[str]): Digest of the document's inputs (see `MetadockProject.render_digest`), or None
+            if they cannot be determined statically.
+        inputs (dict[str, str]): Digest of each content schematic and template the document depended on, keyed by
+            `schematic:<name>` or `template:<path>`.
+        digest (str): Digest of the generated document's content.
+    """
+
+    schematic: str
+    target_format: str
+    render_digest: Optional[str] = None
+    inputs: dict[str, str] = {}
+    digest: str
+
+
+class MetadockBuildManifest(pydantic.BaseModel):
+    """Manifest of the documents written by the builds of a project, which lets `MetadockProject.plan` tell which
+    documents are up to date without rendering them.
+
+    Attributes:
+        documents (dict[str, MetadockBuildManifestEntry]): Record of each generated document, keyed by its path
+            relative to the generated_documents directory.
+    """
+
+    documents: dict[str, MetadockBuildManifestEntry] = {}
+
+
+class PlannedDocumentStatus(StrEnum):
+    """Enumerated type for the statuses of documents in a build plan: the change statuses of built documents, plus
+    SKIPPED for documents whose inputs and content are unchanged since the last build, and so need no rendering."""
+
+    NEW = auto()
+    UPDATE = auto()
+    NOCHANGE = auto()
+    SKIPPED = auto()
+
+
+class MetadockPlannedDocument(pydantic.BaseModel):
+    """Planned document pydantic Model.
+
+    Attributes:
+        schematic (str): Name of the content schematic the document is built from.
+        path (str): Path of the document, relative to the generated_documents directory.
+        status (PlannedDocumentStatus): What a build would do to the document.
+        reason (str): Why the build would do so.
+        changed_inputs (list[str]): Content schematics and templates which changed since the last build, as
+            `schematic:<name>` or `template:<path>`.
+        rendered (bool): Whether the document had to be rendered to plan it.
+    """
+
+    schematic: str
+    path: str
+    status: PlannedDocumentStatus
+    reason: str
+    changed_inputs: list[str] = []
+    rendered: bool = False
+
+
+class MetadockBuildPlan(pydantic.BaseModel):
+    """Build plan pydantic Model, produced by `MetadockProject.plan`. Summarizes what a build would do, without
+    writing any document.
+
+    Attributes:
+        documents (list[MetadockPlannedDocument]): The planned documents.
+    """
+
+    documents: list[MetadockPlannedDocument] = []
+
+    @property
+    def changes(self) -> bool:
+        """Whether a build would write any document."""
+        return any(
+            document.status in (PlannedDocumentStatus.NEW, PlannedDocumentStatus.UPDATE) for document in self.documents
+        )
+
+
+class MetadockShardManifest(pydantic.BaseModel):
+    """Manifest of the documents generated by one or more shards of a sharded build. The manifests of every shard are
+    merged into the manifest of the whole build by `MetadockShardManifest.merge`.
+
+    Attributes:
+        shard_count (int): Number of shards which the build was partitioned into.
+        shards (list[int]): Indices (from 1) of the shards covered by the manifest.
+        schematics (list[str]): Names of the content schematics built by the shards.
+        documents (dict[str, str]): Digest of each generated document, keyed by its path relative to the
+            generated_documents directory.
+    """
+
+    shard_count: int
+    shards: list[int]
+    schematics: list[str] = []
+    documents: dict[str, str] = {}
+
+    @property
+    def complete(self) -> bool:
+        """Whether the manifest covers every shard of the build."""
+        return self.shards == list(range(1, self.shard_count + 1))
+
+    @classmethod
+    def merge(cls, manifests: "list[MetadockShardManifest]") -> "MetadockShardManifest":
+        """Merges the manifests of some shards of a build.
+
+        Args:
+            manifests (list[MetadockShardManifest]): The manifests to merge.
+
+        Raises:
+            exceptions.MetadockProjectException: If there are no manifests, if they come from builds with different
+                numbers of shards, or if a shard, content schematic or document appears in more than one manifest.
+
+        Returns:
+            MetadockShardManifest: The merged manifest.
+        """
+        if not manifests:
+            raise exceptions.MetadockProjectException("No shard manifests to merge.")
+        shard_counts = {manifest.shard_count for manifest in manifests}
+        if len(shard_counts) > 1:
+            raise exceptions.MetadockProjectException(
+                "Cannot merge manifests of builds with different numbers of shards: %s" % sorted(shard_counts)
+            )
+
+        merged = cls(shard_count=manifests[0].shard_count, shards=[])
+        for manifest in manifests:
+            for field_name, items in (
+                ("shards", manifest.shards),
+                ("schematics", manifest.schematics),
+                ("documents", manifest.documents),
+            ):
+                duplicates = set(getattr(merged, field_name)).intersection(items)
+                if duplicates:
+                    raise exceptions.MetadockProjectException(
+                        "Found %s in more than one shard manifest: %s"
+                        % (field_name, ", ".join(map(str, sorted(duplicates))))
+                    )
+            merged.shards += manifest.shards
+            merged.schematics += manifest.schematics
+            merged.documents |= manifest.documents
+
+        merged.shards.sort()
+        merged.schematics.sort()
+        merged.documents = dict(sorted(merged.documents.items()))
+        return merged
+
+
+class MetadockContextMemoryReport(pydantic.BaseModel):
+    """Summary of the memory held by the contexts of a project's content schematics. Objects shared between contexts
+    (e.g. interned strings, or the context of an extended schematic) are only counted once.
+
+    Attributes:
+        contexts (int): Number of contexts measured.
+        containers (int): Number of distinct dictionaries, lists and tuples.
+        container_bytes (int): Memory held by the containers themselves, excluding their contents.
+        strings (int): Number of distinct string objects.
+        distinct_strings (int): Number of distinct string values; fewer than `strings` if equal strings are not shared.
+        string_bytes (int): Memory held by the string objects.
+        total_bytes (int): Memory held by all objects in the contexts.
+    """
+
+    contexts: int = 0
+    containers: int = 0
+    container_bytes: int = 0
+    strings: int = 0
+    distinct_strings: int = 0
+    string_bytes: int = 0
+    total_bytes: int = 0
+
+    @classmethod
+    def from_contexts(cls, contexts: "list[Any]") -> "MetadockContextMemoryReport":
+        """Measures the memory held by some contexts, walking every object reachable through their containers.
+
+        Args:
+            contexts (list[Any]): The contexts to measure.
+
+        Returns:
+            MetadockContextMemoryReport: The memory report.
+        """
+        report = cls(contexts=len(contexts))
+        seen: set[int] = set()
+        string_values: set[str] = set()
+        pending: list[Any] = list(contexts)
+        while pending:
+            obj = pending.pop()
+            if id(obj) in seen:
+                continue
+            seen.add(id(obj))
+            size = sys.getsizeof(obj)
+            report.total_bytes += size
+            if isinstance(obj, str):
+                report.strings += 1
+                report.string_bytes += size
+                string_values.add(obj)
+            elif isinstance(obj, (dict, list, tuple)):
+                report.containers += 1
+                report.container_bytes += size
+                pending += [*obj.keys(), *obj.values()] if isinstance(obj, dict) else obj
+        report.distinct_strings = len(string_values)
+        return report
 
 
 class MetadockProject:
@@ -126,54 +594,131 @@ class MetadockProject:
 
     Attributes:
         directory (Path): Path to the root of the metadock project directory (.metadock/)
+        cache (MetadockCacheStore): Cache store of the project, under .metadock/.cache
+        fragment_cache (MetadockFragmentCache): Cache of the fragments rendered by `{% cache %}` blocks
 
     Cached Properties:
         content_schematics_directory (Path): Path to the content_schematics directory for the project
-        content_schematics (dict[str, MetadockContentSchematic]): Dictionary of content schematics, keyed by name
+        content_schematics (MetadockContentSchematics): Mapping of content schematics, keyed by name
+        file_index (dict[Path, FileSignature]): Signatures of the files in the content_schematics and
+            templated_documents directories, from a single scan of both.
         generated_documents_directory (Path): Path to the generated_documents directory for the project
         templated_documents_directory (Path): Path to the templated_documents directory for the project
-        templated_documents (dict[str, MetadockTemplatedDocument]): Dictionary of templated documents, keyed by project
+        templated_documents (MetadockTemplatedDocuments): Mapping of templated documents, keyed by project
             relative path.
+
+    The content_schematics and templated_documents are cached for the lifetime of the project; use `refresh` to pick up
+    changes made to the project files since they were loaded. Builds which write their documents also snapshot the
+    parsed content schematic files under .metadock/.cache/schematics, so that later runs can skip parsing them for as
+    long as they and their imports are unchanged. Builds which write their documents record the usage of the cache store, and prune it if it has a size
+    cap or a maximum age.
     """
 
+    snapshot_version: int = 3
+
     directory: Path
     environment: jinja2.Environment
-
-    def __init__(self, directory: Path | str):
+    cache: MetadockCacheStore
+    fragment_cache: MetadockFragmentCache
+    snapshot_schematics: bool
+    compact_contexts: bool
+    executor: Optional[Executor]
+    render_cache: Optional["MetadockRenderCache"]
+
+    def __init__(
+        self,
+        directory: Path | str,
+        persist_fragments: bool = False,
+        snapshot_schematics: bool = True,
+        compact_contexts: bool = False,
+        executor: Optional[Executor] = None,
+        render_cache_directory: Optional[Path | str] = None,
+        cache_max_size: Optional[int] = None,
+        cache_max_age: Optional[float] = None,
+    ):
         """Open an existing Metadock project directory.
 
         Args:
             directory (Path | str): .metadock directory to open
+            persist_fragments (bool, optional): Whether to persist the fragments rendered by `{% cache %}` blocks in
+                the .cache directory, so that they are reused by later builds. Defaults to False.
+            snapshot_schematics (bool, optional): Whether to load parsed content schematic files from snapshots in the
+                .cache directory, and have builds which write their documents save them. Defaults to True.
+            compact_contexts (bool, optional): Whether to store the contexts of content schematics compactly, with
+                tuples in place of lists (see `yaml_utils.compact`). Defaults to False.
+            executor (Optional[Executor], optional): Executor in which to parse content schematics files concurrently,
+                e.g. a `ProcessPoolExecutor`. Defaults to None (parse them one after another).
+            render_cache_directory (Optional[Path | str], optional): Directory of a render cache, shared between builds,
+                from which `build` copies documents whose inputs are unchanged instead of rendering them. Defaults to
+                None (no render cache).
+            cache_max_size (Optional[int], optional): Size cap of the cache store in bytes, beyond which builds evict
+                the least recently used entries. Defaults to None (no cap).
+            cache_max_age (Optional[float], optional): Seconds after which builds evict unused entries of the cache
+                store. Defaults to None (keep them).
         """
         self.directory = Path(directory)
-        self.environment = MetadockEnv(self).jinja_environment()
+        self.executor = executor
+        self.cache = MetadockCacheStore(
+            self.directory / ".cache",
+            max_size=cache_max_size,
+            max_age=cache_max_age,
+            renders_directory=Path(render_cache_directory) if render_cache_directory else None,
+        )
+        self.render_cache = MetadockRenderCache(self.cache["renders"]) if render_cache_directory else None
+        self.snapshot_schematics = snapshot_schematics
+        self.compact_contexts = compact_contexts
+        self.fragment_cache = MetadockFragmentCache(tier=self.cache["fragments"] if persist_fragments else None)
+        self.environment = project_jinja_environment(self)
+        self.environment.loader = MetadockTemplateLoader(self)
+        self._file_signatures: dict[Path, FileSignature] = {}
+        self._file_digests: dict[Path, tuple[FileSignature, str]] = {}
+        self._content_schematic_files: dict[Path, MetadockContentSchematicFile] = {}
+        self._unsnapshotted_digests: dict[Path, str] = {}
+        self._template_asts: dict[Path, tuple[Optional[FileSignature], jinja2.nodes.Template]] = {}
+        self._index_lock = threading.Lock()
         # self.environment.globals |= env_dict["exports"]
         # self.environment.globals |= env_dict["namespaces"]
         # self.environment.filters |= env_dict["filters"]
 
+    @cached_property
+    def async_environment(self) -> jinja2.Environment:
+        """Jinja environment with `enable_async`, for rendering templates with `render_async`. In this environment,
+        `ref` is a coroutine which renders the referenced document without blocking the event loop."""
+        environment = project_jinja_environment(self, enable_async=True)
+        environment.loader = MetadockTemplateLoader(self)
+        return environment
+
     @cached_property
     def templated_documents_directory(self) -> Path:
         """Path to the templated_documents directory for the project."""
         return self.directory / "templated_documents"
 
     @cached_property
-    def templated_documents(self) -> dict[str, "MetadockTemplatedDocument"]:
-        """Returns a dictionary of templated documents, keyed by project relative path.
+    def templated_documents(self) -> "MetadockTemplatedDocuments":
+        """Returns a mapping of templated documents, keyed by project relative path. The templates are listed from the
+        project's file index, and each `MetadockTemplatedDocument` is only created when it is first looked up.
 
         Returns:
-            dict[str, MetadockTemplatedDocument]: A dictionary containing MetadockTemplatedDocument objects,
-            where the keys are the project relative paths of the documents.
+            MetadockTemplatedDocuments: A mapping of MetadockTemplatedDocument objects, where the keys are the project
+            relative paths of the documents.
         """
-        template_objects = self.templated_documents_directory.glob("**/*.*")
-        relative_template_files: list[Path] = list(
-            tmpl.relative_to(self.templated_documents_directory) for tmpl in template_objects if tmpl.is_file()
-        )
-        return {
-            str(relative_template_file): MetadockTemplatedDocument.from_project_relative_path(
-                self.directory, relative_template_file
-            )
-            for relative_template_file in relative_template_files
-        }
+        templated_documents_directory = Path(os.path.normpath(self.templated_documents_directory))
+        relative_template_files: list[str] = []
+        for path, signature in self.file_index.items():
+            if path.is_relative_to(templated_documents_directory) and "." in path.name:
+                self._file_signatures[path] = signature
+                relative_template_files.append(str(path.relative_to(templated_documents_directory)))
+        return MetadockTemplatedDocuments(self.directory, sorted(relative_template_files))
+
+    @cached_property
+    def file_index(self) -> dict[Path, FileSignature]:
+        """Index of the files in the templated_documents and content_schematics directories, made by a single scan of
+        both directories, and reused until `refresh` rescans them.
+
+        Returns:
+            dict[Path, FileSignature]: Modification time (ns) and size of each file, keyed by normalized path.
+        """
+        return scan_directories(self.templated_documents_directory, self.content_schematics_directory)
 
     @cached_property
     def content_schematics_directory(self) -> Path:
@@ -181,159 +726,1569 @@ class MetadockProject:
         return self.directory / "content_schematics"
 
     @cached_property
-    def content_schematics(self) -> dict[str, "MetadockContentSchematic"]:
-        """Returns a dictionary of content schematics, keyed by name.
+    def content_schematics(self) -> "MetadockContentSchematics":
+        """Returns a mapping of content schematics, keyed by name.
 
-        This method collects content schematics from YAML files in the content schematics directory.
-        Each content schematic is represented by a `MetadockContentSchematic` object.
+        This method indexes the content schematics defined in YAML files in the content schematics directory. Each
+        content schematic is represented by a `MetadockContentSchematic` object, which is only constructed (resolving
+        its context's imports) when it is first looked up. Schematics which `extends` another schematic inherit its
+        resolved context, template and target formats.
+
+        Raises:
+            exceptions.MetadockContentSchematicParsingException: If schematic names are not unique, or a schematic
+                extends a missing schematic or itself (directly or transitively).
 
         Returns:
-            A dictionary of content schematics, where the keys are the names of the schematics and the values are the
+            A mapping of content schematics, where the keys are the names of the schematics and the values are the
             `MetadockContentSchematic` objects.
         """
-        content_schematic_ymls = self.content_schematics_directory.glob("**/*.yml")
-        content_schematics: dict[str, MetadockContentSchematic] = {}
-
-        for content_schematic_yml in content_schematic_ymls:
-            schematics = MetadockContentSchematic.collect_from_file(content_schematic_yml)
-            for schematic in schematics:
-                if schematic.name in content_schematics:
-                    raise exceptions.MetadockContentSchematicParsingException(
-                        "Got non-unique 'name' key: %s" % schematic.name
-                    )
-                content_schematics[schematic.name] = schematic
+        content_schematics_directory = Path(os.path.normpath(self.content_schematics_directory))
+        content_schematic_ymls = sorted(
+            path
+            for path in self.file_index
+            if path.suffix == ".yml" and path.is_relative_to(content_schematics_directory)
+        )
+        self._load_content_schematic_files(
+            [
+                content_schematic_yml
+                for content_schematic_yml in content_schematic_ymls
+                if content_schematic_yml not in self._content_schematic_files
+            ]
+        )
+        return MetadockContentSchematics(
+            self._content_schematic_files[content_schematic_yml] for content_schematic_yml in content_schematic_ymls
+        )
 
-        return content_schematics
+    @cached_property
+    def cache_directory(self) -> Path:
+        """Path to the .cache directory for the project, holding artifacts which can be regenerated at any time."""
+        return self.directory / ".cache"
 
     @cached_property
-    def generated_documents_directory(self) -> Path:
-        """Path to the generated_documents directory for the project"""
-        return self.directory / "generated_documents"
+    def template_bundle(self) -> Optional["MetadockTemplateBundle"]:
+        """The bundle of precompiled templates produced by `compile`, or None if the templates were never compiled."""
+        templates_tier = self.cache["templates"]
+        if not templates_tier.path(MetadockTemplateBundle.manifest_filename).exists():
+            return None
+        return MetadockTemplateBundle(templates_tier)
 
-    def build(self, schematics: Optional[list[str]] = None) -> MetadockProjectBuildResult:
-        """Build the compiled documents for the specified schematics.
+    def compile(self) -> "list[str]":
+        """Precompiles every templated document into a bundle of Python modules under .metadock/.cache/templates, which
+        is used in place of parsing the template sources for as long as their contents are unchanged.
 
-        Args:
-            schematics (Optional[list[str]]): List of schematic names to build. If None, build all schematics.
-        """
+        Raises:
+            exceptions.MetadockTemplateParsingException: If any template fails to compile.
 
-        if schematics is None:
-            schematics = list(self.content_schematics.keys())
+        Returns:
+            list[str]: Project relative paths of the compiled templates.
+        """
+        bundle_directory = self.cache["templates"].directory
+        self.cache["templates"].clear()
+        self.__dict__.pop("template_bundle", None)
 
-        generated_documents = []
+        template_names = sorted(self.templated_documents)
+        digests = {name: _source_digest(self.templated_documents[name].content()) for name in template_names}
+        try:
+            self.environment.compile_templates(
+                bundle_directory, filter_func=digests.__contains__, zip=None, ignore_errors=False
+            )
+        except jinja2.TemplateSyntaxError as e:
+            raise exceptions.MetadockTemplateParsingException(
+                "Failed to compile jinja2.Template from %s,\n\tdue to exception:\n%s" % (e.name, str(e))
+            )
 
-        for schematic_name in schematics:
-            content_schematic = self.content_schematics[schematic_name]
-            compiled_targets = content_schematic.to_compiled_targets(self)
+        MetadockTemplateBundle.write_manifest(bundle_directory, digests)
+        # Templates already loaded from source are still up to date, so they must be evicted to pick up the bundle.
+        self._clear_template_caches()
+        return template_names
 
-            for target_format, compiled_document in compiled_targets.items():
-                file_extension = MetadockTargetFormatFactory.target_format(target_format).file_extension
-                generated_filepath = self.generated_documents_directory / (schematic_name + "." + file_extension)
-                generated_document = MetadockGeneratedDocument(generated_filepath, str(compiled_document))
-                generated_documents.append(generated_document)
+    def cache_stats(self) -> "list[MetadockCacheTierStats]":
+        """Measures the size of each tier of the project's cache store, along with its hits and misses over every
+        recorded run.
 
-                if not generated_document.status.value == "nochange":
-                    if not generated_filepath.parent.exists():
-                        os.makedirs(generated_filepath.parent)
-                    with generated_filepath.open("w") as handle:
-                        handle.write(str(compiled_document))
+        Returns:
+            list[MetadockCacheTierStats]: The stats of each tier.
+        """
+        return self.cache.stats()
 
-        return MetadockProjectBuildResult(generated_documents=generated_documents)
+    def prune_cache(self, max_size: Optional[int] = None, max_age: Optional[float] = None) -> MetadockCachePruneResult:
+        """Evicts entries from the project's cache store, oldest first, until it is within its limits.
 
-    def clean(self):
-        """Deletes all generated documents in the `generated_documents` project directory.
+        Args:
+            max_size (Optional[int], optional): Size cap of the cache store in bytes. Defaults to `cache_max_size`.
+            max_age (Optional[float], optional): Seconds after which unused entries are evicted. Defaults to
+                `cache_max_age`.
 
-        This method removes all files and subdirectories within the `generated_documents_directory`
-        and recreates the directory afterwards.
+        Returns:
+            MetadockCachePruneResult: Summary of the evicted entries.
         """
-        shutil.rmtree(self.generated_documents_directory)
-        os.makedirs(self.generated_documents_directory)
+        return self.cache.prune(max_size=max_size, max_age=max_age)
 
-    def validate(self) -> MetadockProjectValidationResult:
-        """Validates the Metadock project by checking the existence of required directories.
+    def clear_cache(self, tier_names: Optional["list[str]"] = None):
+        """Evicts every entry of some tiers of the project's cache store.
 
-        Returns:
-            MetadockProjectValidationResult: The validation result containing any failures or warnings.
+        Args:
+            tier_names (Optional[list[str]], optional): Names of the tiers to clear. Defaults to all tiers.
+
+        Raises:
+            exceptions.MetadockProjectException: If a tier name is unknown.
         """
+        unknown_tiers = sorted(set(tier_names or []).difference(self.cache.tiers))
+        if unknown_tiers:
+            raise exceptions.MetadockProjectException(
+                "Unknown cache tier(s): %s (expected any of: %s)"
+                % (", ".join(unknown_tiers), ", ".join(self.cache.tier_names))
+            )
+        self.cache.clear(tier_names)
+        if tier_names is None or "templates" in tier_names:
+            self.__dict__.pop("template_bundle", None)
+            self._clear_template_caches()
 
-        validation_result = MetadockProjectValidationResult()
+    def _clear_template_caches(self):
+        """Evicts the loaded templates from the project's environments, so that they are reloaded."""
+        for environment in (self.environment, self.__dict__.get("async_environment")):
+            if environment is not None and environment.cache is not None:
+                environment.cache.clear()
 
-        if not self.directory.exists():
-            validation_result.append_failure("Could not find .metadock directory: %s" % self.directory)
-            return validation_result
+    @cached_property
+    def generated_documents_directory(self) -> Path:
+        """Path to the generated_documents directory for the project"""
+        return self.directory / "generated_documents"
 
-        if not self.templated_documents_directory.exists():
-            validation_result.append_warning(
-                "Could not find .metadock/templated_documents directory. No templates will be used in compilation."
-            )
+    def refresh(self, paths: Optional[Iterable[Path | str]] = None) -> "list[str]":
+        """Brings the project up to date with the files on disk, re-parsing only what has changed. Content schematic
+        files are reloaded if they, or any file they import, have changed; unchanged files keep their parsed
+        schematics. The templated documents are re-listed if templates were added or removed.
 
-        if not self.content_schematics_directory.exists():
-            validation_result.append_warning(
-                "Could not find .metadock/content_schematics directory. No content will be used in compilation."
-            )
+        Args:
+            paths (Optional[Iterable[Path | str]], optional): Files known to have changed. If None, the project
+                directories are rescanned, and every other file the project has loaded is re-stat'ed.
 
-        if not self.generated_documents_directory.exists():
-            validation_result.append_warning(
-                "Could not find .metadock/generated_documents directory. Creating empty directory now."
-            )
-            os.makedirs(self.generated_documents_directory)
+        Raises:
+            MetadockContentSchematicParsingException: If a changed content schematic file fails to parse. The file is
+                retried on the next refresh.
 
-        return validation_result
+        Returns:
+            list[str]: Names of the content schematics affected by the changed files.
+        """
+        templated_documents_directory = Path(os.path.normpath(self.templated_documents_directory))
+        content_schematics_directory = Path(os.path.normpath(self.content_schematics_directory))
 
-    def list(self, schematic_globs: list[str] = [], template_globs: list[str] = []) -> list[str]:
-        """Retrieves a list of schematics based on the provided glob patterns for schematic names and template names.
+        def in_project_directories(path: Path) -> bool:
+            return path.is_relative_to(templated_documents_directory) or path.is_relative_to(
+                content_schematics_directory
+            )
+
+        if paths is None:
+            self.__dict__.pop("file_index", None)
+            file_index = self.file_index
+            candidates = set(self._file_signatures)
+            # Directories which haven't been loaded yet have nothing to invalidate, so their new files are skipped.
+            if "content_schematics" in self.__dict__:
+                candidates |= {
+                    path
+                    for path in file_index
+                    if path.suffix == ".yml" and path.is_relative_to(content_schematics_directory)
+                }
+            if "templated_documents" in self.__dict__:
+                candidates |= {
+                    path
+                    for path in file_index
+                    if "." in path.name and path.is_relative_to(templated_documents_directory)
+                }
+            current_signatures = {
+                path: file_index.get(path) if in_project_directories(path) else file_signature(path)
+                for path in candidates
+            }
+        else:
+            current_signatures = {
+                path: file_signature(path) for path in {Path(os.path.normpath(path)) for path in paths}
+            }
+            # Keep the file index in step with the changed files, rather than rescanning the directories.
+            file_index = self.__dict__.get("file_index")
+            for path, signature in current_signatures.items() if file_index is not None else []:
+                if not in_project_directories(path):
+                    continue
+                if signature is None:
+                    file_index.pop(path, None)
+                else:
+                    file_index[path] = signature
+
+        changed = {
+            path for path, signature in current_signatures.items() if signature != self._file_signatures.get(path)
+        }
+        if not changed:
+            return []
+
+        for path in changed:
+            if path.is_relative_to(templated_documents_directory) and (
+                path not in self._file_signatures or current_signatures[path] is None
+            ):
+                self.__dict__.pop("templated_documents", None)
+            if path.is_relative_to(content_schematics_directory) and path.suffix == ".yml":
+                self.__dict__.pop("content_schematics", None)
+
+        stale_content_schematic_files = {
+            yaml_path
+            for yaml_path, schematic_file in self._content_schematic_files.items()
+            if yaml_path in changed
+            or any(changed.intersection(schematic.imported_paths) for schematic in schematic_file.constructed())
+        }
+        if stale_content_schematic_files:
+            self.__dict__.pop("content_schematics", None)
+        for yaml_path in stale_content_schematic_files:
+            if not yaml_path.exists():
+                del self._content_schematic_files[yaml_path]
+                self._unsnapshotted_digests.pop(yaml_path, None)
+        self._load_content_schematic_files([path for path in stale_content_schematic_files if path.exists()])
+
+        for path in changed:
+            signature = current_signatures[path]
+            if signature is None:
+                self._file_signatures.pop(path, None)
+            elif path in self._file_signatures:
+                self._file_signatures[path] = signature
+
+        return self.affected_schematics(changed)
+
+    def render(self, schematic_name: str, target_format: Optional[str] = None) -> dict[str, str | bytes]:
+        """Renders the documents for a content schematic in memory, without reading or writing any generated documents.
 
         Args:
-            schematic_globs (list[str], optional): List of glob patterns for schematic names. Defaults to [].
-            template_globs (list[str], optional): List of glob patterns for template names. Defaults to [].
+            schematic_name (str): Name of the content schematic to render.
+            target_format (Optional[str], optional): Identifier of the single target format to render. Defaults to None
+                (render every target format of the schematic).
+
+        Raises:
+            exceptions.MetadockProjectException: If the project has no content schematic with the given name.
 
         Returns:
-            list[str]: A list of unique schematic names matching the provided glob patterns.
+            dict[str, str | bytes]: A dictionary mapping target format identifiers to the post-processed documents.
         """
+        if schematic_name not in self.content_schematics:
+            raise exceptions.MetadockProjectException("Could not find content schematic: %s" % schematic_name)
+        content_schematic = self.content_schematics[schematic_name]
+        target_formats = [target_format] if target_format is not None else None
+        return content_schematic.to_compiled_targets(self, target_formats)
 
-        schematics: list[str] = []
-        for schematic_glob in schematic_globs:
-            schematics += self._query_schematics_by_name_glob(schematic_glob)
-        for template_glob in template_globs:
-            schematics += self._query_schematics_by_template_glob(template_glob)
-        return list(set((schematics)))
-
-    def _query_schematics_by_name_glob(self, schematic_glob: str) -> "list[str]":
-        """Query the content schematics for the project by a glob pattern.
+    def generated_document_path(self, schematic_name: str, target_format: str) -> Path:
+        """Path of the generated document built from a content schematic in a given target format.
 
         Args:
-            schematic_glob (str): The glob pattern to match against schematic names.
+            schematic_name (str): Name of the content schematic.
+            target_format (str): Identifier of the target format.
 
         Returns:
-            list[str]: A list of schematic names that match the glob pattern.
+            Path: Path to the generated document in the generated_documents directory.
         """
-        return [
-            schematic_name
-            for schematic_name in self.content_schematics
-            if fnmatch.fnmatch(schematic_name, schematic_glob)
-        ]
+        file_extension = MetadockTargetFormatFactory.target_format(target_format).file_extension
+        return self.generated_documents_directory / (schematic_name + "." + file_extension)
 
-    def _query_schematics_by_template_glob(self, template_glob: str) -> "list[str]":
-        """Query the content schematics for the project by a glob pattern on the template paths they use.
+    def render_digest(self, schematic_name: str, target_format: str) -> Optional[str]:
+        """Digest of everything which the document built from a content schematic in a given target format depends on:
+        the Metadock and Jinja2 versions, the target format, and the name, template, target formats and resolved
+        context of the schematic, and of every schematic it includes via `ref` (transitively), along with the sources
+        of their templates and of every template those load.
 
         Args:
-            template_glob (str): The glob pattern to match against template paths.
+            schematic_name (str): Name of the content schematic.
+            target_format (str): Identifier of the target format.
 
         Returns:
-            list[str]: A list of schematic names whose template match the glob pattern.
+            Optional[str]: Hex digest identifying the document, or None if it cannot be determined statically, because
+                a template calls `ref` or loads a template with a name which is not a string literal.
         """
-        return [
-            schematic.name
-            for schematic in self.content_schematics.values()
-            if fnmatch.fnmatch(schematic.template, template_glob)
-        ]
+        inputs_digest = self._render_inputs_digest(schematic_name)
+        if inputs_digest is None:
+            return None
+        return _render_digest(inputs_digest, target_format)
 
+    def _render_inputs_digest(self, schematic_name: str) -> Optional[str]:
+        """Digest of the content schematics and templates which the documents built from a content schematic depend on,
+        regardless of their target format. See `render_digest`.
 
-class MetadockTemplatedDocument(pydantic.BaseModel):
-    """Core abstraction which represents a templated document in a Metadock project.
+        Args:
+            schematic_name (str): Name of the content schematic.
 
-    Attributes:
-        absolute_path (Path): The absolute path to the templated document.
+        Returns:
+            Optional[str]: Hex digest of the inputs, or None if they cannot be determined statically.
+        """
+        inputs = self._render_inputs(schematic_name)
+        return _inputs_digest(inputs) if inputs is not None else None
+
+    def _render_inputs(
+        self, schematic_name: str, schematic_digests: Optional[dict[str, str]] = None
+    ) -> Optional[dict[str, str]]:
+        """Digests of the content schematics and templates which the documents built from a content schematic depend
+        on, regardless of their target format. See `render_digest`.
+
+        Args:
+            schematic_name (str): Name of the content schematic.
+            schematic_digests (Optional[dict[str, str]], optional): Digests of the content schematics digested so far,
+                keyed by name, which are reused and added to, e.g. by the schematics of a single build. Defaults to
+                None (digest every schematic).
+
+        Returns:
+            Optional[dict[str, str]]: Digest of each input, keyed by `schematic:<name>` or `template:<path>`, or None if
+                the inputs cannot be determined statically.
+        """
+        inputs: dict[str, str] = {}
+        schematic_names: set[str] = set()
+        pending: list[str] = [schematic_name]
+        while pending:
+            current = pending.pop()
+            if current in schematic_names or current not in self.content_schematics:
+                continue
+            schematic_names.add(current)
+            pending += self._referenced_schematics(current)
+
+        schematic_digests = schematic_digests if schematic_digests is not None else {}
+        for name in sorted(schematic_names):
+            schematic = self.content_schematics[name]
+            if name not in schematic_digests:
+                schematic_digests[name] = _source_digest(
+                    json.dumps(
+                        [name, schematic.template, schematic.target_formats, schematic.context],
+                        sort_keys=True,
+                        default=self._context_digest_default,
+                    )
+                )
+            inputs["schematic:" + name] = schematic_digests[name]
+            for template_name in sorted(self._template_closure(schematic.template)):
+                templated_document = self.templated_documents.get(template_name)
+                if templated_document is not None and templated_document.has_dynamic_references(self):
+                    return None
+                template_digest = self._memoized_file_digest(self.templated_documents_directory / template_name)
+                inputs["template:" + template_name] = str(template_digest)
+        return inputs
+
+    def _context_digest_default(self, obj: Any) -> Any:
+        """Serializes the objects in a resolved context which JSON cannot, for digesting the context.
+
+        Args:
+            obj (Any): The object to serialize.
+
+        Returns:
+            Any: A JSON serializable stand-in for the object; streamed imports are identified by their file's digest.
+        """
+        if isinstance(obj, yaml_utils.StreamedRows):
+            return [str(obj.path), obj.key, obj.normalize, self._memoized_file_digest(obj.path)]
+        return repr(obj)
+
+    def _memoized_file_digest(self, path: Path) -> Optional[str]:
+        """Digest identifying the content of a file, which is only read again once its modification time or size
+        change, so that files shared by many schematics, such as streamed imports, are digested once.
+
+        Args:
+            path (Path): Path to the file.
+
+        Returns:
+            Optional[str]: Hex digest of the file's content, or None if the file cannot be read.
+        """
+        signature = file_signature(path)
+        if signature is None:
+            return None
+        cached = self._file_digests.get(path)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        digest = _file_digest(path)
+        if digest is not None:
+            self._file_digests[path] = (signature, digest)
+        return digest
+
+    def _render_through_cache(self, schematic_name: str, inputs: Optional[dict[str, str]]) -> dict[str, str | bytes]:
+        """Renders the documents for a content schematic, copying them from the render cache if it holds all of them,
+        and adding them to the cache otherwise.
+
+        Args:
+            schematic_name (str): Name of the content schematic to render.
+            inputs (Optional[dict[str, str]]): Digests of the schematic's inputs (see `_render_inputs`), or None if they
+                cannot be determined statically.
+
+        Returns:
+            dict[str, str | bytes]: A dictionary mapping target format identifiers to the post-processed documents.
+        """
+        if self.render_cache is None or inputs is None or schematic_name not in self.content_schematics:
+            return self.render(schematic_name)
+
+        inputs_digest = _inputs_digest(inputs)
+        digests: dict[str, str] = {}
+        for target_format in self.content_schematics[schematic_name].target_formats:
+            identifier = MetadockTargetFormatFactory.target_format(target_format).identifier
+            digests[identifier] = _render_digest(inputs_digest, identifier)
+
+        cached_targets = {identifier: self.render_cache.get(digest) for identifier, digest in digests.items()}
+        if None not in cached_targets.values():
+            self.render_cache.hits += 1
+            return cached_targets
+
+        self.render_cache.misses += 1
+        compiled_targets = self.render(schematic_name)
+        for identifier, compiled_document in compiled_targets.items():
+            self.render_cache.set(digests[identifier], str(compiled_document))
+        return compiled_targets
+
+    def build(self, schematics: Optional[list[str]] = None, write: bool = True) -> MetadockProjectBuildResult:
+        """Build the compiled documents for the specified schematics.
+
+        Args:
+            schematics (Optional[list[str]]): List of schematic names to build. If None, build all schematics.
+            write (bool, optional): Whether to write new and updated documents to the generated_documents directory.
+                If False, the change status of each document is still reported. Defaults to True.
+        """
+
+        if schematics is None:
+            schematics = list(self.content_schematics.keys())
+
+        generated_documents = []
+        manifest_entries: dict[str, MetadockBuildManifestEntry] = {}
+        schematic_digests: dict[str, str] = {}
+        cache_stats = self._cache_stats()
+
+        for schematic_name in schematics:
+            inputs = None
+            if write or self.render_cache is not None:
+                inputs = self._render_inputs(schematic_name, schematic_digests)
+            compiled_targets = self._render_through_cache(schematic_name, inputs)
+
+            for target_format, compiled_document in compiled_targets.items():
+                generated_filepath = self.generated_document_path(schematic_name, target_format)
+                generated_document = MetadockGeneratedDocument(generated_filepath, str(compiled_document))
+                generated_documents.append(generated_document)
+
+                if write and not generated_document.status.value == "nochange":
+                    self._write_generated_document(generated_filepath, str(compiled_document))
+            if write:
+                manifest_entries |= self._build_manifest_entries(schematic_name, compiled_targets, inputs)
+
+        build_result = self._build_result(generated_documents, cache_stats)
+        if write:
+            self._update_build_manifest(manifest_entries)
+            self._save_cache_entries()
+            build_result.cache_evictions = self._maintain_cache().evicted_entries
+        return build_result
+
+    async def arender(
+        self, schematic_name: str, target_format: Optional[str] = None, executor: Optional[Executor] = None
+    ) -> dict[str, str | bytes]:
+        """Coroutine version of `render`, which renders the documents in an executor so as not to block the event loop.
+
+        Args:
+            schematic_name (str): Name of the content schematic to render.
+            target_format (Optional[str], optional): Identifier of the single target format to render. Defaults to None
+                (render every target format of the schematic).
+            executor (Optional[Executor], optional): Executor to render in. Defaults to the event loop's default
+                executor.
+
+        Returns:
+            dict[str, str | bytes]: A dictionary mapping target format identifiers to the post-processed documents.
+        """
+        loop = asyncio.get_running_loop()
+        if "content_schematics" not in self.__dict__ or "templated_documents" not in self.__dict__:
+            await loop.run_in_executor(executor, self._index)
+        return await loop.run_in_executor(executor, self.render, schematic_name, target_format)
+
+    def _index(self) -> "list[str]":
+        """Indexes the project's templated documents and content schematics, unless they are already indexed. Calls are
+        serialized, so that concurrent renders in an executor don't race to populate the project's lazily loaded
+        attributes.
+
+        Returns:
+            list[str]: Names of the project's content schematics.
+        """
+        with self._index_lock:
+            self.templated_documents
+            return list(self.content_schematics)
+
+    async def abuild(
+        self, schematics: Optional[list[str]] = None, write: bool = True, executor: Optional[Executor] = None
+    ) -> MetadockProjectBuildResult:
+        """Coroutine version of `build`. Templates are rendered in an executor, and generated documents are read and
+        written in worker threads. Cancelling the coroutine stops the build before the next document is rendered or
+        written; a render already running in the executor is left to finish, but its result is discarded.
+
+        Args:
+            schematics (Optional[list[str]]): List of schematic names to build. If None, build all schematics.
+            write (bool, optional): Whether to write new and updated documents to the generated_documents directory.
+                Defaults to True.
+            executor (Optional[Executor], optional): Executor to render in. Defaults to the event loop's default
+                executor.
+        """
+        loop = asyncio.get_running_loop()
+        # Index the project up front, so that renders in the executor don't race to populate its caches.
+        all_schematics = await loop.run_in_executor(executor, self._index)
+
+        if schematics is None:
+            schematics = all_schematics
+
+        generated_documents = []
+        manifest_entries: dict[str, MetadockBuildManifestEntry] = {}
+        schematic_digests: dict[str, str] = {}
+        cache_stats = self._cache_stats()
+
+        for schematic_name in schematics:
+            inputs = None
+            if write or self.render_cache is not None:
+                inputs = await loop.run_in_executor(executor, self._render_inputs, schematic_name, schematic_digests)
+            compiled_targets = await loop.run_in_executor(executor, self._render_through_cache, schematic_name, inputs)
+            if write:
+                manifest_entries |= self._build_manifest_entries(schematic_name, compiled_targets, inputs)
+
+            for target_format, compiled_document in compiled_targets.items():
+                generated_filepath = self.generated_document_path(schematic_name, target_format)
+                previous_content = await asyncio.to_thread(_read_text_if_exists, generated_filepath)
+                generated_document = MetadockGeneratedDocument.from_previous_content(
+                    generated_filepath, str(compiled_document), previous_content
+                )
+                generated_documents.append(generated_document)
+
+                if write and not generated_document.status.value == "nochange":
+                    await asyncio.to_thread(self._write_generated_document, generated_filepath, str(compiled_document))
+
+        build_result = self._build_result(generated_documents, cache_stats)
+        if write:
+            await asyncio.to_thread(self._update_build_manifest, manifest_entries)
+            await asyncio.to_thread(self._save_cache_entries)
+            build_result.cache_evictions = (await asyncio.to_thread(self._maintain_cache)).evicted_entries
+        return build_result
+
+    def plan(self, schematics: Optional[list[str]] = None) -> MetadockBuildPlan:
+        """Plans a build of the specified schematics without writing any document, telling for each document whether
+        it would be new, updated or unchanged, and why. Documents whose inputs and content are unchanged since they
+        were last built, according to the build manifest, are SKIPPED without rendering them, and documents held by the
+        render cache are compared without rendering them; every other document is rendered. Planning is a dry run: it
+        writes neither documents nor the build manifest.
+
+        Args:
+            schematics (Optional[list[str]]): List of schematic names to plan. If None, plan all schematics.
+
+        Returns:
+            MetadockBuildPlan: The build plan.
+        """
+        if schematics is None:
+            schematics = list(self.content_schematics.keys())
+
+        build_manifest = self.read_build_manifest()
+        build_plan = MetadockBuildPlan()
+        schematic_digests: dict[str, str] = {}
+        for schematic_name in schematics:
+            build_plan.documents += self._plan_documents(schematic_name, build_manifest, schematic_digests)
+        return build_plan
+
+    @cached_property
+    def build_manifest_path(self) -> Path:
+        """Path to the build manifest, recording the documents written by the project's builds."""
+        return self.cache_directory / "build_manifest.json"
+
+    def read_build_manifest(self) -> MetadockBuildManifest:
+        """Reads the build manifest.
+
+        Returns:
+            MetadockBuildManifest: The build manifest, or an empty one if there is no readable build manifest.
+        """
+        try:
+            return MetadockBuildManifest.model_validate_json(self.build_manifest_path.read_text())
+        except (OSError, pydantic.ValidationError):
+            return MetadockBuildManifest()
+
+    def _plan_documents(
+        self,
+        schematic_name: str,
+        build_manifest: MetadockBuildManifest,
+        schematic_digests: dict[str, str],
+    ) -> "list[MetadockPlannedDocument]":
+        """Plans the documents built from a content schematic, rendering the schematic at most once.
+
+        Args:
+            schematic_name (str): Name of the content schematic.
+            build_manifest (MetadockBuildManifest): The build manifest.
+            schematic_digests (dict[str, str]): Digests of the content schematics digested so far by the plan.
+
+        Returns:
+            list[MetadockPlannedDocument]: The planned documents, one per target format.
+        """
+        inputs = self._render_inputs(schematic_name, schematic_digests)
+        inputs_digest = _inputs_digest(inputs) if inputs is not None else None
+        compiled_targets: Optional[dict[str, str | bytes]] = None
+
+        planned_documents = []
+        for target_format in self.content_schematics[schematic_name].target_formats:
+            identifier = MetadockTargetFormatFactory.target_format(target_format).identifier
+            generated_filepath = self.generated_document_path(schematic_name, identifier)
+            relative_path = generated_filepath.relative_to(self.generated_documents_directory).as_posix()
+            render_digest = _render_digest(inputs_digest, identifier) if inputs_digest is not None else None
+            current_digest = _file_digest(generated_filepath)
+            entry = build_manifest.documents.get(relative_path)
+            changed_inputs = []
+            if entry is not None and inputs is not None:
+                changed_inputs = sorted(
+                    key for key in inputs.keys() | entry.inputs.keys() if inputs.get(key) != entry.inputs.get(key)
+                )
+            planned_document = MetadockPlannedDocument(
+                schematic=schematic_name,
+                path=relative_path,
+                status=PlannedDocumentStatus.NEW,
+                reason="the generated document does not exist",
+                changed_inputs=changed_inputs,
+            )
+            planned_documents.append(planned_document)
+            if current_digest is None:
+                continue
+            if (
+                entry is not None
+                and render_digest is not None
+                and (entry.render_digest, entry.digest)
+                == (
+                    render_digest,
+                    current_digest,
+                )
+            ):
+                planned_document.status = PlannedDocumentStatus.SKIPPED
+                planned_document.reason = "its inputs and the generated document are unchanged since the last build"
+                continue
+
+            content = None
+            if self.render_cache is not None and render_digest is not None:
+                content = self.render_cache.get(render_digest)
+            if content is None:
+                if compiled_targets is None:
+                    compiled_targets = self.render(schematic_name)
+                content = str(compiled_targets[identifier])
+                planned_document.rendered = True
+            planned_document.status = PlannedDocumentStatus.UPDATE
+            if _source_digest(content) == current_digest:
+                planned_document.status = PlannedDocumentStatus.NOCHANGE
+            if inputs is None:
+                planned_document.reason = (
+                    "its inputs cannot be determined statically, since a template calls ref or loads a computed name"
+                )
+            elif entry is None:
+                planned_document.reason = "no previous build of the document is recorded"
+            elif changed_inputs:
+                planned_document.reason = "its inputs changed since the last build: %s" % ", ".join(changed_inputs)
+            elif entry.render_digest != render_digest:
+                planned_document.reason = "the Metadock or Jinja2 version changed since the last build"
+            else:
+                planned_document.reason = "the generated document was modified since the last build"
+        return planned_documents
+
+    def _build_manifest_entries(
+        self, schematic_name: str, compiled_targets: dict[str, str | bytes], inputs: Optional[dict[str, str]]
+    ) -> dict[str, MetadockBuildManifestEntry]:
+        """Records the documents built from a content schematic, for the build manifest.
+
+        Args:
+            schematic_name (str): Name of the content schematic.
+            compiled_targets (dict[str, str | bytes]): The built documents, keyed by target format identifier.
+            inputs (Optional[dict[str, str]]): Digests of the schematic's inputs (see `_render_inputs`), or None if they
+                cannot be determined statically.
+
+        Returns:
+            dict[str, MetadockBuildManifestEntry]: Record of each document, keyed by its path relative to the
+                generated_documents directory.
+        """
+        inputs_digest = _inputs_digest(inputs) if inputs is not None else None
+        return {
+            self.generated_document_path(schematic_name, target_format)
+            .relative_to(self.generated_documents_directory)
+            .as_posix(): MetadockBuildManifestEntry(
+                schematic=schematic_name,
+                target_format=target_format,
+                render_digest=_render_digest(inputs_digest, target_format) if inputs_digest is not None else None,
+                inputs=inputs or {},
+                digest=_source_digest(str(compiled_document)),
+            )
+            for target_format, compiled_document in compiled_targets.items()
+        }
+
+    def _update_build_manifest(self, manifest_entries: dict[str, MetadockBuildManifestEntry]):
+        """Adds the records of newly written documents to the build manifest, serializing the update with concurrent
+        builds. Failures to write the manifest (e.g. in a read-only checkout) are ignored.
+
+        Args:
+            manifest_entries (dict[str, MetadockBuildManifestEntry]): Record of each document, keyed by its path
+                relative to the generated_documents directory.
+        """
+        if not manifest_entries:
+            return
+        try:
+            with self.cache.locked():
+                build_manifest = self.read_build_manifest()
+                build_manifest.documents |= manifest_entries
+                write_atomically(self.build_manifest_path, build_manifest.model_dump_json(indent=2).encode())
+        except OSError:
+            pass
+
+    def _cache_stats(self) -> tuple[int, int, int, int]:
+        """Current hit and miss counts of the project's caches.
+
+        Returns:
+            tuple[int, int, int, int]: Fragment cache hits and misses, then render cache hits and misses.
+        """
+        render_cache_stats = (
+            (self.render_cache.hits, self.render_cache.misses) if self.render_cache is not None else (0, 0)
+        )
+        return (self.fragment_cache.hits, self.fragment_cache.misses) + render_cache_stats
+
+    def _build_result(
+        self, generated_documents: list[MetadockGeneratedDocument], cache_stats: tuple[int, int, int, int]
+    ) -> MetadockProjectBuildResult:
+        """Summarizes a build, counting the cache hits and misses since the build started.
+
+        Args:
+            generated_documents (list[MetadockGeneratedDocument]): The documents generated by the build.
+            cache_stats (tuple[int, int, int, int]): Cache hits and misses when the build started, from `_cache_stats`.
+
+        Returns:
+            MetadockProjectBuildResult: The build result.
+        """
+        hits_and_misses = [current - start for current, start in zip(self._cache_stats(), cache_stats)]
+        return MetadockProjectBuildResult(
+            generated_documents=generated_documents,
+            fragment_cache_hits=hits_and_misses[0],
+            fragment_cache_misses=hits_and_misses[1],
+            render_cache_hits=hits_and_misses[2],
+            render_cache_misses=hits_and_misses[3],
+        )
+
+    def _maintain_cache(self) -> MetadockCachePruneResult:
+        """Records the usage of the project's cache store after a build, and prunes it if it has any limits. Only
+        builds which write their documents maintain the cache, so that builds with `write=False` leave it untouched.
+
+        Returns:
+            MetadockCachePruneResult: Summary of the evicted entries.
+        """
+        self.cache.record_usage()
+        if self.cache.max_size is None and self.cache.max_age is None:
+            return MetadockCachePruneResult()
+        return self.cache.prune()
+
+    def _write_generated_document(self, generated_filepath: Path, content: str):
+        """Writes a generated document, creating its parent directories if needed.
+
+        Args:
+            generated_filepath (Path): Path to the generated document.
+            content (str): Content of the generated document.
+        """
+        if not generated_filepath.parent.exists():
+            os.makedirs(generated_filepath.parent)
+        with generated_filepath.open("w") as handle:
+            handle.write(content)
+
+    def clean(self):
+        """Deletes all generated documents in the `generated_documents` project directory.
+
+        This method removes all files and subdirectories within the `generated_documents_directory`
+        and recreates the directory afterwards.
+        """
+        shutil.rmtree(self.generated_documents_directory)
+        os.makedirs(self.generated_documents_directory)
+
+    def validate(self) -> MetadockProjectValidationResult:
+        """Validates the Metadock project by checking the existence of required directories.
+
+        Returns:
+            MetadockProjectValidationResult: The validation result containing any failures or warnings.
+        """
+
+        validation_result = MetadockProjectValidationResult()
+
+        if not self.directory.exists():
+            validation_result.append_failure("Could not find .metadock directory: %s" % self.directory)
+            return validation_result
+
+        if not self.templated_documents_directory.exists():
+            validation_result.append_warning(
+                "Could not find .metadock/templated_documents directory. No templates will be used in compilation."
+            )
+
+        if not self.content_schematics_directory.exists():
+            validation_result.append_warning(
+                "Could not find .metadock/content_schematics directory. No content will be used in compilation."
+            )
+
+        if not self.generated_documents_directory.exists():
+            validation_result.append_warning(
+                "Could not find .metadock/generated_documents directory. Creating empty directory now."
+            )
+            os.makedirs(self.generated_documents_directory)
+
+        return validation_result
+
+    def memory_report(self) -> "MetadockContextMemoryReport":
+        """Measures the memory held by the contexts of the project's content schematics.
+
+        Returns:
+            MetadockContextMemoryReport: The memory report.
+        """
+        return MetadockContextMemoryReport.from_contexts(
+            [schematic.context for schematic in self.content_schematics.values()]
+        )
+
+    def list(self, schematic_globs: list[str] = [], template_globs: list[str] = []) -> list[str]:
+        """Retrieves a list of schematics based on the provided glob patterns for schematic names and template names.
+
+        Args:
+            schematic_globs (list[str], optional): List of glob patterns for schematic names. Defaults to [].
+            template_globs (list[str], optional): List of glob patterns for template names. Defaults to [].
+
+        Returns:
+            list[str]: A list of unique schematic names matching the provided glob patterns.
+        """
+
+        schematics: list[str] = []
+        for schematic_glob in schematic_globs:
+            schematics += self._query_schematics_by_name_glob(schematic_glob)
+        for template_glob in template_globs:
+            schematics += self._query_schematics_by_template_glob(template_glob)
+        return list(set((schematics)))
+
+    def shard(self, schematics: "list[str]", index: int, shard_count: int) -> "list[str]":
+        """Deterministically partitions content schematics into `shard_count` shards, and returns those of one shard.
+        Schematics which are connected through `ref` calls (in either direction, directly or transitively) are kept on
+        the same shard, so that no shard renders a document which another shard also builds. The groups of connected
+        schematics are assigned to shards largest first, each to the shard with the fewest schematics so far.
+
+        Args:
+            schematics (list[str]): Names of the content schematics to partition.
+            index (int): Index of the shard to return, from 1 to `shard_count`.
+            shard_count (int): Number of shards to partition the schematics into.
+
+        Raises:
+            exceptions.MetadockProjectException: If the shard index is out of range.
+
+        Returns:
+            list[str]: Sorted names of the content schematics in the shard.
+        """
+        if not 1 <= index <= shard_count:
+            raise exceptions.MetadockProjectException("Invalid shard %d/%d" % (index, shard_count))
+
+        selected = sorted(set(schematics))
+        neighbours: dict[str, set[str]] = {name: set() for name in selected}
+        pending = list(selected)
+        while pending:
+            name = pending.pop()
+            if name not in self.content_schematics:
+                continue
+            for referenced in self._referenced_schematics(name):
+                if referenced not in neighbours:
+                    neighbours[referenced] = set()
+                    pending.append(referenced)
+                neighbours[name].add(referenced)
+                neighbours[referenced].add(name)
+
+        groups: list[list[str]] = []
+        grouped: set[str] = set()
+        for name in selected:
+            if name in grouped:
+                continue
+            component, component_pending = {name}, [name]
+            while component_pending:
+                for neighbour in neighbours[component_pending.pop()] - component:
+                    component.add(neighbour)
+                    component_pending.append(neighbour)
+            grouped |= component
+            groups.append(sorted(component.intersection(selected)))
+
+        shards: list[list[str]] = [[] for _ in range(shard_count)]
+        for group in sorted(groups, key=lambda group: (-len(group), group[0])):
+            min(shards, key=len).extend(group)
+        return sorted(shards[index - 1])
+
+    def shard_manifest_path(self, index: int, shard_count: int) -> Path:
+        """Path of the manifest written by a shard of a sharded build.
+
+        Args:
+            index (int): Index of the shard, from 1 to `shard_count`.
+            shard_count (int): Number of shards.
+
+        Returns:
+            Path: Path to the shard's manifest in the .cache directory.
+        """
+        return self.cache_directory / "shards" / ("%d-of-%d.json" % (index, shard_count))
+
+    def write_shard_manifest(
+        self, build_result: MetadockProjectBuildResult, schematics: "list[str]", index: int, shard_count: int
+    ) -> Path:
+        """Writes the manifest of the documents generated by a shard of a sharded build.
+
+        Args:
+            build_result (MetadockProjectBuildResult): Result of the shard's build.
+            schematics (list[str]): Names of the content schematics built by the shard.
+            index (int): Index of the shard, from 1 to `shard_count`.
+            shard_count (int): Number of shards.
+
+        Returns:
+            Path: Path to the written manifest.
+        """
+        manifest = MetadockShardManifest(
+            shard_count=shard_count,
+            shards=[index],
+            schematics=sorted(schematics),
+            documents={
+                generated_document.path.relative_to(self.generated_documents_directory).as_posix(): _file_digest(
+                    generated_document.path
+                )
+                for generated_document in build_result.generated_documents
+            },
+        )
+        manifest_path = self.shard_manifest_path(index, shard_count)
+        os.makedirs(manifest_path.parent, exist_ok=True)
+        manifest_path.write_text(manifest.model_dump_json(indent=2))
+        return manifest_path
+
+    def merge_shard_manifests(self, manifest_paths: "list[Path | str]") -> MetadockShardManifest:
+        """Merges the manifests written by every shard of a sharded build, once their generated documents have been
+        gathered into the generated_documents directory, and writes the merged manifest next to the shard manifests.
+
+        Args:
+            manifest_paths (list[Path | str]): Paths to the manifests of the shards.
+
+        Raises:
+            exceptions.MetadockProjectException: If the manifests cannot be merged, if any shard is missing, or if a
+                generated document is missing or differs from the one its shard generated.
+
+        Returns:
+            MetadockShardManifest: The merged manifest.
+        """
+        manifests: list[MetadockShardManifest] = []
+        for manifest_path in manifest_paths:
+            try:
+                manifests.append(MetadockShardManifest.model_validate_json(Path(manifest_path).read_text()))
+            except (OSError, pydantic.ValidationError) as e:
+                raise exceptions.MetadockProjectException("Could not read shard manifest %s: %s" % (manifest_path, e))
+
+        merged = MetadockShardManifest.merge(manifests)
+        if not merged.complete:
+            missing = sorted(set(range(1, merged.shard_count + 1)) - set(merged.shards))
+            raise exceptions.MetadockProjectException(
+                "Missing manifests of shards: %s"
+                % ", ".join("%d/%d" % (index, merged.shard_count) for index in missing)
+            )
+        for relative_path, digest in merged.documents.items():
+            if _file_digest(self.generated_documents_directory / relative_path) != digest:
+                raise exceptions.MetadockProjectException(
+                    "Generated document is missing or differs from its shard's manifest: %s" % relative_path
+                )
+
+        merged_path = self.cache_directory / "shards" / "manifest.json"
+        os.makedirs(merged_path.parent, exist_ok=True)
+        merged_path.write_text(merged.model_dump_json(indent=2))
+        return merged
+
+    def dependencies(self, schematic_name: str) -> set[Path]:
+        """Collects the files which determine the content of the documents generated from a content schematic: the
+        YAML file defining it, any files it imports, its template, and any templates which that template includes,
+        imports or extends. The dependencies of any documents it includes via `ref` are collected transitively.
+
+        Args:
+            schematic_name (str): Name of the content schematic.
+
+        Returns:
+            set[Path]: Paths of the files the content schematic depends on.
+        """
+        dependencies: set[Path] = set()
+        visited: set[str] = set()
+        pending: list[str] = [schematic_name]
+
+        while pending:
+            current = pending.pop()
+            if current in visited or current not in self.content_schematics:
+                continue
+            visited.add(current)
+            dependencies |= self._direct_dependencies(current)
+            pending += self._referenced_schematics(current)
+
+        return dependencies
+
+    def loaded_source_paths(self) -> "set[Path]":
+        """Collects the content schematics files loaded so far, and the files imported by the content schematics which
+        have been constructed. Schematics which have yet to be constructed are left so; their imports are read once
+        they are, so changes to them until then don't matter.
+
+        Returns:
+            set[Path]: Normalized paths of the loaded files.
+        """
+        paths = set(self._content_schematic_files)
+        for schematic_file in list(self._content_schematic_files.values()):
+            for schematic in schematic_file.constructed():
+                paths.update(schematic.imported_paths)
+        return paths
+
+    def affected_schematics(self, changed_paths: Iterable[Path | str]) -> "list[str]":
+        """Determines which content schematics need to be rebuilt after the given files have changed. A schematic is
+        affected if it depends on a changed file, or if it includes (via `ref`) a document which is affected.
+
+        Args:
+            changed_paths (Iterable[Path | str]): Paths of the files which were created, modified or deleted.
+
+        Returns:
+            list[str]: Names of the affected content schematics.
+        """
+        changed = {Path(os.path.normpath(path)) for path in changed_paths}
+        affected = {name for name in self.content_schematics if self._direct_dependencies(name) & changed}
+
+        referenced_by: dict[str, set[str]] = {}
+        for name in self.content_schematics:
+            for referenced in self._referenced_schematics(name):
+                referenced_by.setdefault(referenced, set()).add(name)
+
+        pending = list(affected)
+        while pending:
+            for referrer in referenced_by.get(pending.pop(), set()):
+                if referrer not in affected:
+                    affected.add(referrer)
+                    pending.append(referrer)
+
+        return sorted(affected)
+
+    def affected_since(self, ref: str) -> "list[str]":
+        """Determines which content schematics are affected by the files which changed since a git revision, according
+        to the git repository containing the project (see `git.changed_paths_since`).
+
+        Args:
+            ref (str): The git revision, e.g. `origin/main`.
+
+        Raises:
+            exceptions.MetadockProjectException: If git is not installed, the project is not in a git repository, or
+                the revision is unknown.
+
+        Returns:
+            list[str]: Names of the affected content schematics.
+        """
+        # Express the changed paths the way the project's own paths are, which may be relative and contain symlinks.
+        real_directory = os.path.realpath(self.directory)
+        return self.affected_schematics(
+            self.directory / os.path.relpath(os.path.realpath(path), real_directory)
+            for path in git.changed_paths_since(ref, self.directory)
+        )
+
+    def _direct_dependencies(self, schematic_name: str) -> set[Path]:
+        """Files which a single content schematic depends on, not accounting for its `ref` calls.
+
+        Args:
+            schematic_name (str): Name of the content schematic.
+
+        Returns:
+            set[Path]: Normalized paths of the schematic's YAML file, its imports, its template and the templates which
+                its template loads.
+        """
+        schematic = self.content_schematics[schematic_name]
+        dependencies = set(schematic.imported_paths)
+        dependencies |= {
+            self.templated_documents_directory / name for name in self._template_closure(schematic.template)
+        }
+        if schematic.source_path is not None:
+            dependencies.add(schematic.source_path)
+        return {Path(os.path.normpath(path)) for path in dependencies}
+
+    def _referenced_schematics(self, schematic_name: str) -> set[str]:
+        """Names of the documents which the template of a content schematic, or any template it loads, includes via
+        `ref`.
+
+        Args:
+            schematic_name (str): Name of the content schematic.
+
+        Returns:
+            set[str]: Names of the referenced content schematics, or an empty set if the template does not exist.
+        """
+        referenced: set[str] = set()
+        for template_name in self._template_closure(self.content_schematics[schematic_name].template):
+            templated_document = self.templated_documents.get(template_name)
+            if templated_document is not None:
+                referenced |= templated_document.referenced_schematics(self)
+        return referenced
+
+    def _template_closure(self, template_name: str) -> set[str]:
+        """Names of a template and every template it loads, directly or transitively, via `include`, `import`,
+        `from` or `extends` tags with literal names. Loaded templates which do not exist are included, so that
+        creating them is recognized as a change.
+
+        Args:
+            template_name (str): Project relative path of the template.
+
+        Returns:
+            set[str]: Project relative paths of the template and the templates it loads.
+        """
+        closure: set[str] = set()
+        pending = [template_name]
+        while pending:
+            current = pending.pop()
+            if current in closure:
+                continue
+            closure.add(current)
+            templated_document = self.templated_documents.get(current)
+            if templated_document is not None:
+                pending += templated_document.referenced_templates(self)
+        return closure
+
+    def _template_ast(self, templated_document: "MetadockTemplatedDocument") -> jinja2.nodes.Template:
+        """Parses a templated document, reusing the previous parse for as long as the file is unchanged.
+
+        Args:
+            templated_document (MetadockTemplatedDocument): The templated document to parse.
+
+        Raises:
+            exceptions.MetadockTemplateParsingException: If parsing the Jinja2 template fails.
+
+        Returns:
+            jinja2.nodes.Template: The template's abstract syntax tree.
+        """
+        signature = file_signature(templated_document.absolute_path)
+        cached = self._template_asts.get(templated_document.absolute_path)
+        if cached is not None and signature is not None and cached[0] == signature:
+            return cached[1]
+        try:
+            template_ast = self.environment.parse(templated_document.content())
+        except Exception as e:
+            raise exceptions.MetadockTemplateParsingException(
+                "Failed to parse jinja2.Template from %s,\n\tdue to exception:\n%s"
+                % (templated_document.project_relative_path, str(e))
+            )
+        self._template_asts[templated_document.absolute_path] = (signature, template_ast)
+        return template_ast
+
+    def _load_content_schematic_files(self, yaml_paths: "list[Path]"):
+        """Indexes content schematics files, in the project's executor if it has one, and caches them. The files are
+        cached in sorted order, so that if any fail to parse, the error raised is that of the first failing file, and
+        the files before it are cached, regardless of the order in which the executor parsed them.
+
+        Files parsed in the executor also have every schematic constructed (resolving their imports) in the executor,
+        so that the workers send back plain resolved contexts rather than YAML node graphs, which are many times larger
+        to transfer than the files they were composed from.
+
+        Args:
+            yaml_paths (list[Path]): Normalized paths to the content schematics files.
+
+        Raises:
+            exceptions.MetadockContentSchematicParsingException: If a content schematics file fails to parse.
+        """
+        yaml_paths = sorted(yaml_paths)
+        file_index = self.__dict__.get("file_index", {})
+        arguments = [
+            (
+                yaml_path,
+                self.cache["schematics"].path(self._schematics_snapshot_key(yaml_path))
+                if self.snapshot_schematics
+                else None,
+                self.directory,
+                self.compact_contexts,
+                file_index.get(yaml_path),
+            )
+            for yaml_path in yaml_paths
+        ]
+        futures: list[Future] = []
+        if self.executor is not None and len(arguments) > 1:
+            futures = [self.executor.submit(self._read_content_schematic_file, *args, True) for args in arguments]
+            results = (future.result() for future in futures)
+        else:
+            results = (self._read_content_schematic_file(*args) for args in arguments)
+
+        try:
+            for yaml_path, (signature, source_digest, schematic_file) in zip(yaml_paths, results):
+                if signature is not None:
+                    self._file_signatures[yaml_path] = signature
+                if source_digest is not None:
+                    self._unsnapshotted_digests[yaml_path] = source_digest
+                else:
+                    self._unsnapshotted_digests.pop(yaml_path, None)
+                if self.snapshot_schematics:
+                    self.cache["schematics"].record(hit=source_digest is None)
+                self._content_schematic_files[yaml_path] = schematic_file
+                self._content_schematics_constructed(schematic_file, schematic_file.constructed())
+                schematic_file.on_construct = self._content_schematics_constructed
+        finally:
+            # Don't leave the executor parsing files which follow a failing one.
+            for future in futures:
+                future.cancel()
+
+    @classmethod
+    def _read_content_schematic_file(
+        cls,
+        yaml_path: Path,
+        snapshot_path: Optional[Path],
+        directory: Path,
+        compact: bool,
+        signature: Optional[FileSignature] = None,
+        construct: bool = False,
+    ) -> "tuple[Optional[FileSignature], Optional[str], MetadockContentSchematicFile]":
+        """Indexes a content schematics file, from its snapshot if it has an up-to-date one. Only depends on its
+        arguments, so that it can run in a worker process.
+
+        Args:
+            yaml_path (Path): Normalized path to the content schematics file.
+            snapshot_path (Optional[Path]): Path to the file's snapshot, or None if snapshots are disabled.
+            directory (Path): Directory of the project.
+            compact (bool): Whether to compact the contexts of the schematics.
+            signature (Optional[FileSignature], optional): Signature of the file, if it was already taken (e.g. by the
+                project's file index). Defaults to None (stat the file).
+            construct (bool, optional): Whether to construct every schematic of the file right away, rather than on
+                lookup. Defaults to False.
+
+        Raises:
+            exceptions.MetadockContentSchematicParsingException: If the content schematics file fails to parse.
+            MetadockYamlImportError: If `construct` is set, and an imported YAML key or file is not found.
+
+        Returns:
+            tuple[Optional[FileSignature], Optional[str], MetadockContentSchematicFile]: The signature of the file as
+                it was before parsing, the digest of the file if it was parsed and should be snapshotted, and the
+                indexed file.
+        """
+        signature = signature or file_signature(yaml_path)
+        if snapshot_path is None:
+            source_digest = None
+        else:
+            schematics = cls._read_schematics_snapshot(snapshot_path, yaml_path, directory, signature, compact)
+            if schematics is not None:
+                entries = {schematic.name: schematic for schematic in schematics}
+                return signature, None, MetadockContentSchematicFile(yaml_path, entries, compact)
+            source_digest = _file_digest(yaml_path)
+        schematic_file = MetadockContentSchematicFile.compose(yaml_path, compact)
+        if construct:
+            schematic_file.construct_all()
+        return signature, source_digest, schematic_file
+
+    def _content_schematics_constructed(
+        self, schematic_file: "MetadockContentSchematicFile", schematics: "list[MetadockContentSchematic]"
+    ):
+        """Records the signatures of the files imported by newly constructed content schematics.
+
+        Args:
+            schematic_file (MetadockContentSchematicFile): The content schematics file defining the schematics.
+            schematics (list[MetadockContentSchematic]): The newly constructed content schematics.
+        """
+        for imported_path in {path for schematic in schematics for path in schematic.imported_paths}:
+            imported_signature = file_signature(imported_path)
+            if imported_signature is not None:
+                self._file_signatures.setdefault(imported_path, imported_signature)
+
+    def _save_cache_entries(self):
+        """Snapshots every loaded content schematics file which was parsed, once every schematic in it has been
+        constructed, and marks the snapshots of the other loaded files, and the loaded precompiled templates, as just
+        used. Only called by builds which write their documents, so that rendering in memory never writes to the .cache
+        directory.
+        """
+        if self.__dict__.get("template_bundle") is not None:
+            self.template_bundle.touch_loaded_modules()
+        if not self.snapshot_schematics:
+            return
+        for yaml_path, schematic_file in list(self._content_schematic_files.items()):
+            if yaml_path not in self._unsnapshotted_digests:
+                self.cache["schematics"].touch(self._schematics_snapshot_key(yaml_path))
+            elif not schematic_file.pending:
+                source_digest = self._unsnapshotted_digests.pop(yaml_path)
+                self._write_schematics_snapshot(yaml_path, source_digest, schematic_file.constructed())
+
+    def _schematics_snapshot_key(self, yaml_path: Path) -> str:
+        """Key of the snapshot of a content schematics file in the `schematics` cache tier, named after its path
+        relative to the project.
+
+        Args:
+            yaml_path (Path): Normalized path to the content schematics file.
+
+        Returns:
+            str: Key of the snapshot.
+        """
+        relative_path = os.path.relpath(yaml_path, self.directory)
+        return _source_digest(relative_path)[:32] + ".json"
+
+    @classmethod
+    def _read_schematics_snapshot(
+        cls, snapshot_path: Path, yaml_path: Path, directory: Path, signature: Optional[FileSignature], compact: bool
+    ) -> "Optional[list[MetadockContentSchematic]]":
+        """Loads the snapshotted schematics of a content schematics file, provided that the snapshot was taken from the
+        file's current content, and that none of the files it imports have changed since. Files are compared by
+        signature, and only digested if their signature changed (e.g. in a fresh checkout).
+
+        Snapshots are JSON, since the cache directory may be restored from an untrusted source (e.g. a CI cache), so
+        loading a snapshot must not be able to run code, nor stream data files from outside of the project.
+
+        Args:
+            snapshot_path (Path): Path to the snapshot.
+            yaml_path (Path): Normalized path to the content schematics file.
+            directory (Path): Directory of the project.
+            signature (Optional[FileSignature]): Signature of the file.
+            compact (bool): Whether the snapshot must hold compacted contexts.
+
+        Returns:
+            Optional[list[MetadockContentSchematic]]: The snapshotted schematics, or None if there is no valid,
+                up-to-date snapshot.
+        """
+        try:
+            snapshot = json.loads(
+                snapshot_path.read_bytes(), object_hook=partial(_snapshot_object_hook, directory=directory)
+            )
+            if (
+                not isinstance(snapshot, dict)
+                or snapshot.get("version") != cls.snapshot_version
+                or snapshot.get("source_path") != str(yaml_path)
+                or snapshot.get("compact") != compact
+                or not _snapshotted_file_unchanged(yaml_path, signature, snapshot["source"])
+                or not all(
+                    _snapshotted_file_unchanged(Path(path), file_signature(Path(path)), imported)
+                    for path, imported in snapshot["imports"].items()
+                )
+            ):
+                return None
+            return [MetadockContentSchematic.model_validate(schematic) for schematic in snapshot["schematics"]]
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            return None
+
+    def _write_schematics_snapshot(
+        self, yaml_path: Path, source_digest: str, schematics: "list[MetadockContentSchematic]"
+    ):
+        """Snapshots the parsed schematics of a content schematics file, along with the signatures and digests of the
+        file and its imports. Failures to write the snapshot (e.g. in a read-only checkout, or if a context holds a
+        value which cannot be snapshotted) are ignored.
+
+        Args:
+            yaml_path (Path): Normalized path to the content schematics file.
+            source_digest (str): Digest of the file's content, as it was parsed.
+            schematics (list[MetadockContentSchematic]): The parsed schematics.
+        """
+        imported_paths = {path for schematic in schematics for path in schematic.imported_paths}
+        snapshot = {
+            "version": self.snapshot_version,
+            "source_path": str(yaml_path),
+            "source": [self._file_signatures.get(yaml_path), source_digest],
+            "compact": self.compact_contexts,
+            "imports": {
+                str(path): [file_signature(path), self._memoized_file_digest(path)] for path in sorted(imported_paths)
+            },
+            "schematics": [
+                {
+                    "name": schematic.name,
+                    "template": schematic.template,
+                    "target_formats": schematic.target_formats,
+                    "context": _snapshot_encode(schematic.context),
+                    "source_path": str(schematic.source_path) if schematic.source_path is not None else None,
+                    "imported_paths": [str(path) for path in schematic.imported_paths],
+                    "extends": schematic.extends,
+                }
+                for schematic in schematics
+            ],
+        }
+        try:
+            snapshot_content = json.dumps(snapshot, separators=(",", ":")).encode()
+        except (TypeError, ValueError):
+            return
+        self.cache["schematics"].set(self._schematics_snapshot_key(yaml_path), snapshot_content)
+
+    def _query_schematics_by_name_glob(self, schematic_glob: str) -> "list[str]":
+        """Query the content schematics for the project by a glob pattern.
+
+        Args:
+            schematic_glob (str): The glob pattern to match against schematic names.
+
+        Returns:
+            list[str]: A list of schematic names that match the glob pattern.
+        """
+        return [
+            schematic_name
+            for schematic_name in self.content_schematics
+            if fnmatch.fnmatch(schematic_name, schematic_glob)
+        ]
+
+    def _query_schematics_by_template_glob(self, template_glob: str) -> "list[str]":
+        """Query the content schematics for the project by a glob pattern on the template paths they use.
+
+        Args:
+            template_glob (str): The glob pattern to match against template paths.
+
+        Returns:
+            list[str]: A list of schematic names whose template match the glob pattern.
+        """
+        return [
+            schematic.name
+            for schematic in self.content_schematics.values()
+            if fnmatch.fnmatch(schematic.template, template_glob)
+        ]
+
+
+class MetadockRenderCache:
+    """Content-addressed cache of rendered documents, held by the `renders` tier of the project's cache store, which may
+    be shared between builds (e.g. restored between CI jobs) through a directory. Each entry holds the post-processed
+    document built from one content schematic in one target format, keyed by the digest of everything the document
+    depends on (see `MetadockProject.render_digest`), so entries are never stale: a changed input changes the key.
+
+    Attributes:
+        tier (MetadockCacheTier): Cache tier holding the entries.
+        hits (int): Number of content schematics whose documents were found in the cache.
+        misses (int): Number of content schematics whose documents were rendered and added to the cache.
+    """
+
+    tier: MetadockCacheTier
+    hits: int
+    misses: int
+
+    def __init__(self, tier: MetadockCacheTier):
+        """Open a render cache, creating its directory when the first entry is added.
+
+        Args:
+            tier (MetadockCacheTier): Cache tier holding the entries.
+        """
+        self.tier = tier
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, digest: str) -> Optional[str]:
+        """Looks up a rendered document.
+
+        Args:
+            digest (str): Digest of the document's inputs.
+
+        Returns:
+            Optional[str]: The rendered document, or None if the cache doesn't hold it.
+        """
+        content = self.tier.get(digest)
+        return content.decode() if content is not None else None
+
+    def set(self, digest: str, content: str):
+        """Adds a rendered document to the cache. Failures to write the entry (e.g. a full disk) are ignored.
+
+        Args:
+            digest (str): Digest of the document's inputs.
+            content (str): The rendered document.
+        """
+        self.tier.set(digest, content.encode())
+
+
+class MetadockTemplateBundle:
+    """Templates of a Metadock project which were precompiled into Python modules by `MetadockProject.compile`, along
+    with a manifest of the digests of the template sources they were compiled from, and of the modules themselves. The
+    bundle is held by the `templates` tier of the project's cache store, and templates whose modules were evicted are
+    compiled from source.
+
+    Unlike the rest of the cache store, the bundle is executable code, and is trusted like the project's own sources:
+    each module is checked against its digest before it is run, which rejects modules changed or swapped since they
+    were compiled, but the manifest lives alongside them. The `templates` tier must therefore never be restored from a
+    cache which untrusted jobs can write to.
+
+    Attributes:
+        tier (MetadockCacheTier): Cache tier containing the compiled template modules and the manifest.
+        digests (dict[str, str]): Digest of the source of each compiled template, keyed by project relative path.
+            Empty if the templates were compiled by a different version of Jinja2.
+        module_digests (dict[str, str]): Digest of the module of each compiled template, keyed by project relative
+            path.
+        loaded_modules (set[str]): Filenames of the modules loaded since they were last touched.
+    """
+
+    manifest_filename: str = "manifest.json"
+
+    tier: MetadockCacheTier
+    digests: dict[str, str]
+    module_digests: dict[str, str]
+    loaded_modules: set[str]
+
+    def __init__(self, tier: MetadockCacheTier):
+        """Opens a bundle of precompiled templates.
+
+        Args:
+            tier (MetadockCacheTier): Cache tier containing the compiled template modules and the manifest.
+        """
+        self.tier = tier
+        manifest = json.loads(tier.path(self.manifest_filename).read_text())
+        current = manifest.get("jinja2_version") == jinja2.__version__
+        self.digests = manifest["templates"] if current else {}
+        self.module_digests = manifest.get("modules", {}) if current else {}
+        self.loaded_modules = set()
+
+    @classmethod
+    def write_manifest(cls, directory: Path, digests: dict[str, str]):
+        """Writes the manifest for a bundle of freshly compiled templates, recording the digest of each module.
+
+        Args:
+            directory (Path): Directory containing the compiled template modules.
+            digests (dict[str, str]): Digest of the source of each compiled template, keyed by project relative path.
+        """
+        module_digests = {
+            name: _file_digest(directory / jinja2.ModuleLoader.get_module_filename(name)) for name in digests
+        }
+        manifest = {"jinja2_version": jinja2.__version__, "templates": digests, "modules": module_digests}
+        (directory / cls.manifest_filename).write_text(json.dumps(manifest, indent=2, sort_keys=True))
+
+    def touch_loaded_modules(self):
+        """Marks the modules loaded since the last call as just used, so that `prune` evicts them last."""
+        for module_filename in list(self.loaded_modules):
+            self.loaded_modules.discard(module_filename)
+            self.tier.touch(module_filename)
+
+    def load(
+        self, environment: jinja2.Environment, name: str, source: str, globals: MutableMapping[str, Any]
+    ) -> Optional[jinja2.Template]:
+        """Loads a precompiled template, provided it was compiled from the given source, and its module matches the
+        digest recorded when it was compiled. The module is run from memory rather than imported, so that loading it
+        writes no bytecode to the cache.
+
+        Args:
+            environment (jinja2.Environment): Environment to bind the template to.
+            name (str): Project relative path of the template.
+            source (str): Current source of the template.
+            globals (MutableMapping[str, Any]): Globals of the template, as made by `environment.make_globals`.
+
+        Returns:
+            Optional[jinja2.Template]: The precompiled template, or None if it is missing or stale.
+        """
+        module_filename = jinja2.ModuleLoader.get_module_filename(name)
+        module_path = self.tier.path(module_filename)
+        try:
+            module_source = module_path.read_bytes() if self.digests.get(name) == _source_digest(source) else None
+        except OSError:
+            module_source = None
+        if module_source is None or hashlib.sha256(module_source).hexdigest() != self.module_digests.get(name):
+            self.tier.record(hit=False)
+            return None
+        namespace: dict[str, Any] = {"__name__": module_filename.removesuffix(".py"), "__file__": str(module_path)}
+        exec(compile(module_source, str(module_path), "exec"), namespace)
+        self.tier.record(hit=True)
+        self.loaded_modules.add(module_filename)
+        return environment.template_class.from_module_dict(environment, namespace, globals)
+
+
+class MetadockTemplateLoader(jinja2.FileSystemLoader):
+    """Jinja loader for the templated_documents directory of a Metadock project, which lets templates `include`,
+    `import` and `extends` each other by project relative path. Templates are loaded from the project's precompiled
+    template bundle when it is up to date, and are otherwise compiled from source, sharing the compiled code between
+    projects with identical templates. Loaded templates are kept in the environment's template cache, and reloaded when
+    their file's modification time changes.
+
+    Attributes:
+        project (MetadockProject): The project whose templates are loaded.
+    """
+
+    project: MetadockProject
+
+    def __init__(self, project: MetadockProject):
+        """Instantiate a loader for the templated documents of a Metadock project.
+
+        Args:
+            project (MetadockProject): The project whose templates are loaded.
+        """
+        super().__init__(project.templated_documents_directory)
+        self.project = project
+
+    def load(
+        self, environment: jinja2.Environment, name: str, globals: Optional[MutableMapping[str, Any]] = None
+    ) -> jinja2.Template:
+        source, _, uptodate = self.get_source(environment, name)
+        globals = environment.make_globals(globals) if globals is None else globals
+
+        template = None
+        if self.project.template_bundle is not None:
+            template = self.project.template_bundle.load(environment, name, source, globals)
+        if template is None:
+            return template_from_string(environment, source, name, globals, uptodate)
+
+        # Precompiled templates carry no up-to-date check of their own, so they would never be reloaded.
+        template._uptodate = uptodate
+        return template
+
+
+class MetadockTemplatedDocument(pydantic.BaseModel):
+    """Core abstraction which represents a templated document in a Metadock project.
+
+    Attributes:
+        absolute_path (Path): The absolute path to the templated document.
         project_relative_path (Path): The path to the templated document relative to the .metadock/templated_documents
             project subdirectory.
     """
@@ -392,7 +2347,8 @@ class MetadockTemplatedDocument(pydantic.BaseModel):
             return handle.read()
 
     def jinja_template(self, project: MetadockProject) -> jinja2.Template:
-        """Parses the content of the templated document as a Jinja2 template.
+        """Loads the templated document as a Jinja2 template through the project environment's loader, which caches
+        it along with any templates it includes, imports or extends.
 
         Raises:
             exceptions.MetadockTemplateParsingException: If parsing the Jinja2 template fails.
@@ -401,14 +2357,97 @@ class MetadockTemplatedDocument(pydantic.BaseModel):
             jinja2.Template: The parsed Jinja2 template.
         """
         try:
-            template = project.environment.from_string(self.content())
-            return template
+            return project.environment.get_template(self.project_relative_path.as_posix())
         except Exception as e:
             raise exceptions.MetadockTemplateParsingException(
                 "Failed to parse jinja2.Template from %s,\n\tdue to exception:\n%s"
                 % (self.project_relative_path, str(e))
             )
 
+    def referenced_schematics(self, project: MetadockProject) -> set[str]:
+        """Statically determines which documents the template includes via `ref`, i.e. every call to `ref` whose
+        argument is a string literal.
+
+        Raises:
+            exceptions.MetadockTemplateParsingException: If parsing the Jinja2 template fails.
+
+        Returns:
+            set[str]: Names of the content schematics referenced by the template.
+        """
+        template_ast = project._template_ast(self)
+        return {
+            call.args[0].value
+            for call in template_ast.find_all(jinja2.nodes.Call)
+            if isinstance(call.node, jinja2.nodes.Name)
+            and call.node.name == "ref"
+            and call.args
+            and isinstance(call.args[0], jinja2.nodes.Const)
+            and isinstance(call.args[0].value, str)
+        }
+
+    def has_dynamic_references(self, project: MetadockProject) -> bool:
+        """Statically determines whether the template calls `ref`, or loads another template, with an argument which
+        is not a string literal, so that the documents or templates it depends on cannot be known before rendering.
+
+        Raises:
+            exceptions.MetadockTemplateParsingException: If parsing the Jinja2 template fails.
+
+        Returns:
+            bool: Whether the template has dynamic references.
+        """
+        template_ast = project._template_ast(self)
+        if None in jinja2.meta.find_referenced_templates(template_ast):
+            return True
+        return any(
+            not (call.args and isinstance(call.args[0], jinja2.nodes.Const) and isinstance(call.args[0].value, str))
+            for call in template_ast.find_all(jinja2.nodes.Call)
+            if isinstance(call.node, jinja2.nodes.Name) and call.node.name == "ref"
+        )
+
+    def referenced_templates(self, project: MetadockProject) -> set[str]:
+        """Statically determines which templates the template loads via `include`, `import`, `from` or `extends` tags
+        whose template names are string literals.
+
+        Raises:
+            exceptions.MetadockTemplateParsingException: If parsing the Jinja2 template fails.
+
+        Returns:
+            set[str]: Project relative paths of the loaded templates.
+        """
+        return {name for name in jinja2.meta.find_referenced_templates(project._template_ast(self)) if name is not None}
+
+
+class MetadockTemplatedDocuments(Mapping[str, MetadockTemplatedDocument]):
+    """The templated documents of a project, keyed by project relative path. Each `MetadockTemplatedDocument` is only
+    created when it is first looked up.
+    """
+
+    def __init__(self, project_dir: Path, relative_paths: "Iterable[str]"):
+        """Index the templated documents of a project.
+
+        Args:
+            project_dir (Path): The path to the Metadock project directory.
+            relative_paths (Iterable[str]): Project relative paths of the templated documents.
+        """
+        self.project_dir = project_dir
+        self._documents: dict[str, Optional[MetadockTemplatedDocument]] = dict.fromkeys(relative_paths)
+
+    def __contains__(self, relative_path: object) -> bool:
+        return relative_path in self._documents
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._documents)
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def __getitem__(self, relative_path: str) -> MetadockTemplatedDocument:
+        templated_document = self._documents[relative_path]
+        if templated_document is None:
+            templated_document = MetadockTemplatedDocument.from_project_relative_path(self.project_dir, relative_path)
+            self._documents[relative_path] = templated_document
+        return templated_document
+
 
 class MetadockContentSchematic(pydantic.BaseModel):
     """Represents a content schematic in Metadock.
@@ -418,19 +2457,31 @@ class MetadockContentSchematic(pydantic.BaseModel):
         template (str): The template to be used for rendering the content.
         target_formats (list[str]): The list of target formats for the compiled content.
         context (Any, optional): The context data to be used during rendering. Defaults to an empty dictionary.
+        source_path (Optional[Path], optional): The YAML file which defines the content schematic. Defaults to None.
+        imported_paths (list[Path], optional): The files imported while resolving the context, including those of any
+            schematics it extends, and the files defining them. Defaults to an empty list.
+        extends (Optional[str], optional): Name of the content schematic which this one extends. Defaults to None.
     """
 
     name: str
     template: str
     target_formats: list[str]
     context: Any = {}
+    source_path: Optional[Path] = None
+    imported_paths: list[Path] = []
+    extends: Optional[str] = None
 
-    def to_compiled_targets(self, project: MetadockProject) -> dict[str, str | bytes]:
+    def to_compiled_targets(
+        self, project: MetadockProject, target_formats: Optional[list[str]] = None
+    ) -> dict[str, str | bytes]:
         """
-        Converts the content schematic to compiled targets based in the provided project.
+        Converts the content schematic to compiled targets based in the provided project. The template is rendered once,
+        and the rendered document is post-processed for each target format.
 
         Args:
             project (MetadockProject): The Metadock project containing the templated documents.
+            target_formats (Optional[list[str]], optional): Target formats to compile. Defaults to None (the schematic's
+                own target formats).
 
         Returns:
             dict[str, str | bytes]: A dictionary mapping target format identifiers to the compiled content.
@@ -438,10 +2489,16 @@ class MetadockContentSchematic(pydantic.BaseModel):
 
         compiled_targets: dict[str, str | bytes] = {}
 
-        for target_format in self.target_formats:
+        if self.template not in project.templated_documents:
+            raise exceptions.MetadockProjectException(
+                "Could not find template '%s' for content schematic %s" % (self.template, self.name)
+            )
+
+        templated_document = project.templated_documents[self.template]
+        rendered_document = templated_document.jinja_template(project).render(self.context)
+
+        for target_format in target_formats if target_formats is not None else self.target_formats:
             target_format = MetadockTargetFormatFactory.target_format(target_format)
-            templated_document = project.templated_documents[self.template]
-            rendered_document = templated_document.jinja_template(project).render(self.context)
             post_processed_document = target_format.handler(rendered_document)
 
             compiled_targets[target_format.identifier] = post_processed_document
@@ -452,7 +2509,8 @@ class MetadockContentSchematic(pydantic.BaseModel):
     def collect_from_file(cls, yaml_path: Path | str) -> "list[MetadockContentSchematic]":
         """
         Collects content schematics from a YAML file. Flattens any merge keys in the YAML specification. Also resolves
-        any external YAML files imported in the context.
+        any external YAML files imported in the context. To only construct the schematics which are needed, use
+        `MetadockContentSchematicFile.compose` instead.
 
         Args:
             yaml_path (Path | str): The path to the YAML file.
@@ -464,47 +2522,430 @@ class MetadockContentSchematic(pydantic.BaseModel):
             MetadockContentSchematicParsingException: If the YAML file is not found or if a required key is missing.
             MetadockYamlImportError: If an imported YAML key or file is not found (or is not a file).
         """
+        schematic_file = MetadockContentSchematicFile.compose(Path(os.path.normpath(yaml_path)))
+        return [schematic_file[name] for name in schematic_file]
+
+    @classmethod
+    def from_definition(cls, def_schematic: dict, yaml_path: Path) -> "list[MetadockContentSchematic]":
+        """
+        Constructs the content schematics from a single definition in a content schematics file, resolving any
+        external YAML files imported in its context and flattening its merge keys.
+
+        A schematic with a `for_each` key (a key path into its context, or a list or import) is fanned out into one
+        schematic per item. Each item is added to a shallow copy of the shared, resolved context under the schematic's
+        `as` key (default "item"), and the schematic's name is formatted with `str.format_map` from the item's keys,
+        the `as` key, and the item's `index`. Since schematics are fanned out as their file is indexed, before any
+        inheritance is resolved, a key path can only refer to the schematic's own context, not to a context it extends.
+
+        A schematic with an `extends` key names another content schematic, whose resolved context it overlays with its
+        own, and whose template and target formats it inherits unless it specifies its own. Inheritance is resolved by
+        the project, once every content schematic has been indexed.
+
+        Args:
+            def_schematic (dict): The constructed YAML definition of the schematic.
+            yaml_path (Path): Normalized path to the YAML file defining the schematic.
+
+        Returns:
+            list[MetadockContentSchematic]: The content schematic, or the schematics it fans out into.
+
+        Raises:
+            MetadockContentSchematicParsingException: If the schematic fails to fan out, e.g. because its context is not
+                a mapping.
+            MetadockYamlImportError: If an imported YAML key or file is not found (or is not a file).
+        """
+        content_schematics_root = Path(str(yaml_path).split("/content_schematics/")[0]) / "content_schematics"
+        context = def_schematic.get("context", {})
+        imported_paths: set[Path] = set()
+        """ Resolve all imports in the context, including those nested in merge keys. """
+        context = yaml_utils.resolve_all_imports(content_schematics_root, context, imported_paths)
+        """ Then, flatten all of the merge keys. """
+        context = yaml_utils.flatten_merge_keys(context)
+
+        if "for_each" not in def_schematic:
+            """Schematic is now fully determined. Put into pydantic model."""
+            return [
+                cls(
+                    name=def_schematic["name"],
+                    template=def_schematic.get("template", ""),
+                    target_formats=def_schematic.get("target_formats", []),
+                    context=context,
+                    source_path=yaml_path,
+                    imported_paths=sorted(imported_paths),
+                    extends=def_schematic.get("extends"),
+                )
+            ]
 
-        yaml_path = Path(yaml_path)
+        """ Otherwise, fan the schematic out into one schematic per item, which share the resolved context. """
+        if context is None:
+            context = {}
+        if not isinstance(context, dict):
+            raise exceptions.MetadockContentSchematicParsingException(
+                "Expected the context of for_each content schematic '%s' in %s to be a mapping, but found %s"
+                % (def_schematic["name"], yaml_path, type(context).__name__)
+            )
+        items = cls._for_each_items(def_schematic["for_each"], context, content_schematics_root, imported_paths)
+        alias = def_schematic.get("as", "item")
+        prototype = cls(
+            name=def_schematic["name"],
+            template=def_schematic.get("template", ""),
+            target_formats=def_schematic.get("target_formats", []),
+            source_path=yaml_path,
+            imported_paths=sorted(imported_paths),
+            extends=def_schematic.get("extends"),
+        )
         content_schematics: list[MetadockContentSchematic] = []
+        for index, item in enumerate(items):
+            name_fields = (item if isinstance(item, dict) else {}) | {alias: item, "index": index}
+            try:
+                name = prototype.name.format_map(name_fields)
+            except (KeyError, IndexError, AttributeError, ValueError) as e:
+                raise exceptions.MetadockContentSchematicParsingException(
+                    "Could not format name '%s' of content schematic in %s for item %d: %r"
+                    % (prototype.name, yaml_path, index, e)
+                )
+            content_schematics.append(prototype.model_copy(update={"name": name, "context": context | {alias: item}}))
+        return content_schematics
+
+    @staticmethod
+    def _for_each_items(
+        for_each: Any, context: Any, content_schematics_root: Path, imported_paths: set[Path]
+    ) -> list[Any] | yaml_utils.StreamedRows:
+        """Resolves the items which a `for_each` schematic fans out over. The `for_each` key is either a dot-separated
+        key path into the schematic's resolved context, or a list or import which is resolved like the context.
+
+        Args:
+            for_each (Any): Value of the schematic's `for_each` key.
+            context (Any): The schematic's resolved context.
+            content_schematics_root (Path): Path to the project's content_schematics directory, to resolve imports.
+            imported_paths (set[Path]): Files imported while resolving the items are added to this set.
+
+        Raises:
+            MetadockContentSchematicParsingException: If the key path is not found, or the items are not a list.
+            MetadockYamlImportError: If an imported YAML key or file is not found (or is not a file).
+
+        Returns:
+            list[Any] | yaml_utils.StreamedRows: The items to fan out over.
+        """
+        if isinstance(for_each, str):
+            try:
+                items = reduce(lambda acc, key: acc[key], for_each.split("."), context)
+            except (KeyError, TypeError):
+                raise exceptions.MetadockContentSchematicParsingException(
+                    "Could not find for_each key path '%s' in content schematic context (key paths are resolved against "
+                    "the schematic's own context, without the context of any schematic it extends)" % for_each
+                )
+        else:
+            items = yaml_utils.resolve_all_imports(content_schematics_root, for_each, imported_paths)
+            items = yaml_utils.flatten_merge_keys(items)
+
+        if not isinstance(items, (list, yaml_utils.StreamedRows)):
+            raise exceptions.MetadockContentSchematicParsingException(
+                "Expected for_each to resolve to a list, but found %s" % type(items).__name__
+            )
+        return items
+
+
+class MetadockContentSchematicFile:
+    """The content schematics defined in a single YAML file, indexed by name. The file is composed into a YAML node
+    graph once, and each schematic is only constructed (resolving its context's imports and flattening its merge keys)
+    when it is first looked up. Schematics which fan out with `for_each` are constructed up front, since their names
+    depend on their items.
+
+    Attributes:
+        path (Path): Normalized path to the content schematics file.
+        compact (bool): Whether to compact the contexts of the schematics as they are constructed.
+        on_construct (Optional[Callable]): Called with the file and the newly constructed schematics whenever
+            schematics are constructed on lookup.
+    """
+
+    required_keys: tuple[str, ...] = ("name", "target_formats", "template")
+
+    path: Path
+    compact: bool
+    on_construct: "Optional[Callable[[MetadockContentSchematicFile, list[MetadockContentSchematic]], None]]"
+
+    def __init__(
+        self, path: Path, entries: "Mapping[str, MetadockContentSchematic | yaml.Node]", compact: bool = False
+    ):
+        """Index the content schematics of a file.
+
+        Args:
+            path (Path): Normalized path to the content schematics file.
+            entries (Mapping[str, MetadockContentSchematic | yaml.Node]): Content schematics, or the YAML nodes
+                defining them, keyed by name in order of definition.
+            compact (bool, optional): Whether to compact the contexts of the schematics (see `yaml_utils.compact`).
+                Defaults to False.
+        """
+        self.path = path
+        self.compact = compact
+        self.on_construct = None
+        self._entries: dict[str, MetadockContentSchematic | yaml.Node] = {
+            name: self._compacted(entry) if isinstance(entry, MetadockContentSchematic) else entry
+            for name, entry in entries.items()
+        }
+
+    @classmethod
+    def compose(cls, yaml_path: Path, compact: bool = False) -> "MetadockContentSchematicFile":
+        """Composes a content schematics file into a YAML node graph, and indexes its schematic definitions by name.
 
+        Args:
+            yaml_path (Path): Normalized path to the content schematics file.
+            compact (bool, optional): Whether to compact the contexts of the schematics (see `yaml_utils.compact`).
+                Defaults to False.
+
+        Raises:
+            MetadockContentSchematicParsingException: If the file is not found, if a required key is missing, or if
+                schematic names are not unique.
+            MetadockYamlImportError: If an imported YAML key or file of a `for_each` schematic is not found.
+
+        Returns:
+            MetadockContentSchematicFile: The indexed content schematics file.
+        """
         if not yaml_path.exists():
             raise exceptions.MetadockContentSchematicParsingException(
                 "Could not find content schematic file %s" % yaml_path
             )
 
-        """ Read raw content schematics yaml file """
+        """ Compose the raw content schematics yaml file, without constructing any objects """
         with yaml_path.open("r") as handle:
-            yaml_contents: dict = yaml.load(handle, yaml.BaseLoader)
+            root_node = yaml.compose(handle, yaml_utils.MetadockYamlLoader)
 
         """ Determine if there are content schematics in the file """
-        defined_schematics = yaml_contents.get("content_schematics", [])
-        required_keys = ["name", "target_formats", "template"]
+        schematics_node = _mapping_node_value(root_node, "content_schematics")
+        definition_nodes = schematics_node.value if isinstance(schematics_node, yaml.SequenceNode) else []
 
+        entries: dict[str, MetadockContentSchematic | yaml.Node] = {}
         """ For each schematic defined in the YAML file, """
-        for def_schematic in defined_schematics:
-            """validate that it has all of the required keys,"""
+        for definition_node in definition_nodes:
+            """validate that it has all of the required keys (the rest may be inherited if it extends another),"""
+            required_keys = cls.required_keys if _mapping_node_value(definition_node, "extends") is None else ["name"]
             for req_key in required_keys:
-                if not def_schematic.get(req_key):
+                value_node = _mapping_node_value(definition_node, req_key)
+                if value_node is None or not value_node.value:
                     raise exceptions.MetadockContentSchematicParsingException(
                         "Missing required key for content schematic in %s: '%s'" % (yaml_path, req_key)
                     )
 
-            context = def_schematic.get("context", {})
-            """ resolve all imports in the context, including those nested in merge keys. """
-            context = yaml_utils.resolve_all_imports(
-                Path(str(yaml_path).split("/content_schematics/")[0]) / "content_schematics", context
-            )
-            """ Then, flatten all of the merge keys. """
-            context = yaml_utils.flatten_merge_keys(context)
-            """ Schematic is now fully determined. Put into pydantic model. """
-            content_schematics.append(
-                cls(
-                    name=def_schematic["name"],
-                    template=def_schematic["template"],
-                    target_formats=def_schematic["target_formats"],
-                    context=context,
-                )
+            """ then index it by name, fanning out `for_each` schematics right away. """
+            if _mapping_node_value(definition_node, "for_each") is None:
+                named_entries = [(_mapping_node_value(definition_node, "name").value, definition_node)]
+            else:
+                def_schematic = _construct_node(definition_node)
+                named_entries = [
+                    (schematic.name, schematic)
+                    for schematic in MetadockContentSchematic.from_definition(def_schematic, yaml_path)
+                ]
+            for name, entry in named_entries:
+                if name in entries:
+                    raise exceptions.MetadockContentSchematicParsingException("Got non-unique 'name' key: %s" % name)
+                entries[name] = entry
+
+        return cls(yaml_path, entries, compact)
+
+    @property
+    def pending(self) -> bool:
+        """Whether any content schematic in the file has yet to be constructed."""
+        return any(isinstance(entry, yaml.Node) for entry in self._entries.values())
+
+    def constructed(self) -> "list[MetadockContentSchematic]":
+        """The content schematics in the file which have been constructed so far.
+
+        Returns:
+            list[MetadockContentSchematic]: The constructed content schematics, in order of definition.
+        """
+        return [entry for entry in self._entries.values() if isinstance(entry, MetadockContentSchematic)]
+
+    def construct_all(self) -> "list[MetadockContentSchematic]":
+        """Constructs every content schematic in the file which has yet to be constructed.
+
+        Raises:
+            MetadockYamlImportError: If an imported YAML key or file is not found (or is not a file).
+
+        Returns:
+            list[MetadockContentSchematic]: The content schematics in the file, in order of definition.
+        """
+        return [self[name] for name in self._entries]
+
+    def extends(self, name: str) -> Optional[str]:
+        """Name of the content schematic which a schematic extends, without constructing it.
+
+        Args:
+            name (str): Name of the content schematic.
+
+        Returns:
+            Optional[str]: Name of the extended content schematic, or None if it doesn't extend any.
+        """
+        entry = self._entries[name]
+        if isinstance(entry, MetadockContentSchematic):
+            return entry.extends
+        extends_node = _mapping_node_value(entry, "extends")
+        return extends_node.value if isinstance(extends_node, yaml.ScalarNode) else None
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._entries
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __getitem__(self, name: str) -> "MetadockContentSchematic":
+        """Looks up a content schematic, constructing it from its YAML node on first lookup.
+
+        Args:
+            name (str): Name of the content schematic.
+
+        Raises:
+            KeyError: If the file defines no content schematic with the given name.
+            MetadockYamlImportError: If an imported YAML key or file is not found (or is not a file).
+
+        Returns:
+            MetadockContentSchematic: The content schematic.
+        """
+        entry = self._entries[name]
+        if isinstance(entry, MetadockContentSchematic):
+            return entry
+        schematic = self._compacted(MetadockContentSchematic.from_definition(_construct_node(entry), self.path)[0])
+        self._entries[name] = schematic
+        if self.on_construct is not None:
+            self.on_construct(self, [schematic])
+        return schematic
+
+    def _compacted(self, schematic: "MetadockContentSchematic") -> "MetadockContentSchematic":
+        """Compacts the context of a content schematic, if the file's schematics are compacted."""
+        if not self.compact:
+            return schematic
+        return schematic.model_copy(update={"context": yaml_utils.compact(schematic.context)})
+
+
+class MetadockContentSchematics(Mapping[str, MetadockContentSchematic]):
+    """The content schematics of a project, keyed by name. Each schematic is constructed from its content schematics
+    file, and its inheritance resolved, when it is first looked up; so building a single document does not resolve the
+    contexts of every other schematic. Iterating over the names, or testing membership, constructs nothing.
+
+    A schematic which `extends` another is overlaid on its parent's resolved context, sharing the parent's values
+    rather than copying them, and its template and target formats default to the parent's.
+    """
+
+    def __init__(self, content_schematic_files: "Iterable[MetadockContentSchematicFile]"):
+        """Index the content schematics of a project's content schematics files.
+
+        Args:
+            content_schematic_files (Iterable[MetadockContentSchematicFile]): The project's content schematics files.
+
+        Raises:
+            exceptions.MetadockContentSchematicParsingException: If schematic names are not unique, or a schematic
+                extends a missing schematic or itself (directly or transitively).
+        """
+        self._files: dict[str, MetadockContentSchematicFile] = {}
+        self._resolved: dict[str, MetadockContentSchematic] = {}
+        for content_schematic_file in content_schematic_files:
+            for name in content_schematic_file:
+                if name in self._files:
+                    raise exceptions.MetadockContentSchematicParsingException("Got non-unique 'name' key: %s" % name)
+                self._files[name] = content_schematic_file
+        self._check_extends()
+
+    def _check_extends(self):
+        """Checks that every extended schematic exists, and that no schematic extends itself, without constructing
+        any schematics.
+
+        Raises:
+            exceptions.MetadockContentSchematicParsingException: If a schematic extends a missing schematic, or extends
+                itself (directly or transitively).
+        """
+        checked: set[str] = set()
+        for name in self._files:
+            chain: list[str] = []
+            current: Optional[str] = name
+            while current is not None and current not in checked:
+                if current in chain:
+                    raise exceptions.MetadockContentSchematicParsingException(
+                        "Content schematics extend each other cyclically: %s" % " -> ".join(chain + [current])
+                    )
+                chain.append(current)
+                parent = self._files[current].extends(current)
+                if parent is not None and parent not in self._files:
+                    raise exceptions.MetadockContentSchematicParsingException(
+                        "Content schematic %s extends unknown content schematic: %s" % (current, parent)
+                    )
+                current = parent
+            checked.update(chain)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._files
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._files)
+
+    def __len__(self) -> int:
+        return len(self._files)
+
+    def __getitem__(self, name: str) -> MetadockContentSchematic:
+        """Looks up a content schematic, constructing it and resolving its inheritance on first lookup.
+
+        Args:
+            name (str): Name of the content schematic.
+
+        Raises:
+            KeyError: If the project has no content schematic with the given name.
+            MetadockYamlImportError: If an imported YAML key or file is not found (or is not a file).
+
+        Returns:
+            MetadockContentSchematic: The resolved content schematic.
+        """
+        if name in self._resolved:
+            return self._resolved[name]
+
+        schematic = self._files[name][name]
+        if schematic.extends is not None:
+            parent = self[schematic.extends]
+            inherited_paths = set(parent.imported_paths) | set(schematic.imported_paths)
+            if parent.source_path is not None:
+                inherited_paths.add(parent.source_path)
+            schematic = schematic.model_copy(
+                update={
+                    "template": schematic.template or parent.template,
+                    "target_formats": schematic.target_formats or parent.target_formats,
+                    "context": (
+                        parent.context | schematic.context
+                        if isinstance(parent.context, dict) and isinstance(schematic.context, dict)
+                        else schematic.context or parent.context
+                    ),
+                    "imported_paths": sorted(inherited_paths),
+                }
             )
 
-        return content_schematics
+        self._resolved[name] = schematic
+        return schematic
+
+
+def _mapping_node_value(node: Optional[yaml.Node], key: str) -> Optional[yaml.Node]:
+    """Looks up the value of a key in a composed YAML mapping, without constructing it.
+
+    Args:
+        node (Optional[yaml.Node]): The composed YAML node.
+        key (str): The key to look up.
+
+    Returns:
+        Optional[yaml.Node]: The node of the key's value, or None if the node is not a mapping or lacks the key.
+    """
+    if not isinstance(node, yaml.MappingNode):
+        return None
+    for key_node, value_node in node.value:
+        if isinstance(key_node, yaml.ScalarNode) and key_node.value == key:
+            return value_node
+    return None
+
+
+def _construct_node(node: yaml.Node) -> Any:
+    """Constructs the Python object of a composed YAML node, as `yaml.load` with the MetadockYamlLoader would.
+
+    Args:
+        node (yaml.Node): The composed YAML node.
+
+    Returns:
+        Any: The constructed object.
+    """
+    return yaml_utils.MetadockYamlLoader("").construct_document(node)
@@ -1,11 +1,40 @@
 import abc
+import datetime
+import functools
+import hashlib
 import html
+import importlib.metadata
 import itertools
-from typing import Annotated, Any, Iterable, Literal, Sequence
+import json
+import operator
+import threading
+import weakref
+from collections import OrderedDict
+from types import CodeType
+from typing import Annotated, Any, Callable, Iterable, Iterator, Literal, Mapping, MutableMapping, Optional, Sequence
 
 import jinja2
+import jinja2.ext
+import jinja2.meta
+from jinja2 import nodes
 from marko.ext.gfm import gfm
 
+from metadock import yaml_utils
+from metadock.cache import MetadockCacheTier
+
+
+@functools.lru_cache(maxsize=None)
+def metadock_version() -> str:
+    """Version of the installed metadock package.
+
+    Returns:
+        str: The version, or "unknown" if the package is not installed (e.g. when running from a source checkout).
+    """
+    try:
+        return importlib.metadata.version("metadock")
+    except importlib.metadata.PackageNotFoundError:
+        return "unknown"
+
 
 def _is_nonstr_iter(item: Any) -> bool:
     """Utility method for determining if an item is an iterable which is not a string.
@@ -23,6 +52,305 @@ def _is_nonstr_iter(item: Any) -> bool:
         return False
 
 
+_MD_TABLE_ALIGNMENT_DIVIDERS: dict[Optional[str], str] = {
+    None: "---",
+    "left": ":---",
+    "center": ":---:",
+    "right": "---:",
+}
+
+
+_MD_LIST_PREFIXES = ("-", "*", "+")
+
+
+def _md_list_lines(items: Iterable[Any], depth: int) -> Iterator[str]:
+    """Generates the lines of a (sub)list of a Markdown list, at the given depth of nesting. Nested iterables become
+    sublists, mappings contribute each key as an item with its value nested beneath it, and strings which are already
+    formatted as Markdown lists are indented as sublists. Every item is formatted exactly once, regardless of depth.
+
+    Args:
+        items (Iterable[Any]): The items of the (sub)list.
+        depth (int): Depth of nesting of the items, where 0 is the top-level list.
+
+    Yields:
+        str: The lines of the Markdown (sub)list.
+    """
+    for item in items:
+        if isinstance(item, Mapping):
+            for key, value in item.items():
+                yield _md_list_item(str(key), depth)
+                yield from _md_list_children(value, depth + 1)
+        elif _is_nonstr_iter(item):
+            yield from _md_list_lines(item, depth + 1)
+        elif str(item).lstrip().startswith(_MD_LIST_PREFIXES):
+            yield _md_indented(str(item), depth + 1)
+        else:
+            yield _md_list_item(str(item), depth)
+
+
+def _md_list_children(value: Any, depth: int) -> Iterator[str]:
+    """Generates the lines of the sublist nested beneath a key of a mapping in a Markdown list.
+
+    Args:
+        value (Any): The value of the key; None or an empty string (as loaded for a key with no value) produces no
+            sublist.
+        depth (int): Depth of nesting of the sublist.
+
+    Yields:
+        str: The lines of the Markdown sublist.
+    """
+    if value is None or value == "":
+        return
+    if isinstance(value, Mapping):
+        yield from _md_list_lines([value], depth)
+    elif _is_nonstr_iter(value):
+        yield from _md_list_lines(value, depth)
+    elif str(value).lstrip().startswith(_MD_LIST_PREFIXES):
+        yield _md_indented(str(value), depth)
+    else:
+        yield _md_list_item(str(value), depth)
+
+
+def _md_list_item(text: str, depth: int) -> str:
+    """Formats a single Markdown list item at the given depth of nesting."""
+    return "  " * depth + "- " + (text.replace("\n", "\n" + "  " * depth) if depth else text)
+
+
+def _md_indented(text: str, depth: int) -> str:
+    """Indents every line of an already-formatted Markdown list to the given depth of nesting."""
+    return "  " * depth + text.replace("\n", "\n" + "  " * depth)
+
+
+class MetadockFragmentCache:
+    """Cache of rendered template fragments, populated by `{% cache %}` blocks. Fragments are kept in memory, evicting
+    the least recently used fragment beyond `max_entries`, and are optionally persisted to a tier of the project's cache
+    store so that they survive between processes. The cache is safe to share between threads.
+
+    Attributes:
+        max_entries (int): Maximum number of fragments kept in memory.
+        tier (Optional[MetadockCacheTier]): Cache tier in which fragments are persisted, if any.
+        hits (int): Number of lookups which found a cached fragment, in memory or on disk.
+        misses (int): Number of lookups which found no cached fragment.
+    """
+
+    max_entries: int
+    tier: Optional[MetadockCacheTier]
+    hits: int
+    misses: int
+
+    def __init__(self, max_entries: int = 256, tier: Optional[MetadockCacheTier] = None):
+        """Instantiate an empty fragment cache.
+
+        Args:
+            max_entries (int, optional): Maximum number of fragments kept in memory. Defaults to 256.
+            tier (Optional[MetadockCacheTier], optional): Cache tier in which to persist fragments. Defaults to None
+                (fragments are only kept in memory).
+        """
+        self.max_entries = max_entries
+        self.tier = tier
+        self.hits = 0
+        self.misses = 0
+        self._fragments: OrderedDict[str, str] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        """Looks up a fragment in memory, and then on disk, recording a hit or a miss.
+
+        Args:
+            key (str): Key of the fragment.
+
+        Returns:
+            Optional[str]: The cached fragment, or None if it is not cached.
+        """
+        with self._lock:
+            fragment = self._fragments.get(key)
+            if fragment is not None:
+                self._fragments.move_to_end(key)
+                self.hits += 1
+                return fragment
+
+        persisted_fragment = self.tier.get(key) if self.tier is not None else None
+        if persisted_fragment is not None:
+            fragment = persisted_fragment.decode()
+            self._remember(key, fragment)
+            with self._lock:
+                self.hits += 1
+            return fragment
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key: str, fragment: str):
+        """Stores a fragment in memory, and on disk if the cache is persistent.
+
+        Args:
+            key (str): Key of the fragment.
+            fragment (str): The rendered fragment.
+        """
+        self._remember(key, fragment)
+        if self.tier is not None:
+            self.tier.set(key, fragment.encode())
+
+    def clear(self):
+        """Evicts every fragment from memory, and resets the hit and miss counters. Persisted fragments are kept."""
+        with self._lock:
+            self._fragments.clear()
+            self.hits = self.misses = 0
+
+    def _remember(self, key: str, fragment: str):
+        with self._lock:
+            self._fragments[key] = fragment
+            self._fragments.move_to_end(key)
+            while len(self._fragments) > self.max_entries:
+                self._fragments.popitem(last=False)
+
+
+def _fragment_key_part(value: Any) -> Any:
+    """Converts the value of a variable listed by a `{% cache %}` block into JSON, for keying fragments by value.
+
+    Args:
+        value (Any): The value of the variable.
+
+    Raises:
+        TypeError: If the value has no stable representation, e.g. an arbitrary object, whose repr may hold its
+            address.
+
+    Returns:
+        Any: A JSON serializable representation of the value. Values of different types are represented differently,
+            e.g. mapping keys are JSON encoded, so that `{1: "a"}` and `{"1": "a"}` don't share fragments.
+    """
+    if isinstance(value, jinja2.Undefined):
+        return None
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, Mapping):
+        return {
+            json.dumps(_fragment_key_part(key), sort_keys=True): _fragment_key_part(item) for key, item in value.items()
+        }
+    if isinstance(value, (list, tuple, yaml_utils.StreamedRows)):
+        return [_fragment_key_part(item) for item in value]
+    if isinstance(value, MetadockColumnarTable):
+        return {"table": _fragment_key_part(value.columns)}
+    if isinstance(value, (datetime.date, datetime.time)):
+        return {"datetime": value.isoformat()}
+    raise TypeError("Cannot key a {%% cache %%} block by a value of type %s" % type(value).__name__)
+
+
+class MetadockFragmentCacheExtension(jinja2.ext.Extension):
+    """Jinja extension adding the `{% cache name, var1, var2, ... %}...{% endcache %}` block, which renders its body
+    once and reuses the output wherever the same block is rendered again with the same variable values, e.g. a shared
+    glossary rendered by many documents. Fragments are keyed by the block's name, the source of its body and of every
+    template it loads (directly or transitively), the values of the listed variables, and the Metadock and Jinja2
+    versions, so every variable which the body reads must be listed. Listed values must be JSON-like data, or tables.
+
+    Fragments are stored in the environment's `fragment_cache`. Environments without a fragment cache render the body
+    every time, as do blocks which load templates by names computed at render time.
+    """
+
+    tags = {"cache"}
+
+    def __init__(self, environment: jinja2.Environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=None)
+        # Source digest and loaded templates of each loaded template, shared by the overlays of the environment.
+        self._template_sources: weakref.WeakKeyDictionary[jinja2.Template, tuple[str, list[str]]]
+        self._template_sources = weakref.WeakKeyDictionary()
+        self._template_sources_lock = threading.Lock()
+
+    def parse(self, parser: jinja2.parser.Parser) -> nodes.Node | list[nodes.Node]:
+        lineno = next(parser.stream).lineno
+        key_parts = [parser.parse_expression()]
+        while parser.stream.skip_if("comma"):
+            key_parts.append(parser.parse_expression())
+        body = parser.parse_statements(("name:endcache",), drop_needle=True)
+
+        # The fragment depends on the templates the body loads, which can only be known here if their names are literal.
+        loaded_templates = set(jinja2.meta.find_referenced_templates(nodes.Template(body)))
+        if None in loaded_templates:
+            return body
+
+        # Node reprs are free of line numbers, so identical blocks in different templates share their fragments.
+        body_digest = hashlib.sha256(repr(body).encode()).hexdigest()
+        args = [
+            nodes.Const(body_digest),
+            nodes.List([nodes.Const(name) for name in sorted(loaded_templates)]),
+            nodes.List(key_parts),
+        ]
+        return nodes.CallBlock(self.call_method("_cache_fragment", args), [], [], body).set_lineno(lineno)
+
+    def _cache_fragment(
+        self, body_digest: str, loaded_templates: list[str], key_parts: list[Any], caller: Callable[[], Any]
+    ) -> Any:
+        """Looks up the fragment of a `{% cache %}` block, rendering and storing its body on a miss. In async
+        environments the body renders asynchronously, so a coroutine is returned for Jinja to await."""
+        fragment_cache: Optional[MetadockFragmentCache] = self.environment.fragment_cache  # type: ignore
+        if fragment_cache is None:
+            return caller()
+
+        key_source = json.dumps(
+            [
+                metadock_version(),
+                jinja2.__version__,
+                body_digest,
+                self._templates_digests(loaded_templates),
+                [_fragment_key_part(key_part) for key_part in key_parts],
+            ],
+            sort_keys=True,
+        )
+        key = hashlib.sha256(key_source.encode()).hexdigest()
+        fragment = fragment_cache.get(key)
+        if fragment is not None:
+            return fragment
+        if self.environment.is_async:
+            return self._acache_fragment(fragment_cache, key, caller)
+
+        fragment = str(caller())
+        fragment_cache.set(key, fragment)
+        return fragment
+
+    async def _acache_fragment(self, fragment_cache: MetadockFragmentCache, key: str, caller: Callable[[], Any]) -> str:
+        fragment = str(await caller())
+        fragment_cache.set(key, fragment)
+        return fragment
+
+    def _templates_digests(self, template_names: list[str]) -> dict[str, Optional[str]]:
+        """Source digests of some templates and of every template they load via literal names, directly or
+        transitively. Templates are looked up in the environment's template cache, which reloads changed templates.
+
+        Args:
+            template_names (list[str]): Names of the templates.
+
+        Returns:
+            dict[str, Optional[str]]: Source digest of each template, keyed by name, or None if it does not exist.
+        """
+        digests: dict[str, Optional[str]] = {}
+        pending = list(template_names)
+        while pending:
+            name = pending.pop()
+            if name in digests:
+                continue
+            try:
+                template = self.environment.get_template(name)
+            except jinja2.TemplateNotFound:
+                digests[name] = None
+                continue
+            with self._template_sources_lock:
+                template_source = self._template_sources.get(template)
+            if template_source is None:
+                source, _, _ = self.environment.loader.get_source(self.environment, name)  # type: ignore
+                referenced = jinja2.meta.find_referenced_templates(self.environment.parse(source))
+                template_source = (
+                    hashlib.sha256(source.encode()).hexdigest(),
+                    [n for n in referenced if n is not None],
+                )
+                with self._template_sources_lock:
+                    self._template_sources[template] = template_source
+            digests[name], referenced_names = template_source
+            pending += referenced_names
+        return digests
+
+
 class MetadockNamespace(abc.ABC):
     """Abstract base class for Metadock namespaces, which are used to group related functions and filters.
 
@@ -63,14 +391,18 @@ class MetadockNamespace(abc.ABC):
             "namespaces": {nsname: getattr(self, nsname) for nsname in self.namespaces},
         }
 
-    def jinja_environment(self) -> jinja2.Environment:
+    def jinja_environment(self, enable_async: bool = False) -> jinja2.Environment:
         """The Jinja environment constructed from this namespace.
 
+        Args:
+            enable_async (bool, optional): Whether to construct an environment for rendering templates with
+                `render_async`. Defaults to False.
+
         Returns:
             jinja2.Environment: The Jinja environment constructed from this namespace.
         """
         env_dict = self.dict()
-        env = jinja2.Environment()
+        env = jinja2.Environment(enable_async=enable_async, extensions=[MetadockFragmentCacheExtension])
         env.globals.update(env_dict["exports"] | env_dict["namespaces"])
         env.filters.update(env_dict["filters"])
         return env
@@ -85,6 +417,7 @@ class MetadockMdNamespace(MetadockNamespace):
         code
         codeblock
         list
+        table
         tablehead
         tablerow
 
@@ -92,10 +425,11 @@ class MetadockMdNamespace(MetadockNamespace):
 
         convert
         list
+        table
     """
 
-    exports = ["blockquote", "code", "codeblock", "list", "tablehead", "tablerow"]
-    filters = ["convert", "list"]
+    exports = ["blockquote", "code", "codeblock", "list", "table", "tablehead", "tablerow"]
+    filters = ["convert", "list", "table"]
 
     def blockquote(self, content: str) -> str:
         """Produces a Markdown blockquote from the given content by prepending each line with a gt symbol ("> ").
@@ -133,28 +467,27 @@ class MetadockMdNamespace(MetadockNamespace):
         """
         return f"```{language}\n{content.strip()}\n```"
 
-    def list(self, *items: str) -> str:
+    def list(self, *items: Any) -> str:
         """Produces a Markdown list from the given content by prepending each line with a dash ("- "). If any of its
         arguments are, themselves, formatted as Markdown lists, then they are simply indented as sublists.
 
+        Structured content is also accepted, and rendered in a single pass: iterable arguments contribute their
+        elements as list items, nested iterables among those elements become sublists, and mappings contribute each of
+        their keys as an item, with the corresponding value nested beneath it.
+
         Args:
-            *items (str): The individual items and/or sub-lists which compose the list.
+            *items (Any): The individual items, sub-lists and/or mappings which compose the list.
 
         Returns:
             str: The composite Markdown list.
         """
-        _list_prefixes = ("-", "*", "+")
-
-        def _is_md_list(item: str):
-            return item.lstrip().startswith(_list_prefixes)
-
-        listed_items = [list(map(str, item)) if _is_nonstr_iter(item) else [str(item)] for item in items]
-        flat_items = list(itertools.chain.from_iterable(listed_items))
-        indented_items = [item.replace("\n", "\n  ") for item in flat_items if isinstance(item, str)]
-        return "\n".join(
-            (f"- {flat_item}" if not _is_md_list(flat_item) else f"  {indented_item}")
-            for flat_item, indented_item in zip(flat_items, indented_items)
-        )
+        top_level_items: list[Any] = []
+        for item in items:
+            if _is_nonstr_iter(item) and not isinstance(item, Mapping):
+                top_level_items.extend(item)
+            else:
+                top_level_items.append(item)
+        return "\n".join(_md_list_lines(top_level_items, 0))
 
     def tablerow(self, *cells: str) -> str:
         """Produces a Markdown table row from the given cells by joining each cell with pipes ("|") and wrapping the
@@ -166,8 +499,7 @@ class MetadockMdNamespace(MetadockNamespace):
         Returns:
             str: The Markdown table row.
         """
-        _pipe_escaped_cells = tuple(map(lambda cell: cell.replace("|", "\\|"), cells))
-        return "| " + " | ".join(_pipe_escaped_cells) + " |"
+        return "| " + " | ".join([cell.replace("|", "\\|") for cell in cells]) + " |"
 
     def tablehead(self, *header_cells: str, bold: bool = False) -> str:
         """Produces a Markdown table header from the given cells by joining each cell with pipes ("|") and wrapping the
@@ -181,11 +513,70 @@ class MetadockMdNamespace(MetadockNamespace):
         Returns:
             str: The Markdown table header row.
         """
-        _pipe_escaped_cells = tuple(map(lambda cell: cell.replace("|", "\\|"), header_cells))
+        _pipe_escaped_cells = [cell.replace("|", "\\|") for cell in header_cells]
         if bold:
-            _pipe_escaped_cells = tuple(MetadockHtmlNamespace(self.project).bold(cell) for cell in _pipe_escaped_cells)
+            _pipe_escaped_cells = [f"<b>{cell}</b>" for cell in _pipe_escaped_cells]
         return self.tablerow(*_pipe_escaped_cells) + "\n" + self.tablerow(*(["---"] * len(_pipe_escaped_cells)))
 
+    def table(
+        self,
+        rows: Iterable[Mapping[str, Any]] | Iterable[Sequence[Any]],
+        columns: Optional[Sequence[str] | Mapping[str, str]] = None,
+        bold_header: bool = False,
+        align: Optional[str | Sequence[Optional[str]] | Mapping[str, str]] = None,
+    ) -> str:
+        """Produces a complete Markdown table (header, divider and rows) from a list of records in a single pass. Cell
+        values are converted to strings, and have their pipes escaped with a backslash ("\\").
+
+        Rows may be mappings (e.g. a list of dicts loaded from yaml), in which case `columns` selects and orders the
+        keys to tabulate; it defaults to the keys of the first row. Supplying `columns` as a mapping also relabels the
+        header, from key to label. Rows may otherwise be sequences, in which case `columns` supplies the header labels;
+        it defaults to using the first row as the header. A `MetadockColumnarTable` (see the `table` namespace) is
+        tabulated like a list of mappings.
+
+        Args:
+            rows (Iterable[Mapping[str, Any]] | Iterable[Sequence[Any]]): The records to tabulate.
+            columns (Optional[Sequence[str] | Mapping[str, str]], optional): The columns to tabulate. Defaults to None.
+            bold_header (bool, optional): Whether or not to bold the header's contents. Defaults to False.
+            align (Optional[str | Sequence[Optional[str]] | Mapping[str, str]], optional): Alignment ("left", "center"
+                or "right") of every column, of each column in order, or of each column by key. Defaults to None.
+
+        Returns:
+            str: The Markdown table.
+        """
+        if isinstance(rows, MetadockColumnarTable):
+            keys = list(columns if columns is not None else rows.column_names)
+            labels = [columns[key] for key in keys] if isinstance(columns, Mapping) else keys
+            body = zip(*(rows.columns[key] for key in keys))
+        else:
+            rows = list(rows)
+            first_row = rows[0] if rows else {}
+            if isinstance(first_row, Mapping):
+                keys = list(columns if columns is not None else first_row)
+                labels = [columns[key] for key in keys] if isinstance(columns, Mapping) else keys
+                body = [[row.get(key, "") for key in keys] for row in rows]
+            else:
+                keys = labels = list(columns) if columns is not None else list(first_row)
+                body = rows if columns is not None else rows[1:]
+
+        if isinstance(align, str):
+            alignments = [align] * len(keys)
+        elif isinstance(align, Mapping):
+            alignments = [align.get(key) for key in keys]
+        else:
+            alignments = list(align or []) + [None] * (len(keys) - len(align or []))
+
+        header_cells = [str(label).replace("|", "\\|") for label in labels]
+        if bold_header:
+            header_cells = [f"<b>{cell}</b>" for cell in header_cells]
+        if not set(alignments) <= _MD_TABLE_ALIGNMENT_DIVIDERS.keys():
+            raise ValueError("Unrecognized table column alignment(s): %s" % alignments)
+        divider_cells = [_MD_TABLE_ALIGNMENT_DIVIDERS[alignment] for alignment in alignments]
+
+        lines = ["| " + " | ".join(header_cells) + " |", "| " + " | ".join(divider_cells) + " |"]
+        lines += ["| " + " | ".join([str(cell).replace("|", "\\|") for cell in row]) + " |" for row in body]
+        return "\n".join(lines)
+
     def convert_filter(self, md_content: str) -> str:
         """Filter which converts Markdown content to HTML, by invoking `marko.convert` (using github-flavored md).
 
@@ -202,15 +593,40 @@ class MetadockMdNamespace(MetadockNamespace):
         element.
 
         Args:
-            values (str | Iterable[str]): Piped input value(s) to be formatted as a Markdown list.
+            values (str | Iterable[str]): Piped input value(s) to be formatted as a Markdown list. Mappings are formatted
+                as a nested list, as in `md.list`.
 
         Returns:
             str: The Markdown list.
         """
+        if isinstance(values, Mapping):
+            return self.list(values)
         if _is_nonstr_iter(values):
             return self.list(*values)
         return self.list(str(values))
 
+    def table_filter(
+        self,
+        rows: Iterable[Mapping[str, Any]] | Iterable[Sequence[Any]],
+        columns: Optional[Sequence[str] | Mapping[str, str]] = None,
+        bold_header: bool = False,
+        align: Optional[str | Sequence[Optional[str]] | Mapping[str, str]] = None,
+    ) -> str:
+        """Filter which formats a piped list of records as a complete Markdown table. See `md.table` for the
+        formatting options.
+
+        Args:
+            rows (Iterable[Mapping[str, Any]] | Iterable[Sequence[Any]]): Piped input records to be tabulated.
+            columns (Optional[Sequence[str] | Mapping[str, str]], optional): The columns to tabulate. Defaults to None.
+            bold_header (bool, optional): Whether or not to bold the header's contents. Defaults to False.
+            align (Optional[str | Sequence[Optional[str]] | Mapping[str, str]], optional): Alignment of the columns.
+                Defaults to None.
+
+        Returns:
+            str: The Markdown table.
+        """
+        return self.table(rows, columns=columns, bold_header=bold_header, align=align)
+
 
 class MetadockHtmlNamespace(MetadockNamespace):
     """Jinja namespace which owns HTML-related functions and filters.
@@ -354,6 +770,422 @@ class MetadockHtmlNamespace(MetadockNamespace):
         return f"<{tag}{' ' + _attr_str if _attr_str else ''}>{inner}</{tag}>"
 
 
+def _sort_key(value: Any) -> tuple[int, Any]:
+    """Key for ordering and comparing tabular values, which are usually strings when loaded from yaml. Values which
+    look numeric compare numerically, and are ordered before all other values, which compare as strings.
+
+    Args:
+        value (Any): Value to produce a key for.
+
+    Returns:
+        tuple[int, Any]: The comparison key.
+    """
+    try:
+        return (0, _to_number(value))
+    except (TypeError, ValueError):
+        return (1, "" if value is None else str(value))
+
+
+def _to_number(value: Any) -> int | float:
+    """Converts a tabular value, e.g. a string loaded from yaml, to a number.
+
+    Args:
+        value (Any): Value to convert.
+
+    Raises:
+        ValueError: If the value does not represent a number.
+        TypeError: If the value is neither a number nor a string.
+
+    Returns:
+        int | float: The numeric value.
+    """
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    try:
+        return int(value)
+    except ValueError:
+        return float(value)
+
+
+def _numbers(values: Iterable[Any]) -> list[int | float]:
+    """Converts the non-empty values of a column to numbers, for numeric aggregations."""
+    return [_to_number(value) for value in values if value is not None and value != ""]
+
+
+_TABLE_AGGREGATIONS: dict[str, Callable[[list[Any]], Any]] = {
+    "count": len,
+    "sum": lambda values: sum(_numbers(values)),
+    "mean": lambda values: (sum(numbers) / len(numbers)) if (numbers := _numbers(values)) else "",
+    "min": lambda values: min(values, key=_sort_key) if values else "",
+    "max": lambda values: max(values, key=_sort_key) if values else "",
+    "first": lambda values: values[0] if values else "",
+    "last": lambda values: values[-1] if values else "",
+    "list": list,
+    "unique": lambda values: list(dict.fromkeys(values)),
+}
+
+_TABLE_COMPARISONS: dict[str, Callable[[Any, Any], bool]] = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+
+def _table_aggregation(aggregation: str | Sequence[str]) -> tuple[Callable[[list[Any]], Any], Optional[str]]:
+    """Parses an aggregation spec, which is either "count", or a pair of an aggregation name and a column name, e.g.
+    ("sum", "hours").
+
+    Args:
+        aggregation (str | Sequence[str]): The aggregation spec.
+
+    Raises:
+        ValueError: If the aggregation spec is not recognized.
+
+    Returns:
+        tuple[Callable[[list[Any]], Any], Optional[str]]: The aggregation function, and the column it aggregates (or
+            None to aggregate row counts).
+    """
+    if isinstance(aggregation, str):
+        aggregation_name, column = aggregation, None
+    else:
+        aggregation_name, column = aggregation
+    if aggregation_name not in _TABLE_AGGREGATIONS or (column is None and aggregation_name != "count"):
+        raise ValueError("Unrecognized table aggregation: %s" % (aggregation,))
+    return _TABLE_AGGREGATIONS[aggregation_name], column
+
+
+class MetadockColumnarTable:
+    """Column-oriented representation of tabular data, e.g. a list of records loaded from yaml. Each operation touches
+    only the columns it needs, and returns a new table rather than modifying this one. Iterating over a table yields
+    its rows as dictionaries, so tables can be used anywhere a list of records is expected.
+
+    Attributes:
+        columns (dict[str, list[Any]]): The values of each column, keyed by column name.
+    """
+
+    columns: dict[str, list[Any]]
+
+    def __init__(self, columns: Mapping[str, Iterable[Any]]):
+        """Instantiate a table from its columns.
+
+        Args:
+            columns (Mapping[str, Iterable[Any]]): The values of each column, keyed by column name.
+
+        Raises:
+            ValueError: If the columns have differing lengths.
+        """
+        self.columns = {name: list(values) for name, values in columns.items()}
+        if len({len(values) for values in self.columns.values()}) > 1:
+            raise ValueError("Columns of a table must all have the same length")
+
+    @classmethod
+    def from_records(
+        cls, records: Iterable[Mapping[str, Any]] | Iterable[Sequence[Any]], columns: Optional[Sequence[str]] = None
+    ) -> "MetadockColumnarTable":
+        """Converts a list of records into a table. Records may be mappings, in which case `columns` selects the keys
+        to keep (defaulting to every key, in order of first appearance, with missing values as empty strings). Records
+        may otherwise be sequences, in which case `columns` names the columns (defaulting to using the first record as
+        the header).
+
+        Args:
+            records (Iterable[Mapping[str, Any]] | Iterable[Sequence[Any]]): The records to convert.
+            columns (Optional[Sequence[str]], optional): The columns of the table. Defaults to None.
+
+        Returns:
+            MetadockColumnarTable: The table.
+        """
+        if isinstance(records, MetadockColumnarTable):
+            return records.select(*columns) if columns is not None else records
+        records = list(records)
+        if not records:
+            return cls({name: [] for name in columns or []})
+        if isinstance(records[0], Mapping):
+            names = list(columns) if columns is not None else list(dict.fromkeys(key for r in records for key in r))
+            return cls({name: [record.get(name, "") for record in records] for name in names})
+        if columns is None:
+            columns, records = records[0], records[1:]
+        return cls({name: list(values) for name, values in zip(columns, zip(*records))} if records else {})
+
+    @property
+    def column_names(self) -> list[str]:
+        """Names of the columns of the table, in order."""
+        return list(self.columns)
+
+    def __len__(self) -> int:
+        return len(next(iter(self.columns.values()), []))
+
+    def __iter__(self) -> Iterator[dict[str, Any]]:
+        names = self.column_names
+        return (dict(zip(names, row)) for row in zip(*self.columns.values()))
+
+    def __getitem__(self, column: str) -> list[Any]:
+        return self.columns[column]
+
+    def records(self) -> list[dict[str, Any]]:
+        """Converts the table back into a list of records.
+
+        Returns:
+            list[dict[str, Any]]: The rows of the table, as dictionaries.
+        """
+        return list(self)
+
+    def select(self, *columns: str) -> "MetadockColumnarTable":
+        """Selects a subset of the columns of the table, in the given order.
+
+        Args:
+            *columns (str): Names of the columns to keep.
+
+        Returns:
+            MetadockColumnarTable: The table with only the selected columns.
+        """
+        return MetadockColumnarTable({name: self.columns[name] for name in columns})
+
+    def head(self, count: int) -> "MetadockColumnarTable":
+        """Selects the first rows of the table.
+
+        Args:
+            count (int): Number of rows to keep.
+
+        Returns:
+            MetadockColumnarTable: The table with only its first `count` rows.
+        """
+        return MetadockColumnarTable({name: values[:count] for name, values in self.columns.items()})
+
+    def where(self, column: str, value: Any, op: str = "==") -> "MetadockColumnarTable":
+        """Selects the rows of the table whose value in `column` compares to `value` with `op`. Values which look
+        numeric compare numerically, so that e.g. `where("count", 10, ">")` works on values loaded from yaml.
+
+        Args:
+            column (str): Name of the column to compare.
+            value (Any): Value to compare against, or a collection of values for the "in" and "not in" operators.
+            op (str, optional): One of "==", "!=", "<", "<=", ">", ">=", "in" or "not in". Defaults to "==".
+
+        Raises:
+            ValueError: If the operator is not recognized.
+
+        Returns:
+            MetadockColumnarTable: The table with only the matching rows.
+        """
+        cell_keys = map(_sort_key, self.columns[column])
+        if op in ("in", "not in"):
+            value_keys = {_sort_key(member) for member in value}
+            mask = [(cell_key in value_keys) == (op == "in") for cell_key in cell_keys]
+        elif op in _TABLE_COMPARISONS:
+            compare, value_key = _TABLE_COMPARISONS[op], _sort_key(value)
+            mask = [compare(cell_key, value_key) for cell_key in cell_keys]
+        else:
+            raise ValueError("Unrecognized table comparison operator: %s" % op)
+        return MetadockColumnarTable(
+            {name: list(itertools.compress(values, mask)) for name, values in self.columns.items()}
+        )
+
+    def sort_by(self, *columns: str, reverse: bool = False) -> "MetadockColumnarTable":
+        """Sorts the rows of the table by the values of one or more columns. Values which look numeric are sorted
+        numerically, before all other values.
+
+        Args:
+            *columns (str): Names of the columns to sort by, in order of precedence.
+            reverse (bool, optional): Whether to sort in descending order. Defaults to False.
+
+        Returns:
+            MetadockColumnarTable: The sorted table.
+        """
+        sort_keys = list(zip(*(map(_sort_key, self.columns[column]) for column in columns)))
+        order = sorted(range(len(sort_keys)), key=sort_keys.__getitem__, reverse=reverse)
+        return MetadockColumnarTable({name: [values[i] for i in order] for name, values in self.columns.items()})
+
+    def group_by(self, *columns: str) -> "MetadockGroupedTable":
+        """Groups the rows of the table by the values of one or more columns, for aggregation.
+
+        Args:
+            *columns (str): Names of the columns to group by.
+
+        Returns:
+            MetadockGroupedTable: The grouped table.
+        """
+        return MetadockGroupedTable(self, list(columns))
+
+    def aggregate(self, **aggregations: str | Sequence[str]) -> "MetadockColumnarTable":
+        """Aggregates the whole table into a single row. See `MetadockGroupedTable.aggregate`.
+
+        Args:
+            **aggregations (str | Sequence[str]): Aggregation spec for each output column.
+
+        Returns:
+            MetadockColumnarTable: A table with one row.
+        """
+        return MetadockGroupedTable(self, []).aggregate(**aggregations)
+
+    def pivot(self, index: str, columns: str, values: str, aggregation: str = "sum") -> "MetadockColumnarTable":
+        """Pivots the table, producing one row per distinct value of `index` and one column per distinct value of
+        `columns`, whose cells aggregate the `values` of the matching rows. Cells with no matching rows are empty.
+
+        Args:
+            index (str): Name of the column whose values label the rows of the pivot table.
+            columns (str): Name of the column whose values label the columns of the pivot table.
+            values (str): Name of the column whose values are aggregated into the cells.
+            aggregation (str, optional): Name of the aggregation to apply to each cell. Defaults to "sum".
+
+        Returns:
+            MetadockColumnarTable: The pivot table.
+        """
+        aggregate, _ = _table_aggregation((aggregation, values))
+        cells: dict[tuple[Any, Any], list[Any]] = {}
+        for row_label, column_label, value in zip(self.columns[index], self.columns[columns], self.columns[values]):
+            cells.setdefault((row_label, column_label), []).append(value)
+
+        row_labels = list(dict.fromkeys(self.columns[index]))
+        column_labels = list(dict.fromkeys(self.columns[columns]))
+        pivoted: dict[str, list[Any]] = {index: row_labels}
+        for column_label in column_labels:
+            pivoted[str(column_label)] = [
+                aggregate(cells[(row_label, column_label)]) if (row_label, column_label) in cells else ""
+                for row_label in row_labels
+            ]
+        return MetadockColumnarTable(pivoted)
+
+
+class MetadockGroupedTable:
+    """A columnar table whose rows are grouped by the values of some of its columns, awaiting aggregation.
+
+    Attributes:
+        table (MetadockColumnarTable): The table which was grouped.
+        keys (list[str]): Names of the columns which the rows are grouped by.
+        groups (dict[tuple[Any, ...], list[int]]): Indices of the rows in each group, keyed by the group's values.
+    """
+
+    table: MetadockColumnarTable
+    keys: list[str]
+    groups: dict[tuple[Any, ...], list[int]]
+
+    def __init__(self, table: MetadockColumnarTable, keys: list[str]):
+        """Groups the rows of a table by the values of the given columns, in order of first appearance.
+
+        Args:
+            table (MetadockColumnarTable): The table to group.
+            keys (list[str]): Names of the columns to group by. If empty, all rows form a single group.
+        """
+        self.table = table
+        self.keys = keys
+        self.groups = {}
+        key_rows = zip(*(table.columns[key] for key in keys)) if keys else itertools.repeat((), len(table))
+        for i, group_key in enumerate(key_rows):
+            self.groups.setdefault(group_key, []).append(i)
+
+    def aggregate(self, **aggregations: str | Sequence[str]) -> MetadockColumnarTable:
+        """Aggregates each group into a single row, holding the group's values for the grouped columns followed by one
+        column per aggregation. Each aggregation is either "count", or a pair of an aggregation name and the column to
+        aggregate, e.g. `total=("sum", "hours")`. The available aggregations are count, sum, mean, min, max, first,
+        last, list and unique.
+
+        Args:
+            **aggregations (str | Sequence[str]): Aggregation spec for each output column.
+
+        Raises:
+            ValueError: If an aggregation spec is not recognized.
+
+        Returns:
+            MetadockColumnarTable: A table with one row per group.
+        """
+        aggregated: dict[str, list[Any]] = {
+            key: [group_key[i] for group_key in self.groups] for i, key in enumerate(self.keys)
+        }
+        for name, aggregation in aggregations.items():
+            aggregate, column = _table_aggregation(aggregation)
+            if column is None:
+                aggregated[name] = [aggregate(indices) for indices in self.groups.values()]
+            else:
+                values = self.table.columns[column]
+                aggregated[name] = [aggregate([values[i] for i in indices]) for indices in self.groups.values()]
+        return MetadockColumnarTable(aggregated)
+
+
+class MetadockTableNamespace(MetadockNamespace):
+    """Jinja namespace for column-oriented operations on tabular data, such as lists of records imported from yaml.
+    Records are converted into a `MetadockColumnarTable` once, which can then be filtered, sorted, grouped, aggregated
+    and pivoted, and passed straight to `md.table`.
+
+    **Macros**:
+
+        from_records
+
+    **Filters**:
+
+        columnar
+    """
+
+    exports = ["from_records"]
+    filters = ["columnar"]
+
+    _conversion_cache_size: int = 16
+
+    def __init__(self, project: Any):
+        super().__init__(project)
+        # The conversions of each render, keyed by its context, so that they are released along with the render, and
+        # one instance of the namespace can serve every project in the process.
+        self._conversions: weakref.WeakKeyDictionary[
+            jinja2.runtime.Context, OrderedDict[int, tuple[Any, MetadockColumnarTable]]
+        ] = weakref.WeakKeyDictionary()
+        self._conversions_lock = threading.Lock()
+
+    @jinja2.pass_context
+    def from_records(
+        self,
+        context: jinja2.runtime.Context,
+        records: Iterable[Mapping[str, Any]] | Iterable[Sequence[Any]],
+        columns: Optional[Sequence[str]] = None,
+    ) -> MetadockColumnarTable:
+        """Converts a list of records into a columnar table. Converting the same list of records again within a render
+        (e.g. from several places in a template) reuses the previous conversion.
+
+        Args:
+            context (jinja2.runtime.Context): Context of the render, passed by Jinja.
+            records (Iterable[Mapping[str, Any]] | Iterable[Sequence[Any]]): The records to convert.
+            columns (Optional[Sequence[str]], optional): The columns of the table. Defaults to None (all columns).
+
+        Returns:
+            MetadockColumnarTable: The columnar table.
+        """
+        if columns is not None or not isinstance(records, (list, tuple)):
+            return MetadockColumnarTable.from_records(records, columns)
+
+        with self._conversions_lock:
+            conversions = self._conversions.setdefault(context, OrderedDict())
+        # Converted records are kept alive by the cache, so their ids cannot be reused while cached.
+        cached = conversions.get(id(records))
+        if cached is not None and cached[0] is records:
+            conversions.move_to_end(id(records))
+            return cached[1]
+
+        table = MetadockColumnarTable.from_records(records)
+        conversions[id(records)] = (records, table)
+        if len(conversions) > self._conversion_cache_size:
+            conversions.popitem(last=False)
+        return table
+
+    @jinja2.pass_context
+    def columnar_filter(
+        self,
+        context: jinja2.runtime.Context,
+        records: Iterable[Mapping[str, Any]] | Iterable[Sequence[Any]],
+        columns: Optional[Sequence[str]] = None,
+    ) -> MetadockColumnarTable:
+        """Filter which converts a piped list of records into a columnar table. See `table.from_records`.
+
+        Args:
+            context (jinja2.runtime.Context): Context of the render, passed by Jinja.
+            records (Iterable[Mapping[str, Any]] | Iterable[Sequence[Any]]): Piped input records to convert.
+            columns (Optional[Sequence[str]], optional): The columns of the table. Defaults to None (all columns).
+
+        Returns:
+            MetadockColumnarTable: The columnar table.
+        """
+        return self.from_records(context, records, columns)
+
+
 class MetadockEnv(MetadockNamespace):
     """Jinja namespace for the global Metadock environment, including all global macros, filters, and namespaces.
 
@@ -366,6 +1198,7 @@ class MetadockEnv(MetadockNamespace):
 
         html
         md
+        table
 
     **Filters**:
 
@@ -380,21 +1213,37 @@ class MetadockEnv(MetadockNamespace):
     project: Any  # MetadockProject
     md: MetadockMdNamespace
     html: MetadockHtmlNamespace
+    table: MetadockTableNamespace
     exports = ["debug", "ref"]
-    namespaces = ["html", "md"]
+    namespaces = ["html", "md", "table"]
     filters = ["chain", "inline", "with_prefix", "with_suffix", "wrap", "zip"]
 
     def __init__(self, project: Any):
         super().__init__(project)
         self.md = MetadockMdNamespace(project)
         self.html = MetadockHtmlNamespace(project)
+        self.table = MetadockTableNamespace(project)
 
     def ref(self, document_name: str) -> str:
-        """Renders and inserts the content from a given generated document in a given Metadock project."""
-        gen_docs = self.project.build([document_name])
-        gen_doc = gen_docs.generated_documents[0]
-        generated_path = gen_doc.path
-        return generated_path.read_text()
+        """Renders and inserts the content from a given generated document in a given Metadock project. The document is
+        rendered in memory, in the first target format of its content schematic."""
+        return _ref(self.project, document_name)
+
+    async def aref(self, document_name: str) -> str:
+        """Coroutine version of `ref`, exported as `ref` in async environments. Renders the document in an executor."""
+        return await _aref(self.project, document_name)
+
+    def jinja_environment(self, enable_async: bool = False) -> jinja2.Environment:
+        """The Jinja environment of this namespace's project. See `project_jinja_environment`.
+
+        Args:
+            enable_async (bool, optional): Whether to construct an environment for rendering templates with
+                `render_async`. Defaults to False.
+
+        Returns:
+            jinja2.Environment: The Jinja environment of the project.
+        """
+        return project_jinja_environment(self.project, enable_async)
 
     def debug(self, message: str) -> Literal[""]:
         """Prints a debug message to stdout, and returns an empty string."""
@@ -473,3 +1322,87 @@ class MetadockEnv(MetadockNamespace):
             Iterable[tuple[Any, ...]]: The zipped iterables.
         """
         return zip(input_iterable, *iterables)
+
+
+@functools.lru_cache(maxsize=None)
+def base_jinja_environment(enable_async: bool = False) -> jinja2.Environment:
+    """The process-wide base Jinja environment, holding every macro, filter and namespace of the global Metadock
+    namespace. Project environments are overlays of it (see `MetadockEnv.jinja_environment`), so it must not be
+    modified; its project-bound exports, such as `ref`, are unbound and fail if called.
+
+    Args:
+        enable_async (bool, optional): Whether to construct an environment for rendering templates with
+            `render_async`. Defaults to False.
+
+    Returns:
+        jinja2.Environment: The shared base environment.
+    """
+    return MetadockNamespace.jinja_environment(MetadockEnv(None), enable_async)
+
+
+def project_jinja_environment(project: Any, enable_async: bool = False) -> jinja2.Environment:
+    """The Jinja environment of a Metadock project. This is a cheap overlay of the process-wide base environment, whose
+    macros, filters and namespaces are shared by every project in the process; only `ref` and the project's fragment
+    cache are bound to the project, without constructing any namespace. In async environments, `ref` is a coroutine,
+    which Jinja awaits automatically.
+
+    Args:
+        project (MetadockProject): The Metadock project whose templates are rendered in the environment.
+        enable_async (bool, optional): Whether to construct an environment for rendering templates with
+            `render_async`. Defaults to False.
+
+    Returns:
+        jinja2.Environment: The Jinja environment of the project.
+    """
+    env = base_jinja_environment(enable_async).overlay()
+    # Overlays share their globals with the base environment, so they are copied before binding `ref`.
+    env.globals = env.globals | {"ref": functools.partial(_aref if enable_async else _ref, project)}
+    env.fragment_cache = project.fragment_cache if project is not None else None  # type: ignore
+    return env
+
+
+def _ref(project: Any, document_name: str) -> str:
+    """Implementation of `ref`, rendering a document of the project in memory."""
+    compiled_targets = project.render(document_name)
+    return str(next(iter(compiled_targets.values())))
+
+
+async def _aref(project: Any, document_name: str) -> str:
+    """Implementation of `ref` in async environments, rendering a document of the project in an executor."""
+    compiled_targets = await project.arender(document_name)
+    return str(next(iter(compiled_targets.values())))
+
+
+@functools.lru_cache(maxsize=512)
+def _compiled_template_code(source: str, enable_async: bool, name: Optional[str] = None) -> CodeType:
+    """Compiles a template source with the base environment, memoizing the code for reuse across projects."""
+    return base_jinja_environment(enable_async).compile(source, name, name)
+
+
+def template_from_string(
+    environment: jinja2.Environment,
+    source: str,
+    name: Optional[str] = None,
+    globals: Optional[MutableMapping[str, Any]] = None,
+    uptodate: Optional[Callable[[], bool]] = None,
+) -> jinja2.Template:
+    """Equivalent to `environment.from_string(source)` for environments overlaid on the base environment, except that
+    the compiled code of each template source is shared by every such environment in the process, so that projects
+    with identical templates only compile them once. Loaders may also supply the template's name, globals and
+    up-to-date check, as they would to `Template.from_code`.
+
+    Args:
+        environment (jinja2.Environment): Overlay of the base environment to bind the template to.
+        source (str): Source of the template.
+        name (Optional[str], optional): Loader name of the template, used in error messages. Defaults to None.
+        globals (Optional[MutableMapping[str, Any]], optional): Globals of the template. Defaults to the globals of the
+            environment.
+        uptodate (Optional[Callable[[], bool]], optional): Function telling whether the template's source is still up
+            to date. Defaults to None.
+
+    Returns:
+        jinja2.Template: The template.
+    """
+    code = _compiled_template_code(source, environment.is_async, name)
+    template_globals = globals if globals is not None else environment.make_globals(None)
+    return environment.template_class.from_code(environment, code, template_globals, uptodate)
@@ -0,0 +1,51 @@
+import subprocess
+from pathlib import Path
+
+from metadock import exceptions
+
+
+def _run_git(directory: Path, *args: str) -> str:
+    """Runs a git command in a directory.
+
+    Args:
+        directory (Path): Directory to run the command in.
+        *args (str): Arguments of the git command.
+
+    Raises:
+        exceptions.MetadockProjectException: If git is not installed, or the command fails (e.g. because the directory
+            is not in a git repository, or a revision is unknown).
+
+    Returns:
+        str: Standard output of the command.
+    """
+    try:
+        completed = subprocess.run(["git", *args], cwd=directory, capture_output=True, text=True, check=True)
+    except FileNotFoundError:
+        raise exceptions.MetadockProjectException("Could not run git, which is required to select changed files.")
+    except subprocess.CalledProcessError as e:
+        raise exceptions.MetadockProjectException("Command `git %s` failed:\n%s" % (" ".join(args), e.stderr.strip()))
+    return completed.stdout
+
+
+def changed_paths_since(ref: str, directory: Path) -> list[Path]:
+    """Asks the git repository containing a directory which files changed since a revision: the files which differ
+    between the revision's merge base with HEAD and the working tree (including staged, unstaged and deleted files), and
+    the untracked files which are not ignored. Diffing from the merge base leaves out changes made on REF's branch
+    since HEAD branched off it, e.g. other merges to `origin/main`.
+
+    Args:
+        ref (str): The revision, e.g. `origin/main` or a commit hash.
+        directory (Path): A directory in the git repository.
+
+    Raises:
+        exceptions.MetadockProjectException: If git is not installed, the directory is not in a git repository, or the
+            revision is unknown.
+
+    Returns:
+        list[Path]: Absolute paths of the changed files, sorted.
+    """
+    toplevel = Path(_run_git(directory, "rev-parse", "--show-toplevel").strip())
+    merge_base = _run_git(directory, "merge-base", ref, "HEAD").strip()
+    changed = _run_git(toplevel, "diff", "--name-only", "--no-renames", "-z", merge_base, "--").split("\0")
+    untracked = _run_git(toplevel, "ls-files", "--others", "--exclude-standard", "-z").split("\0")
+    return sorted({toplevel / relative_path for relative_path in changed + untracked if relative_path})
@@ -0,0 +1,173 @@
+import time
+from pathlib import Path
+from typing import Callable, Optional
+
+from metadock.engine import (
+    FileSignature,
+    MetadockProject,
+    MetadockProjectBuildResult,
+    file_signature,
+    scan_directories,
+)
+
+
+class MetadockWatcher:
+    """Polls the source files of a Metadock project for changes, and rebuilds only the content schematics which are
+    affected by them. Bursts of changes (e.g. from a `git checkout`) are coalesced into a single rebuild by waiting for
+    the project files to settle before rebuilding.
+
+    Attributes:
+        project (MetadockProject): The project being watched, refreshed in place after each change.
+        schematic_globs (list[str]): Glob patterns restricting which schematics get rebuilt, by name.
+        template_globs (list[str]): Glob patterns restricting which schematics get rebuilt, by template.
+        interval (float): Number of seconds to wait between polls of the project files.
+        debounce (float): Number of seconds the project files must go unchanged before a rebuild starts.
+    """
+
+    project: MetadockProject
+    schematic_globs: list[str]
+    template_globs: list[str]
+    interval: float
+    debounce: float
+
+    def __init__(
+        self,
+        project: MetadockProject,
+        schematic_globs: list[str] = [],
+        template_globs: list[str] = [],
+        interval: float = 0.5,
+        debounce: float = 0.2,
+    ):
+        """Instantiate a watcher for a Metadock project, and take an initial snapshot of its source files.
+
+        Args:
+            project (MetadockProject): The project to watch.
+            schematic_globs (list[str], optional): Schematic name glob(s) to rebuild. Defaults to all schematics.
+            template_globs (list[str], optional): Template glob(s) to rebuild. Defaults to all schematics.
+            interval (float, optional): Seconds between polls of the project files. Defaults to 0.5.
+            debounce (float, optional): Seconds the project files must remain unchanged before rebuilding. Defaults
+                to 0.2.
+        """
+        self.project = project
+        self.schematic_globs = schematic_globs
+        self.template_globs = template_globs
+        self.interval = interval
+        self.debounce = debounce
+        self._snapshot = self._take_snapshot()
+
+    def watched_paths(self) -> set[Path]:
+        """Collects every file which the watcher monitors: all files in the content_schematics and
+        templated_documents directories, plus any imported files which live elsewhere.
+
+        Returns:
+            set[Path]: Paths of the watched files.
+        """
+        return set(self._scan_project_directories()) | self._imported_paths()
+
+    def _scan_project_directories(self) -> dict[Path, FileSignature]:
+        """Scans the content_schematics and templated_documents directories in a single pass.
+
+        Returns:
+            dict[Path, FileSignature]: Modification time (ns) and size of each file in the directories.
+        """
+        return scan_directories(self.project.content_schematics_directory, self.project.templated_documents_directory)
+
+    def _imported_paths(self) -> set[Path]:
+        """Collects the content schematics files loaded by the project, and the files imported by its constructed
+        content schematics. Schematics which were never looked up are not constructed for this, so polling keeps them
+        lazy.
+
+        Returns:
+            set[Path]: Paths of the loaded and imported files.
+        """
+        return self.project.loaded_source_paths()
+
+    def poll(self) -> set[Path]:
+        """Compares the current state of the watched files against the last snapshot, and records the new state.
+
+        Returns:
+            set[Path]: Paths of the files which were created, modified or deleted since the last poll.
+        """
+        snapshot = self._take_snapshot()
+        changed = {
+            path for path in snapshot.keys() | self._snapshot.keys() if snapshot.get(path) != self._snapshot.get(path)
+        }
+        self._snapshot = snapshot
+        return changed
+
+    def wait_for_changes(self, sleep: Callable[[float], None] = time.sleep) -> set[Path]:
+        """Blocks until some watched files change, then keeps polling until the files have settled for `debounce`
+        seconds, so that a burst of changes is returned as one set.
+
+        Args:
+            sleep (Callable[[float], None], optional): Function used to wait between polls. Defaults to time.sleep.
+
+        Returns:
+            set[Path]: Paths of all files changed during the burst.
+        """
+        changed: set[Path] = set()
+        while not changed:
+            sleep(self.interval)
+            changed = self.poll()
+
+        while True:
+            sleep(self.debounce)
+            burst = self.poll()
+            if not burst:
+                return changed
+            changed |= burst
+
+    def rebuild(self, changed_paths: set[Path]) -> MetadockProjectBuildResult:
+        """Refreshes the project and rebuilds the selected content schematics which are affected by the changed files.
+
+        Args:
+            changed_paths (set[Path]): Paths of the files which were created, modified or deleted.
+
+        Returns:
+            MetadockProjectBuildResult: The result of building the affected schematics.
+        """
+        affected = set(self.project.refresh(changed_paths))
+        if self.schematic_globs or self.template_globs:
+            affected &= set(self.project.list(self.schematic_globs, self.template_globs))
+
+        # Rebuild in project order so that output is stable between runs.
+        return self.project.build([name for name in self.project.content_schematics if name in affected])
+
+    def run(self, max_rebuilds: Optional[int] = None):
+        """Watches the project, rebuilding affected documents after each change and printing the latency of every
+        rebuild. Errors raised during a rebuild (e.g. from a template which is still being edited) are printed and do
+        not stop the watcher.
+
+        Args:
+            max_rebuilds (Optional[int], optional): Stop after this many rebuilds. Defaults to None (watch forever).
+        """
+        rebuilds = 0
+        while max_rebuilds is None or rebuilds < max_rebuilds:
+            changed_paths = self.wait_for_changes()
+            start = time.perf_counter()
+            try:
+                build_result = self.rebuild(changed_paths)
+            except Exception as e:
+                print("Rebuild failed after %d changed file(s): %s" % (len(changed_paths), e))
+            else:
+                for generated_document in build_result.generated_documents:
+                    print("Generated document (%s): \t%s" % (generated_document.status.value, generated_document.path))
+                print(
+                    "Rebuilt %d document(s) after %d changed file(s) in %.3fs"
+                    % (len(build_result.generated_documents), len(changed_paths), time.perf_counter() - start)
+                )
+            rebuilds += 1
+
+    def _take_snapshot(self) -> dict[Path, FileSignature]:
+        """Stats all watched files, scanning the project directories and only stat'ing the imported files which live
+        elsewhere individually.
+
+        Returns:
+            dict[Path, FileSignature]: Modification time (ns) and size of each watched file which currently exists.
+        """
+        snapshot = self._scan_project_directories()
+        for path in self._imported_paths() - snapshot.keys():
+            signature = file_signature(path)
+            if signature is not None:
+                snapshot[path] = signature
+        return snapshot
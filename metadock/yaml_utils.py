@@ -1,13 +1,55 @@
+import csv
+import datetime
+import json
 import operator
+import os
+import sys
+import tomllib
 from functools import reduce
 from pathlib import Path
-from typing import Any, Optional
+from typing import Any, Callable, Iterator, Optional
 
 import yaml
 
 from metadock import exceptions
 
 
+class MetadockYamlLoader(getattr(yaml, "CBaseLoader", yaml.BaseLoader)):  # type: ignore
+    """YAML loader with the all-strings semantics of `yaml.BaseLoader`, which interns mapping keys and short scalars.
+    Keys such as "name" or "description", and short values such as "true", repeat throughout large contexts; interning
+    makes every occurrence share one string object. Where PyYAML is built with libyaml, documents are parsed by its
+    much faster C parser, which produces the same node graphs as the pure Python one.
+
+    Attributes:
+        interned_scalar_length (int): Maximum length of the scalars which are interned.
+    """
+
+    interned_scalar_length: int = 64
+
+    def construct_scalar(self, node: yaml.ScalarNode) -> str:
+        value = super().construct_scalar(node)
+        return sys.intern(value) if len(value) <= self.interned_scalar_length else value
+
+
+def compact(yaml_obj: Any) -> Any:
+    """Converts a resolved yaml object to a more compact representation, in which lists become tuples. Dictionaries
+    are kept as dictionaries, with their values compacted, since templates rely on their full mapping interface (e.g.
+    `.items()` or `dictsort`). The result can still be indexed, iterated and measured like the original, but lists can
+    no longer be concatenated with lists (e.g. with `+` in a template).
+
+    Args:
+        yaml_obj (Any): Resolved yaml object to compact.
+
+    Returns:
+        Any: The compacted yaml object.
+    """
+    if isinstance(yaml_obj, dict):
+        return {key: compact(value) for key, value in yaml_obj.items()}
+    if isinstance(yaml_obj, list):
+        return tuple(compact(value) for value in yaml_obj)
+    return yaml_obj
+
+
 def flatten_merge_keys(yaml_dict: Any) -> dict:
     """Flatten the merge keys ("<<") in a nested dictionary object.
 
@@ -38,13 +80,142 @@ def flatten_merge_keys(yaml_dict: Any) -> dict:
     return flattened_yaml_dict
 
 
-def import_key(root_path: Path, relative_path: Path, key: Optional[str] = None) -> Any:
-    """Try to import an alias from the root path with the given name.
+STREAMED_SUFFIXES = (".csv", ".jsonl")
+
+# Parsers for imported files, keyed by file extension. Files with any other extension are parsed as YAML.
+IMPORT_PARSERS: dict[str, Callable[[str], Any]] = {
+    ".json": json.loads,
+    ".toml": tomllib.loads,
+}
+
+_NO_ROW = object()
+
+
+class StreamedRows:
+    """Lazy, re-iterable sequence of the rows of a line-oriented data file (.jsonl or .csv). The file is streamed from
+    disk each time the sequence is iterated, so its rows are never all held in memory at once. JSONL rows are parsed as
+    JSON values, and CSV rows as dictionaries keyed by the header row, with string values.
+
+    Attributes:
+        path (Path): Path to the data file.
+        key (Optional[str]): Dot-separated key path to project each row onto, or None to yield whole rows.
+        normalize (bool): Whether to convert every scalar in each row to a string.
+    """
+
+    path: Path
+    key: Optional[str]
+    normalize: bool
+
+    def __init__(self, path: Path, key: Optional[str] = None, normalize: bool = False):
+        """Instantiate a streamed sequence of the rows of a data file. The file is not read until iterated.
+
+        Args:
+            path (Path): Path to the .jsonl or .csv data file.
+            key (Optional[str], optional): Dot-separated key path to project each row onto. Defaults to None.
+            normalize (bool, optional): Whether to convert every scalar in each row to a string. Defaults to False.
+        """
+        self.path = path
+        self.key = key
+        self.normalize = normalize
+
+    def __iter__(self) -> Iterator[Any]:
+        with self.path.open("r", newline="") as handle:
+            if self.path.suffix.lower() == ".csv":
+                rows: Iterator[Any] = csv.DictReader(handle)
+            else:
+                rows = (json.loads(line) for line in handle if line.strip())
+            for index, row in enumerate(rows):
+                if self.key is not None:
+                    try:
+                        row = query_key_path(row, self.key)
+                    except exceptions.MetadockYamlImportError as e:
+                        raise exceptions.MetadockYamlImportError("%s in row %d of %s" % (e, index, self.path))
+                yield normalize_scalars(row) if self.normalize else row
+
+    def __len__(self) -> int:
+        with self.path.open("r", newline="") as handle:
+            if self.path.suffix.lower() == ".csv":
+                # Quoted CSV fields may span lines, so rows are counted by the CSV reader, less the header row.
+                return max(sum(1 for _ in csv.reader(handle)) - 1, 0)
+            return sum(1 for line in handle if line.strip())
+
+    def __bool__(self) -> bool:
+        return next(iter(self), _NO_ROW) is not _NO_ROW
+
+    def __repr__(self) -> str:
+        return "StreamedRows(%r, key=%r)" % (str(self.path), self.key)
+
+
+def _yaml_loads(text: str) -> Any:
+    """Parses YAML text with the MetadockYamlLoader, which loads every scalar as a string."""
+    return yaml.load(text, MetadockYamlLoader)
+
+
+def query_key_path(contents: Any, key: str) -> Any:
+    """Looks up a dot-separated key path in parsed file contents. Path segments index into mappings by key, and into
+    lists by integer position.
+
+    Args:
+        contents (Any): Parsed file contents.
+        key (str): Dot-separated key path, e.g. "services.0.name".
+
+    Raises:
+        exceptions.MetadockYamlImportError: The key path could not be resolved.
+
+    Returns:
+        Any: The value at the key path.
+    """
+    value = contents
+    for segment in key.split("."):
+        try:
+            value = value[int(segment)] if isinstance(value, list) else value[segment]
+        except (KeyError, IndexError, TypeError, ValueError):
+            raise exceptions.MetadockYamlImportError("Could not find key '%s' (at '%s')" % (key, segment))
+    return value
+
+
+def normalize_scalars(contents: Any) -> Any:
+    """Converts every scalar in parsed file contents to a string, mirroring the all-strings semantics of YAML files
+    parsed with the BaseLoader. Booleans and nulls are written as in JSON ("true", "false", "null"), and dates and times
+    in ISO format.
+
+    Args:
+        contents (Any): Parsed file contents.
+
+    Returns:
+        Any: The contents, with every scalar converted to a string.
+    """
+    if isinstance(contents, dict):
+        return {str(key): normalize_scalars(value) for key, value in contents.items()}
+    if isinstance(contents, list):
+        return [normalize_scalars(value) for value in contents]
+    if isinstance(contents, str):
+        return contents
+    if isinstance(contents, (datetime.date, datetime.time)):
+        return contents.isoformat()
+    return json.dumps(contents)
+
+
+def import_key(
+    root_path: Path,
+    relative_path: Path,
+    key: Optional[str] = None,
+    imported_paths: Optional[set[Path]] = None,
+    normalize: bool = False,
+) -> Any:
+    """Try to import an alias from the root path with the given name. Files are parsed according to their extension
+    (see `IMPORT_PARSERS`), defaulting to YAML, while line-oriented data files (.jsonl and .csv) are imported as a
+    `StreamedRows` sequence, whose rows are projected onto `key` and read lazily from disk.
 
     Args:
         root_path (Path): Absolute path to the Metadock project's content_schematics directory
         relative_path (Path): Relative path to the external file
-        key (Optional[str]): Key path to resolve, or None to return the entire file
+        key (Optional[str]): Key path to resolve (in each row, for .jsonl and .csv files), or None to return the entire
+            file
+        imported_paths (Optional[set[Path]]): If supplied, every file read while resolving the import (including nested
+            imports) is added to this set.
+        normalize (bool): Whether to convert every scalar in the imported content to a string, as YAML files are.
+            Defaults to False.
 
     Raises:
         exceptions.MetadockYamlImportError: Imported key / file could not be resolved
@@ -59,18 +230,33 @@ def import_key(root_path: Path, relative_path: Path, key: Optional[str] = None)
     if not (root_path / relative_path).is_file():
         raise exceptions.MetadockYamlImportError(f"Import path '{root_path}' is not a file")
 
-    contents: dict[str, Any] = yaml.load((root_path / relative_path).read_text(), yaml.BaseLoader)
+    if imported_paths is not None:
+        imported_paths.add(Path(os.path.normpath(root_path / relative_path)))
+
+    suffix = Path(relative_path).suffix.lower()
+    if suffix in STREAMED_SUFFIXES:
+        return StreamedRows(root_path / relative_path, key, normalize)
+
+    parse = IMPORT_PARSERS.get(suffix, _yaml_loads)
+    try:
+        contents = parse((root_path / relative_path).read_text())
+    except (ValueError, yaml.YAMLError) as e:
+        raise exceptions.MetadockYamlImportError("Could not parse import path '%s': %s" % (relative_path, e))
     if key is not None:
-        contents = reduce(lambda acc, el: acc[el], key.split("."), contents)
-    return resolve_all_imports(root_path, contents)
+        contents = query_key_path(contents, key)
+    if normalize:
+        contents = normalize_scalars(contents)
+    return resolve_all_imports(root_path, contents, imported_paths)
 
 
-def resolve_all_imports(root_path: Path, yaml_obj: Any) -> Any:
+def resolve_all_imports(root_path: Path, yaml_obj: Any, imported_paths: Optional[set[Path]] = None) -> Any:
     """Recursively resolve all imports in a yaml object.
 
     Args:
         root_path (Path): Root path to resolve the imports
         yaml_obj (Any): Yaml object with imports to resolve
+        imported_paths (Optional[set[Path]]): If supplied, every file read while resolving the imports is added to this
+            set.
 
     Raises:
         exceptions.MetadockYamlImportError: One or more import could not be resolved
@@ -79,17 +265,18 @@ def resolve_all_imports(root_path: Path, yaml_obj: Any) -> Any:
         Any: Yaml object with imports resolved
     """
     if isinstance(yaml_obj, list):
-        return [resolve_all_imports(root_path, el) for el in yaml_obj]
+        return [resolve_all_imports(root_path, el, imported_paths) for el in yaml_obj]
 
     if not isinstance(yaml_obj, dict):
         return yaml_obj  # type: ignore
 
-    if set(yaml_obj.keys()) in ({"import"}, {"import", "key"}):
-        return import_key(root_path, yaml_obj["import"], yaml_obj.get("key", None))
+    if "import" in yaml_obj and set(yaml_obj.keys()) <= {"import", "key", "normalize"}:
+        normalize = yaml_obj.get("normalize", False) in (True, "true")
+        return import_key(root_path, yaml_obj["import"], yaml_obj.get("key", None), imported_paths, normalize)
 
     resolved_subdict: dict[str, Any] = {}
 
     for key in yaml_obj.keys():
-        resolved_subdict[key] = resolve_all_imports(root_path, yaml_obj[key])
+        resolved_subdict[key] = resolve_all_imports(root_path, yaml_obj[key], imported_paths)
 
     return resolved_subdict
@@ -0,0 +1,70 @@
+import os
+import time
+
+import pytest
+
+from metadock.cache import MetadockCacheStore, MetadockCacheTier
+
+
+def test_metadock_cache_tier(tmp_path):
+    tier = MetadockCacheTier("renders", tmp_path / "renders", fan_out=True)
+    assert tier.get("abcdef") is None
+
+    tier.set("abcdef", b"content")
+    assert tier.path("abcdef") == tmp_path / "renders" / "ab" / "abcdef"
+    assert tier.get("abcdef") == b"content"
+    assert (tier.hits, tier.misses) == (1, 1)
+    assert tier.take_usage() == (1, 1)
+    assert (tier.hits, tier.misses) == (0, 0)
+
+    # Temporary files of writes in progress are not entries.
+    (tmp_path / "renders" / "ab" / ".tmp-partial").write_bytes(b"partial")
+    assert [entry.path for entry in tier.entries()] == [tier.path("abcdef")]
+
+
+def test_metadock_cache_store_prune(tmp_path):
+    store = MetadockCacheStore(tmp_path)
+    now = time.time()
+    for age, (tier_name, key) in enumerate(
+        [("fragments", "aaaa"), ("schematics", "bbbb.pickle"), ("templates", "manifest.json"), ("renders", "cccc")]
+    ):
+        store[tier_name].set(key, b"x" * 10)
+        os.utime(store[tier_name].path(key), (now - 100 * (4 - age),) * 2)
+
+    # Using an entry makes it the most recently used.
+    assert store["fragments"].get("aaaa") == b"x" * 10
+
+    # The least recently used entries are evicted first, but pinned entries are never evicted.
+    prune_result = store.prune(max_size=25)
+    assert (prune_result.evicted_entries, prune_result.evicted_size, prune_result.remaining_size) == (2, 20, 20)
+    assert store["fragments"].path("aaaa").exists()
+    assert store["templates"].path("manifest.json").exists()
+    assert not store["schematics"].path("bbbb.pickle").exists()
+    assert not (tmp_path / "renders" / "cc").exists()
+
+    assert store.prune(max_age=50).evicted_entries == 0
+    os.utime(store["fragments"].path("aaaa"), (now - 100,) * 2)
+    assert store.prune(max_age=50).evicted_entries == 1
+
+
+def test_metadock_cache_store_stats(tmp_path):
+    store = MetadockCacheStore(tmp_path)
+    store["fragments"].set("aaaa", b"fragment")
+    store["fragments"].get("aaaa")
+    store["fragments"].get("bbbb")
+    store.record_usage()
+
+    # Hits and misses accumulate over runs.
+    reopened_store = MetadockCacheStore(tmp_path)
+    reopened_store["fragments"].get("aaaa")
+    reopened_store.record_usage()
+    tier_stats = {stats.name: stats for stats in MetadockCacheStore(tmp_path).stats()}
+    assert list(tier_stats) == list(MetadockCacheStore.tier_names)
+    assert (tier_stats["fragments"].entries, tier_stats["fragments"].size) == (1, len(b"fragment"))
+    assert (tier_stats["fragments"].hits, tier_stats["fragments"].misses) == (2, 1)
+    assert tier_stats["fragments"].hit_rate == pytest.approx(2 / 3)
+    assert tier_stats["renders"].hit_rate is None
+
+    store.clear(["fragments"])
+    tier_stats = {stats.name: stats for stats in store.stats()}
+    assert (tier_stats["fragments"].entries, tier_stats["fragments"].hits) == (0, 0)
@@ -1,6 +1,17 @@
+import asyncio
+import datetime
+import functools
+import json
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+
+import jinja2
 import pytest
 
-from metadock import MetadockProject
+from metadock import MetadockProject, engine, exceptions, yaml_utils
+from metadock.engine import MetadockContentSchematicFile, file_signature
 
 
 @pytest.fixture
@@ -94,6 +105,50 @@ def test_metadock_project_templated_documents(metadock_project):
     assert len(metadock_project.templated_documents) == 3
 
 
+def test_metadock_project_file_index(metadock_project, monkeypatch):
+    (metadock_project.templated_documents_directory / "nested").mkdir()
+    (metadock_project.templated_documents_directory / "nested" / "page.md").write_text("Nested")
+    (metadock_project.templated_documents_directory / "no_suffix").write_text("Ignored")
+    assert metadock_project.file_index == {
+        path: file_signature(path)
+        for directory in (metadock_project.templated_documents_directory, metadock_project.content_schematics_directory)
+        for path in directory.glob("**/*")
+        if path.is_file()
+    }
+
+    # Templated documents are listed from the index, and only created on lookup
+    monkeypatch.setattr(Path, "glob", lambda *args: pytest.fail("Project directories were globbed"))
+    assert sorted(metadock_project.templated_documents) == [
+        "imported.md",
+        "nested/page.md",
+        "template1.md",
+        "template2.md",
+    ]
+    assert metadock_project.templated_documents._documents["nested/page.md"] is None
+    assert metadock_project.templated_documents["nested/page.md"].content() == "Nested"
+    assert len(metadock_project.content_schematics) == 6
+
+
+def test_metadock_project_file_index__symlinks(metadock_project):
+    templated_documents_directory = metadock_project.templated_documents_directory
+    (templated_documents_directory / "nested").mkdir()
+    (templated_documents_directory / "nested" / "page.md").write_text("Nested")
+    (templated_documents_directory / "nested" / "loop").symlink_to(
+        templated_documents_directory, target_is_directory=True
+    )
+    (templated_documents_directory / "self_loop.md").symlink_to(templated_documents_directory / "self_loop.md")
+    (templated_documents_directory / "linked.md").symlink_to(templated_documents_directory / "template1.md")
+
+    # Symlinked directories are not followed, and unreadable entries are skipped, like with `Path.glob`.
+    assert sorted(metadock_project.templated_documents) == [
+        "imported.md",
+        "linked.md",
+        "nested/page.md",
+        "template1.md",
+        "template2.md",
+    ]
+
+
 def test_metadock_project_content_schematics_directory(metadock_project):
     assert metadock_project.content_schematics_directory.name == "content_schematics"
 
@@ -206,3 +261,788 @@ def test_metadock_content_schematic__import_key(metadock_project):
     gen_doc2 = metadock_project.generated_documents_directory / "schematic_import2.md"
     assert gen_doc2.exists()
     assert gen_doc2.read_text() == "**Imported identity**: lib (3.0.2)"
+
+
+def test_metadock_project_affected_schematics(metadock_project):
+    content_schematics_dir = metadock_project.content_schematics_directory
+    templated_documents_dir = metadock_project.templated_documents_directory
+
+    assert metadock_project.affected_schematics([templated_documents_dir / "template1.md"]) == [
+        "schematic1a",
+        "schematic1b",
+    ]
+    assert metadock_project.affected_schematics([content_schematics_dir / "schematic2.yml"]) == [
+        "schematic2a",
+        "schematic2b",
+    ]
+    assert metadock_project.affected_schematics([content_schematics_dir / "lib2.yml"]) == ["schematic_import2"]
+    assert metadock_project.affected_schematics([content_schematics_dir / "lib.yml"]) == [
+        "schematic_import",
+        "schematic_import2",
+    ]
+    assert metadock_project.affected_schematics([content_schematics_dir / "unrelated.yml"]) == []
+
+
+def test_metadock_project_affected_schematics__ref(empty_metadock_project_dir):
+    project_dir = empty_metadock_project_dir
+    (project_dir / "templated_documents" / "leaf.md").write_text("Leaf")
+    (project_dir / "templated_documents" / "branch.md").write_text("{{ ref('leaf') }}, {{ ref(dynamic_name) }}")
+    (project_dir / "content_schematics" / "schematics.yml").write_text(
+        """
+        content_schematics:
+          - name: leaf
+            template: leaf.md
+            target_formats: [ md ]
+          - name: branch
+            template: branch.md
+            target_formats: [ md ]
+        """
+    )
+    metadock_project = MetadockProject(project_dir)
+
+    assert metadock_project.templated_documents["branch.md"].referenced_schematics(metadock_project) == {"leaf"}
+    assert metadock_project.affected_schematics([project_dir / "templated_documents" / "leaf.md"]) == [
+        "branch",
+        "leaf",
+    ]
+    assert metadock_project.dependencies("branch") == {
+        project_dir / "templated_documents" / "leaf.md",
+        project_dir / "templated_documents" / "branch.md",
+        project_dir / "content_schematics" / "schematics.yml",
+    }
+
+
+def test_metadock_project_shard(empty_metadock_project_dir):
+    project_dir = empty_metadock_project_dir
+    (project_dir / "templated_documents" / "page.md").write_text("{{ title }}")
+    (project_dir / "templated_documents" / "index.md").write_text("{{ ref('leaf-a') }}, {{ ref('leaf-b') }}")
+    (project_dir / "content_schematics" / "schematics.yml").write_text(
+        """
+        content_schematics:
+          - { name: index, template: index.md, target_formats: [ md ] }
+          - name: "leaf-{item}"
+            template: page.md
+            target_formats: [ md ]
+            for_each: [ a, b ]
+            context: { title: Leaf }
+          - name: "page-{item}"
+            template: page.md
+            target_formats: [ md ]
+            for_each: [ a, b, c, d ]
+            context: { title: Page }
+        """
+    )
+    metadock_project = MetadockProject(project_dir)
+    schematics = list(metadock_project.content_schematics)
+
+    # Documents connected by ref() stay together, and every schematic lands on exactly one shard
+    shards = [metadock_project.shard(schematics, index, 3) for index in (1, 2, 3)]
+    assert shards == [["index", "leaf-a", "leaf-b"], ["page-a", "page-c"], ["page-b", "page-d"]]
+    assert metadock_project.shard(list(reversed(schematics)), 2, 3) == shards[1]
+    # Referenced documents which aren't selected still keep their referrers together
+    assert metadock_project.shard(["index", "page-a"], 1, 2) == ["index"]
+    with pytest.raises(exceptions.MetadockProjectException):
+        metadock_project.shard(schematics, 4, 3)
+
+    manifest_paths = []
+    for index, shard in enumerate(shards, start=1):
+        build_result = metadock_project.build(shard)
+        manifest_paths.append(metadock_project.write_shard_manifest(build_result, shard, index, 3))
+    merged = metadock_project.merge_shard_manifests(manifest_paths)
+    assert merged.complete and merged.schematics == sorted(schematics)
+    assert sorted(merged.documents) == sorted(name + ".md" for name in schematics)
+    assert (metadock_project.cache_directory / "shards" / "manifest.json").exists()
+
+    with pytest.raises(exceptions.MetadockProjectException, match="Missing manifests of shards: 3/3"):
+        metadock_project.merge_shard_manifests(manifest_paths[:2])
+    with pytest.raises(exceptions.MetadockProjectException, match="more than one shard manifest"):
+        metadock_project.merge_shard_manifests(manifest_paths + manifest_paths[:1])
+    (metadock_project.generated_documents_directory / "page-a.md").write_text("Tampered")
+    with pytest.raises(exceptions.MetadockProjectException, match="page-a.md"):
+        metadock_project.merge_shard_manifests(manifest_paths)
+
+
+def test_metadock_project_render_cache(empty_metadock_project_dir, tmp_path):
+    project_dir = empty_metadock_project_dir
+    (project_dir / "templated_documents" / "leaf.md").write_text("{% include 'title.md' %}")
+    (project_dir / "templated_documents" / "title.md").write_text("{{ title }}")
+    (project_dir / "templated_documents" / "branch.md").write_text("Branch of {{ ref('leaf') }}")
+    (project_dir / "templated_documents" / "dynamic.md").write_text("{{ ref(name) }}")
+    (project_dir / "content_schematics" / "schematics.yml").write_text(
+        """
+        content_schematics:
+          - { name: leaf, template: leaf.md, target_formats: [ md, md+html ], context: { title: Leaf } }
+          - { name: branch, template: branch.md, target_formats: [ md ] }
+          - { name: dynamic, template: dynamic.md, target_formats: [ md ], context: { name: leaf } }
+        """
+    )
+    cache_dir = tmp_path / "render_cache"
+
+    def build(*schematics):
+        return MetadockProject(project_dir, render_cache_directory=cache_dir).build(list(schematics))
+
+    build_result = build("leaf", "branch", "dynamic")
+    assert (build_result.render_cache_hits, build_result.render_cache_misses) == (0, 2)
+    (project_dir / "generated_documents" / "leaf.md").unlink()
+    build_result = build("leaf", "branch", "dynamic")
+    assert (build_result.render_cache_hits, build_result.render_cache_misses) == (2, 0)
+    assert (project_dir / "generated_documents" / "leaf.md").read_text() == "Leaf"
+
+    # Changing a template loaded by a referenced document invalidates the documents which include it
+    (project_dir / "templated_documents" / "title.md").write_text("The {{ title }}")
+    build_result = build("leaf", "branch")
+    assert (build_result.render_cache_hits, build_result.render_cache_misses) == (0, 2)
+    assert (project_dir / "generated_documents" / "branch.md").read_text() == "Branch of The Leaf"
+
+    metadock_project = MetadockProject(project_dir)
+    assert metadock_project.render_digest("leaf", "md") != metadock_project.render_digest("leaf", "md+html")
+    assert metadock_project.render_digest("dynamic", "md") is None
+
+
+def test_metadock_project_cache_store(empty_metadock_project_dir):
+    project_dir = empty_metadock_project_dir
+    (project_dir / "templated_documents" / "page.md").write_text("{{ title }}")
+    (project_dir / "content_schematics" / "schematics.yml").write_text(
+        """
+        content_schematics:
+          - { name: page, template: page.md, target_formats: [ md ], context: { title: Page } }
+        """
+    )
+    metadock_project = MetadockProject(project_dir)
+    metadock_project.compile()
+    assert metadock_project.build().cache_evictions == 0
+    assert MetadockProject(project_dir).build().cache_evictions == 0
+    tier_stats = {stats.name: stats for stats in MetadockProject(project_dir).cache_stats()}
+    assert (tier_stats["schematics"].entries, tier_stats["schematics"].hits, tier_stats["schematics"].misses) == (
+        1,
+        1,
+        1,
+    )
+    assert (tier_stats["templates"].hits, tier_stats["templates"].misses) == (2, 0)
+
+    # Builds which don't write their documents neither record the cache's usage nor prune it.
+    cache_files = sorted(metadock_project.cache_directory.rglob("*"))
+    assert MetadockProject(project_dir, cache_max_size=1).build(write=False).cache_evictions == 0
+    assert sorted(metadock_project.cache_directory.rglob("*")) == cache_files
+    assert [stats.hits for stats in MetadockProject(project_dir).cache_stats()] == [
+        tier_stats[name].hits for name in tier_stats
+    ]
+
+    # Builds keep the cache within its size cap, sparing the manifest of the template bundle.
+    build_result = MetadockProject(project_dir, cache_max_size=1).build()
+    assert build_result.cache_evictions == sum(stats.entries for stats in tier_stats.values()) - 1
+    assert metadock_project.template_bundle is not None
+
+    metadock_project.clear_cache(["templates"])
+    assert metadock_project.template_bundle is None
+    assert metadock_project.render("page") == {"md": "Page"}
+    with pytest.raises(exceptions.MetadockProjectException, match="Unknown cache tier"):
+        metadock_project.clear_cache(["bogus"])
+
+
+def test_metadock_project_plan(empty_metadock_project_dir):
+    project_dir = empty_metadock_project_dir
+    (project_dir / "templated_documents" / "page.md").write_text("{{ title }}")
+    (project_dir / "templated_documents" / "other.md").write_text("Other {{ title }}")
+    (project_dir / "content_schematics" / "schematics.yml").write_text(
+        """
+        content_schematics:
+          - { name: page, template: page.md, target_formats: [ md ], context: { title: Page } }
+          - { name: other, template: other.md, target_formats: [ md ], context: { title: Page } }
+        """
+    )
+
+    def plan():
+        build_plan = MetadockProject(project_dir).plan()
+        return {document.schematic: document for document in build_plan.documents}, build_plan.changes
+
+    planned_documents, changes = plan()
+    assert changes and {document.status for document in planned_documents.values()} == {"new"}
+    assert not any(document.rendered for document in planned_documents.values())
+    assert not list((project_dir / "generated_documents").iterdir())
+
+    MetadockProject(project_dir).build()
+    planned_documents, changes = plan()
+    assert not changes and {document.status for document in planned_documents.values()} == {"skipped"}
+    assert not any(document.rendered for document in planned_documents.values())
+
+    # Changed inputs and modified documents are rendered, and explained.
+    (project_dir / "templated_documents" / "page.md").write_text("# {{ title }}")
+    (project_dir / "generated_documents" / "other.md").write_text("Tampered")
+    planned_documents, changes = plan()
+    assert changes
+    assert (planned_documents["page"].status, planned_documents["page"].changed_inputs) == (
+        "update",
+        ["template:page.md"],
+    )
+    assert (planned_documents["other"].status, planned_documents["other"].reason) == (
+        "update",
+        "the generated document was modified since the last build",
+    )
+    assert (project_dir / "generated_documents" / "other.md").read_text() == "Tampered"
+
+    # Documents found to be unchanged are rendered again by later plans, since plans don't write the build manifest.
+    MetadockProject(project_dir).build()
+    MetadockProject(project_dir).build_manifest_path.unlink()
+    for _ in range(2):
+        planned_documents, _ = plan()
+        assert {(document.status, document.rendered) for document in planned_documents.values()} == {("nochange", True)}
+    assert not MetadockProject(project_dir).build_manifest_path.exists()
+
+
+def test_metadock_project_build__input_digests(empty_metadock_project_dir, monkeypatch):
+    project_dir = empty_metadock_project_dir
+    (project_dir / "templated_documents" / "page.md").write_text("{% for row in rows %}{{ row }}{% endfor %}")
+    (project_dir / "content_schematics" / "rows.jsonl").write_text('"a"\n"b"\n')
+    (project_dir / "content_schematics" / "schematics.yml").write_text(
+        """
+        content_schematics:
+          - { name: page1, template: page.md, target_formats: [ md ], context: { rows: { import: rows.jsonl } } }
+          - { name: page2, template: page.md, target_formats: [ md ], context: { rows: { import: rows.jsonl } } }
+        """
+    )
+    digested_paths = []
+    file_digest = engine._file_digest
+    monkeypatch.setattr(engine, "_file_digest", lambda path: digested_paths.append(path.name) or file_digest(path))
+
+    # Each input file is digested once per build, and again only once it changes.
+    metadock_project = MetadockProject(project_dir, snapshot_schematics=False)
+    metadock_project.build()
+    assert sorted(digested_paths) == ["page.md", "rows.jsonl"]
+    metadock_project.build()
+    assert sorted(digested_paths) == ["page.md", "rows.jsonl"]
+    (project_dir / "content_schematics" / "rows.jsonl").write_text('"c"\n')
+    metadock_project.build()
+    assert sorted(digested_paths) == ["page.md", "rows.jsonl", "rows.jsonl"]
+
+
+def test_metadock_project_template_loader(empty_metadock_project_dir):
+    project_dir = empty_metadock_project_dir
+    templates_dir = project_dir / "templated_documents"
+    (templates_dir / "partials").mkdir()
+    (templates_dir / "partials" / "header.md").write_text("# {{ title }} ({{ ref('leaf') }})")
+    (templates_dir / "partials" / "macros.md").write_text("{% macro shout(text) %}{{ text | upper }}{% endmacro %}")
+    (templates_dir / "base.md").write_text("{% include 'partials/header.md' %}\n{% block body %}{% endblock %}")
+    (templates_dir / "page.md").write_text(
+        "{% extends 'base.md' %}{% from 'partials/macros.md' import shout %}{% block body %}{{ shout(body) }}{% endblock %}"
+    )
+    (templates_dir / "leaf.md").write_text("leaf")
+    (project_dir / "content_schematics" / "schematics.yml").write_text(
+        """
+        content_schematics:
+          - name: page
+            template: page.md
+            target_formats: [ md ]
+            context: { title: Page, body: hello }
+          - name: leaf
+            template: leaf.md
+            target_formats: [ md ]
+        """
+    )
+    metadock_project = MetadockProject(project_dir)
+
+    assert metadock_project.render("page") == {"md": "# Page (leaf)\nHELLO"}
+    assert metadock_project.templated_documents["page.md"].referenced_templates(metadock_project) == {
+        "base.md",
+        "partials/macros.md",
+    }
+    assert metadock_project.affected_schematics([templates_dir / "partials" / "header.md"]) == ["page"]
+    assert metadock_project.affected_schematics([templates_dir / "leaf.md"]) == ["leaf", "page"]
+    assert templates_dir / "partials" / "macros.md" in metadock_project.dependencies("page")
+
+    # Partials are compiled once per project, and reloaded when they change on disk
+    header = metadock_project.environment.get_template("partials/header.md")
+    assert metadock_project.environment.get_template("partials/header.md") is header
+    (templates_dir / "partials" / "header.md").write_text("## {{ title }}")
+    os.utime(templates_dir / "partials" / "header.md", (0, 0))
+    assert metadock_project.render("page") == {"md": "## Page\nHELLO"}
+
+
+def test_metadock_project_for_each(empty_metadock_project_dir):
+    project_dir = empty_metadock_project_dir
+    (project_dir / "templated_documents" / "service.md").write_text("{{ service.name }} ({{ owner }})")
+    (project_dir / "templated_documents" / "team.md").write_text("{{ item }} of {{ teams | length }}")
+    (project_dir / "content_schematics" / "catalog.yml").write_text(
+        """
+        services:
+          - { name: api, tier: 1 }
+          - { name: web, tier: 2 }
+        """
+    )
+    (project_dir / "content_schematics" / "schematics.yml").write_text(
+        """
+        content_schematics:
+          - name: "service-{name}"
+            template: service.md
+            target_formats: [ md ]
+            for_each: { import: catalog.yml, key: services }
+            as: service
+            context:
+              owner: platform
+
+          - name: "team-{index}-{item}"
+            template: team.md
+            target_formats: [ md ]
+            for_each: org.teams
+            context:
+              teams: &teams [ red, blue ]
+              org: { teams: *teams }
+        """
+    )
+    metadock_project = MetadockProject(project_dir)
+
+    assert list(metadock_project.content_schematics) == ["service-api", "service-web", "team-0-red", "team-1-blue"]
+    assert metadock_project.render("service-web") == {"md": "web (platform)"}
+    assert metadock_project.render("team-1-blue") == {"md": "blue of 2"}
+    assert metadock_project.affected_schematics([project_dir / "content_schematics" / "catalog.yml"]) == [
+        "service-api",
+        "service-web",
+    ]
+
+    (project_dir / "content_schematics" / "schematics.yml").write_text(
+        """
+        content_schematics:
+          - name: "service-{missing}"
+            template: service.md
+            target_formats: [ md ]
+            for_each: [ a, b ]
+        """
+    )
+    with pytest.raises(exceptions.MetadockContentSchematicParsingException):
+        MetadockProject(project_dir).content_schematics
+
+    (project_dir / "content_schematics" / "schematics.yml").write_text(
+        """
+        content_schematics:
+          - { name: "item-{index}", template: service.md, target_formats: [ md ], for_each: [ a ], context: [ b ] }
+        """
+    )
+    with pytest.raises(exceptions.MetadockContentSchematicParsingException, match="to be a mapping, but found list"):
+        MetadockProject(project_dir).content_schematics
+
+    # Key paths can't refer to inherited context, since schematics are fanned out before inheritance is resolved.
+    (project_dir / "content_schematics" / "schematics.yml").write_text(
+        """
+        content_schematics:
+          - { name: parent, template: service.md, target_formats: [ md ], context: { names: [ a, b ] } }
+          - { name: "child-{index}", extends: parent, for_each: names }
+        """
+    )
+    with pytest.raises(exceptions.MetadockContentSchematicParsingException, match="schematic's own context"):
+        MetadockProject(project_dir).content_schematics
+
+
+def test_metadock_project_extends(empty_metadock_project_dir):
+    project_dir = empty_metadock_project_dir
+    (project_dir / "templated_documents" / "page.md").write_text("{{ title }} by {{ identity.name }} {{ version }}")
+    (project_dir / "content_schematics" / "lib.yml").write_text("identity: { name: lib, sem_version: 3.0.1 }")
+    (project_dir / "content_schematics" / "base.yml").write_text(
+        """
+        content_schematics:
+          - name: base
+            template: page.md
+            target_formats: [ md ]
+            context:
+              <<: [ { import: lib.yml } ]
+              title: Base
+              version: "1"
+        """
+    )
+    (project_dir / "content_schematics" / "children.yml").write_text(
+        """
+        content_schematics:
+          - name: child
+            extends: base
+            context: { title: Child }
+          - name: grandchild
+            extends: child
+            target_formats: [ md, html ]
+            context: { version: "2" }
+        """
+    )
+    metadock_project = MetadockProject(project_dir)
+
+    child, grandchild = metadock_project.content_schematics["child"], metadock_project.content_schematics["grandchild"]
+    assert metadock_project.render("child") == {"md": "Child by lib 1"}
+    assert grandchild.target_formats == ["md", "html"]
+    assert metadock_project.render("grandchild", "md") == {"md": "Child by lib 2"}
+    assert grandchild.context["identity"] is metadock_project.content_schematics["base"].context["identity"]
+    assert metadock_project.affected_schematics([project_dir / "content_schematics" / "base.yml"]) == [
+        "base",
+        "child",
+        "grandchild",
+    ]
+    assert metadock_project.affected_schematics([project_dir / "content_schematics" / "lib.yml"]) == [
+        "base",
+        "child",
+        "grandchild",
+    ]
+
+    (project_dir / "content_schematics" / "children.yml").write_text(
+        """
+        content_schematics:
+          - { name: loop1, extends: loop2 }
+          - { name: loop2, extends: loop1 }
+        """
+    )
+    with pytest.raises(exceptions.MetadockContentSchematicParsingException, match="loop1 -> loop2 -> loop1"):
+        MetadockProject(project_dir).content_schematics
+
+    (project_dir / "content_schematics" / "children.yml").write_text(
+        "content_schematics: [ { name: orphan, extends: missing } ]"
+    )
+    with pytest.raises(exceptions.MetadockContentSchematicParsingException, match="unknown"):
+        MetadockProject(project_dir).content_schematics
+
+
+def test_metadock_project_lazy_content_schematics(empty_metadock_project_dir):
+    project_dir = empty_metadock_project_dir
+    (project_dir / "templated_documents" / "page.md").write_text("{{ title }}")
+    (project_dir / "content_schematics" / "pages.yml").write_text(
+        """
+        content_schematics:
+          - { name: good, template: page.md, target_formats: [ md ], context: { title: Good } }
+          - { name: broken, template: page.md, target_formats: [ md ], context: { import: missing.yml } }
+        """
+    )
+    metadock_project = MetadockProject(project_dir)
+    schematic_files = metadock_project._content_schematic_files
+
+    # Indexing the schematics resolves no contexts, so the broken import only fails once it is looked up
+    assert list(metadock_project.content_schematics) == ["good", "broken"]
+    assert metadock_project.render("good") == {"md": "Good"}
+    # Files are only snapshotted once every schematic in them is constructed
+    metadock_project.build(["good"])
+    assert not list((metadock_project.cache_directory / "schematics").glob("*.json"))
+    with pytest.raises(exceptions.MetadockYamlImportError):
+        metadock_project.content_schematics["broken"]
+
+    (project_dir / "content_schematics" / "missing.yml").write_text("title: Fixed")
+    assert metadock_project.render("broken") == {"md": "Fixed"}
+    assert not list((metadock_project.cache_directory / "schematics").glob("*.json"))
+    metadock_project.build()
+    assert len(list((metadock_project.cache_directory / "schematics").glob("*.json"))) == 1
+    assert not any(schematic_file.pending for schematic_file in schematic_files.values())
+
+    (project_dir / "content_schematics" / "pages.yml").write_text(
+        "content_schematics: [ { name: incomplete, template: page.md } ]"
+    )
+    with pytest.raises(exceptions.MetadockContentSchematicParsingException, match="target_formats"):
+        MetadockProject(project_dir).content_schematics
+
+
+@pytest.mark.parametrize("executor_type", [ThreadPoolExecutor, ProcessPoolExecutor])
+def test_metadock_project_executor(metadock_project, executor_type):
+    content_schematics = dict(metadock_project.content_schematics)
+    with executor_type(max_workers=2) as executor:
+        for snapshot_schematics in (False, True):
+            project = MetadockProject(metadock_project.directory, snapshot_schematics, executor=executor)
+            assert list(project.content_schematics) == list(metadock_project.content_schematics)
+            # Workers send back resolved schematics rather than YAML node graphs.
+            assert not any(schematic_file.pending for schematic_file in project._content_schematic_files.values())
+            assert dict(project.content_schematics) == content_schematics
+            assert project.build(write=False) == metadock_project.build(write=False)
+
+        # Errors don't depend on the order in which the files were parsed
+        content_schematics_dir = metadock_project.content_schematics_directory
+        (content_schematics_dir / "broken_a.yml").write_text("content_schematics: [ { name: a } ]")
+        (content_schematics_dir / "broken_b.yml").write_text("content_schematics: [ { name: b } ]")
+        for _ in range(3):
+            with pytest.raises(exceptions.MetadockContentSchematicParsingException, match="broken_a.yml"):
+                MetadockProject(metadock_project.directory, executor=executor).content_schematics
+
+        (content_schematics_dir / "broken_a.yml").write_text((content_schematics_dir / "schematic1.yml").read_text())
+        (content_schematics_dir / "broken_b.yml").unlink()
+        with pytest.raises(exceptions.MetadockContentSchematicParsingException, match="non-unique 'name' key"):
+            MetadockProject(metadock_project.directory, executor=executor).content_schematics
+
+
+def test_metadock_project_schematics_snapshot(metadock_project, monkeypatch):
+    content_schematics = dict(metadock_project.content_schematics)
+    # Loading the schematics writes no snapshot, but building does
+    assert not (metadock_project.cache_directory / "schematics").exists()
+    metadock_project.build()
+    snapshots = list((metadock_project.cache_directory / "schematics").glob("*.json"))
+    assert len(snapshots) == 5
+
+    # Unchanged files are loaded from their snapshots, without being parsed
+    parsed_files = []
+    compose = MetadockContentSchematicFile.compose
+    monkeypatch.setattr(
+        MetadockContentSchematicFile,
+        "compose",
+        lambda yaml_path, compact=False: parsed_files.append(yaml_path.name) or compose(yaml_path, compact),
+    )
+    assert MetadockProject(metadock_project.directory).content_schematics == content_schematics
+    assert parsed_files == []
+
+    # Files whose imports changed are parsed again
+    (metadock_project.content_schematics_directory / "lib2.yml").write_text("name: lib\nsem_version: 4.0.0")
+    reloaded_project = MetadockProject(metadock_project.directory)
+    reloaded = dict(reloaded_project.content_schematics)
+    reloaded_project.build()
+    assert set(parsed_files) == {"imported.yml", "lib2.yml"}
+    assert reloaded["schematic_import2"].context["sem_version"] == "4.0.0"
+
+    parsed_files.clear()
+    assert MetadockProject(metadock_project.directory, snapshot_schematics=False).content_schematics
+    assert len(parsed_files) == 5
+
+    # Files whose signatures are unchanged are not digested to validate their snapshots
+    digested_files = []
+    file_digest = engine._file_digest
+    monkeypatch.setattr(engine, "_file_digest", lambda path: digested_files.append(path.name) or file_digest(path))
+    parsed_files.clear()
+    assert MetadockProject(metadock_project.directory).content_schematics == reloaded
+    assert parsed_files == [] and digested_files == []
+
+    # Touched files are digested, and their snapshots are still used if their content is unchanged
+    for path in metadock_project.content_schematics_directory.iterdir():
+        os.utime(path, ns=(0, 0))
+    assert MetadockProject(metadock_project.directory).content_schematics == reloaded
+    assert parsed_files == [] and "lib2.yml" in digested_files
+
+    # Snapshots are plain JSON, so a poisoned cache can't run code, and is parsed over
+    for snapshot in snapshots:
+        snapshot.write_bytes(pickle.dumps(_PoisonedSnapshot()))
+    assert MetadockProject(metadock_project.directory).content_schematics == reloaded
+    assert len(parsed_files) == 5
+    assert not _PoisonedSnapshot.unpickled
+
+
+def test_metadock_project_schematics_snapshot__in_memory(metadock_project):
+    # Rendering in memory, or building without writing, leaves the .cache directory untouched
+    cache_files = _tree_signatures(metadock_project.cache_directory)
+    assert metadock_project.render("schematic_import") == metadock_project.render("schematic_import")
+    metadock_project.build(write=False)
+    asyncio.run(metadock_project.abuild(write=False))
+    assert _tree_signatures(metadock_project.cache_directory) == cache_files
+
+    # The schematics loaded along the way are snapshotted by the next build which writes
+    metadock_project.build(["schematic1a"])
+    assert len(list((metadock_project.cache_directory / "schematics").glob("*.json"))) == 5
+
+
+def _tree_signatures(directory: Path) -> "dict[Path, tuple[int, int]]":
+    return {path: file_signature(path) or (0, 0) for path in directory.rglob("*")}
+
+
+def test_metadock_project_schematics_snapshot__encoding(tmp_path):
+    context = {
+        "items": [1, "a", None, {"$snapshot": "literal"}],
+        "date": datetime.date(2024, 1, 2),
+        "rows": yaml_utils.StreamedRows(tmp_path / "rows.csv", "name", normalize=True),
+    }
+    encoded = json.dumps(engine._snapshot_encode(context))
+    object_hook = functools.partial(engine._snapshot_object_hook, directory=tmp_path)
+    decoded = json.loads(encoded, object_hook=object_hook)
+    assert decoded["items"] == context["items"] and decoded["date"] == context["date"]
+    assert (decoded["rows"].path, decoded["rows"].key, decoded["rows"].normalize) == (
+        tmp_path / "rows.csv",
+        "name",
+        True,
+    )
+
+    # Snapshots can't stream data files from outside of the project
+    outside_rows = yaml_utils.StreamedRows(tmp_path / ".." / "secrets.csv")
+    with pytest.raises(ValueError, match="outside of the project"):
+        json.loads(json.dumps(engine._snapshot_encode(outside_rows)), object_hook=object_hook)
+
+    # JSON would silently turn non-string keys into strings
+    with pytest.raises(TypeError, match="non-string keys"):
+        engine._snapshot_encode({1: "one"})
+
+
+class _PoisonedSnapshot:
+    unpickled = False
+
+    def __reduce__(self):
+        return setattr, (_PoisonedSnapshot, "unpickled", True)
+
+
+def test_metadock_project_memory_report(metadock_project):
+    memory_report = metadock_project.memory_report()
+    assert memory_report.contexts == len(metadock_project.content_schematics)
+    assert memory_report.containers > 0 and memory_report.strings > 0
+    assert memory_report.strings == memory_report.distinct_strings
+    assert memory_report.total_bytes == memory_report.container_bytes + memory_report.string_bytes
+
+    (metadock_project.content_schematics_directory / "listed.yml").write_text(
+        "content_schematics:\n"
+        "  - { name: listed, template: template1.md, target_formats: [ md ], context: { items: [ a, b ] } }"
+    )
+    compact_project = MetadockProject(metadock_project.directory, compact_contexts=True)
+    assert compact_project.content_schematics["listed"].context == {"items": ("a", "b")}
+    assert compact_project.content_schematics["schematic1b"] == metadock_project.content_schematics["schematic1b"]
+
+
+def test_metadock_project_refresh(metadock_project):
+    project_dir = metadock_project.directory
+    schematic1a = metadock_project.content_schematics["schematic1a"]
+    schematic_import = metadock_project.content_schematics["schematic_import"]
+    assert metadock_project.refresh() == []
+
+    # Modifying an imported file reloads only the schematics files which import it
+    (project_dir / "content_schematics" / "lib2.yml").write_text("name: lib\nsem_version: 4.0.0\nfix_version: x\n")
+    os.utime(project_dir / "content_schematics" / "lib2.yml", ns=(0, 0))
+    assert metadock_project.refresh() == ["schematic_import2"]
+    assert metadock_project.content_schematics["schematic_import2"].context["sem_version"] == "4.0.0"
+    assert metadock_project.content_schematics["schematic1a"] is schematic1a
+    # Schematics which were constructed before the change, and don't import the changed file, are kept
+    assert metadock_project.content_schematics["schematic_import"] is schematic_import
+
+    # New schematics files and templates are discovered, and deleted ones are dropped
+    (project_dir / "templated_documents" / "template3.md").write_text("Third")
+    (project_dir / "content_schematics" / "schematic3.yml").write_text(
+        "content_schematics:\n  - { name: schematic3, template: template3.md, target_formats: [ md ] }"
+    )
+    (project_dir / "content_schematics" / "schematic2.yml").unlink()
+    assert metadock_project.refresh() == ["schematic3"]
+    assert "schematic3" in metadock_project.content_schematics
+    assert "schematic2a" not in metadock_project.content_schematics
+    assert metadock_project.content_schematics["schematic1a"] is schematic1a
+    assert metadock_project.build(["schematic3"]).generated_documents[0].path.read_text() == "Third"
+
+    # Explicit paths restrict which files are re-stat'ed
+    (project_dir / "templated_documents" / "template1.md").write_text("Changed plaintext document.")
+    os.utime(project_dir / "templated_documents" / "template1.md", ns=(0, 0))
+    assert metadock_project.refresh(paths=[project_dir / "templated_documents" / "template2.md"]) == []
+    assert metadock_project.refresh(paths=[project_dir / "templated_documents" / "template1.md"]) == [
+        "schematic1a",
+        "schematic1b",
+    ]
+
+
+def test_metadock_project_render(metadock_project):
+    project_files = _tree_signatures(metadock_project.directory)
+    assert metadock_project.render("schematic2b") == {"md": "This is a test."}
+    assert metadock_project.render("schematic2b", target_format="md+html") == {"md+html": "<p>This is a test.</p>\n"}
+    assert list(metadock_project.generated_documents_directory.glob("*")) == []
+    # Nothing is written anywhere in the project, including its .cache directory
+    assert _tree_signatures(metadock_project.directory) == project_files
+
+    with pytest.raises(exceptions.MetadockProjectException):
+        metadock_project.render("missing_schematic")
+
+
+def test_metadock_project_build__no_write(metadock_project):
+    project_files = _tree_signatures(metadock_project.directory)
+    build_result = metadock_project.build(["schematic1a", "schematic2b"], write=False)
+    assert [gd.status for gd in build_result.generated_documents] == ["new", "new"]
+    assert list(metadock_project.generated_documents_directory.glob("*")) == []
+    assert _tree_signatures(metadock_project.directory) == project_files
+
+    metadock_project.build(["schematic1a"])
+    project_files = _tree_signatures(metadock_project.directory)
+    build_result = metadock_project.build(["schematic1a", "schematic2b"], write=False)
+    assert [gd.status for gd in build_result.generated_documents] == ["nochange", "new"]
+    assert len(list(metadock_project.generated_documents_directory.glob("*"))) == 1
+    assert _tree_signatures(metadock_project.directory) == project_files
+
+
+def test_metadock_project_arender(metadock_project, monkeypatch):
+    assert asyncio.run(metadock_project.arender("schematic2b")) == {"md": "This is a test."}
+    assert list(metadock_project.generated_documents_directory.glob("*")) == []
+
+    # Concurrent renders on a fresh project index it once, before rendering.
+    project = MetadockProject(metadock_project.directory)
+    load_content_schematic_files = project._load_content_schematic_files
+    loaded_paths = []
+    monkeypatch.setattr(
+        project,
+        "_load_content_schematic_files",
+        lambda yaml_paths: loaded_paths.extend(yaml_paths) or load_content_schematic_files(yaml_paths),
+    )
+
+    async def _render_concurrently():
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            names = ["schematic1a", "schematic1b", "schematic2b", "schematic_import"]
+            return await asyncio.gather(*(project.arender(name, executor=executor) for name in names))
+
+    assert [targets["md"] for targets in asyncio.run(_render_concurrently())] == [
+        "Simple plaintext document.",
+        "Simple plaintext document.",
+        "This is a test.",
+        "**Imported identity**: lib (3.0.1)",
+    ]
+    assert len(loaded_paths) == len(set(loaded_paths)) == 5
+
+
+def test_metadock_project_abuild(metadock_project):
+    build_result = asyncio.run(metadock_project.abuild(["schematic1a", "schematic2b"]))
+    assert [gd.status for gd in build_result.generated_documents] == ["new", "new"]
+    assert (metadock_project.generated_documents_directory / "schematic2b.md").read_text() == "This is a test."
+
+    build_result = asyncio.run(metadock_project.abuild())
+    assert len(build_result.generated_documents) == 6
+    assert sorted(gd.status for gd in build_result.generated_documents).count("nochange") == 2
+
+
+def test_metadock_project_abuild__cancel(metadock_project):
+    async def _build_and_cancel():
+        build_task = asyncio.create_task(metadock_project.abuild())
+        await asyncio.sleep(0)
+        build_task.cancel()
+        await build_task
+
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(_build_and_cancel())
+    # The build was cancelled before writing anything, even partially.
+    assert list(metadock_project.generated_documents_directory.iterdir()) == []
+
+    # A build cancelled while writing a document finishes writing it, and writes nothing after it.
+    write_generated_document = metadock_project._write_generated_document
+
+    async def _cancel_while_writing():
+        build_task = asyncio.create_task(metadock_project.abuild(["schematic1a", "schematic2b"]))
+        loop = asyncio.get_running_loop()
+
+        def _write_and_cancel(generated_filepath, content):
+            loop.call_soon_threadsafe(build_task.cancel)
+            write_generated_document(generated_filepath, content)
+
+        metadock_project._write_generated_document = _write_and_cancel
+        await build_task
+
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(_cancel_while_writing())
+    generated_documents_directory = metadock_project.generated_documents_directory
+    assert list(generated_documents_directory.iterdir()) == [generated_documents_directory / "schematic1a.md"]
+    assert (generated_documents_directory / "schematic1a.md").read_text() == "Simple plaintext document."
+
+
+def test_metadock_project_async_environment__ref(metadock_project):
+    template = metadock_project.async_environment.from_string("Referenced: {{ ref('schematic2b') }}")
+    assert asyncio.run(template.render_async()) == "Referenced: This is a test."
+
+
+def test_metadock_project_compile(metadock_project):
+    (metadock_project.templated_documents_directory / "helpers.md").write_text("{{ md.code('x') }}")
+    templated_doc_2 = metadock_project.templated_documents["template2.md"]
+    assert metadock_project.template_bundle is None
+    assert templated_doc_2.jinja_template(metadock_project).filename == "template2.md"
+
+    metadock_project.refresh()
+    assert metadock_project.compile() == ["helpers.md", "imported.md", "template1.md", "template2.md"]
+    assert (metadock_project.cache_directory / "templates" / "manifest.json").exists()
+    bundle_directory = str(metadock_project.cache_directory / "templates")
+    assert templated_doc_2.jinja_template(metadock_project).filename.startswith(bundle_directory)
+    assert metadock_project.templated_documents["helpers.md"].jinja_template(metadock_project).render() == "`x`"
+    assert metadock_project.render("schematic2b") == {"md": "This is a test."}
+    # Modules are run from memory, without writing bytecode to the cache
+    assert not list((metadock_project.cache_directory / "templates").rglob("__pycache__"))
+
+    # Modules which don't match the digests they were compiled with are never run
+    module_path = metadock_project.cache_directory / "templates" / jinja2.ModuleLoader.get_module_filename("helpers.md")
+    module_path.write_text(module_path.read_text() + "\nraise RuntimeError('tampered')\n")
+    metadock_project._clear_template_caches()
+    assert metadock_project.templated_documents["helpers.md"].jinja_template(metadock_project).filename == "helpers.md"
+
+    # Stale precompiled templates are ignored in favor of the template source
+    (metadock_project.templated_documents_directory / "template2.md").write_text("{{ var1 }} was {{ var2 }}.")
+    assert templated_doc_2.jinja_template(metadock_project).filename == "template2.md"
+    assert metadock_project.render("schematic2b") == {"md": "This was a test."}
+
+    (metadock_project.templated_documents_directory / "template1.md").write_text("{% if %}")
+    with pytest.raises(exceptions.MetadockTemplateParsingException):
+        metadock_project.compile()
@@ -1,3 +1,8 @@
+import asyncio
+import gc
+import shutil
+
+import jinja2
 import pytest
 
 from metadock.engine import MetadockProject
@@ -100,6 +105,72 @@ def test_env__table_helpers(empty_metadock_project_dir):
     )
 
 
+def test_env__table(empty_metadock_project_dir):
+    project_dir = empty_metadock_project_dir
+    (project_dir / "templated_documents" / "records.md").write_text("{{ md.table(rows, bold_header=bold_header) }}")
+    (project_dir / "templated_documents" / "selected.md").write_text(
+        """{{ rows | md.table(columns={"contact": "Contact", "name": "Name"}, align={"name": "right"}) }}"""
+    )
+    (project_dir / "templated_documents" / "lists.md").write_text(
+        """{{ md.table([["Name", "Contact"]] + (rows | map(attribute="name") | zip(rows | map(attribute="contact")) | list), align=["center"]) }}
+{{ md.table([["x|y", "z"]], columns=["A", "B"], align="left") }}"""
+    )
+    (project_dir / "content_schematics" / "schematic1.yml").write_text(
+        """
+        .table_rows: &table_rows
+          - name: John Doe
+            contact: john.doe@company.com
+            last_contact: 2021-01-01
+          - name: Josh Doe
+            contact: josh.doe@company.com
+
+        content_schematics:
+          - name: records
+            template: records.md
+            target_formats: [ md ]
+            context:
+              bold_header: true
+              rows: *table_rows
+
+          - name: selected
+            template: selected.md
+            target_formats: [ md ]
+            context:
+              rows: *table_rows
+
+          - name: lists
+            template: lists.md
+            target_formats: [ md ]
+            context:
+              rows: *table_rows
+        """
+    )
+
+    metadock = MetadockProject(project_dir)
+
+    assert metadock.render("records")["md"] == (
+        "| <b>name</b> | <b>contact</b> | <b>last_contact</b> |\n"
+        "| --- | --- | --- |\n"
+        "| John Doe | john.doe@company.com | 2021-01-01 |\n"
+        "| Josh Doe | josh.doe@company.com |  |"
+    )
+    assert metadock.render("selected")["md"] == (
+        "| Contact | Name |\n"
+        "| --- | ---: |\n"
+        "| john.doe@company.com | John Doe |\n"
+        "| josh.doe@company.com | Josh Doe |"
+    )
+    assert metadock.render("lists")["md"] == (
+        "| Name | Contact |\n"
+        "| :---: | --- |\n"
+        "| John Doe | john.doe@company.com |\n"
+        "| Josh Doe | josh.doe@company.com |\n"
+        "| A | B |\n"
+        "| :--- | :--- |\n"
+        "| x\\|y | z |"
+    )
+
+
 def test_env__blockquote(empty_metadock_project_dir):
     project_dir = empty_metadock_project_dir
     (project_dir / "templated_documents" / "template1.md").write_text(
@@ -299,6 +370,44 @@ Their prices are:
     )
 
 
+def test_env__list_structured(empty_metadock_project_dir):
+    project_dir = empty_metadock_project_dir
+    (project_dir / "templated_documents" / "nav.md").write_text("{{ md.list(nav) }}\n\n{{ nav | md.list }}")
+    (project_dir / "content_schematics" / "schematic1.yml").write_text(
+        """
+        content_schematics:
+          - name: nav
+            template: nav.md
+            target_formats: [ md ]
+            context:
+              nav:
+                Guides:
+                  - Introduction
+                  - [ Overview, Glossary ]
+                  - Setup:
+                      - Installation
+                      - Configuration
+                Reference: API
+                Changelog:
+        """
+    )
+
+    metadock = MetadockProject(project_dir)
+    nav_list = (
+        "- Guides\n"
+        "  - Introduction\n"
+        "    - Overview\n"
+        "    - Glossary\n"
+        "  - Setup\n"
+        "    - Installation\n"
+        "    - Configuration\n"
+        "- Reference\n"
+        "  - API\n"
+        "- Changelog"
+    )
+    assert metadock.render("nav")["md"] == nav_list + "\n\n" + nav_list
+
+
 def test_env__html_biu(empty_metadock_project_dir):
     project_dir = empty_metadock_project_dir
     (project_dir / "templated_documents" / "simple.md").write_text(
@@ -508,3 +617,209 @@ Context name = David"""
     Context name = David
 Context name = Nothing."""
     )
+
+
+def test_env__table_namespace(empty_metadock_project_dir):
+    project_dir = empty_metadock_project_dir
+    (project_dir / "templated_documents" / "report.md").write_text(
+        """{% set hours = table.from_records(entries) -%}
+{{ md.table(hours.where("hours", 2, ">=").sort_by("hours", reverse=true).select("who", "hours")) }}
+
+{{ md.table(hours.group_by("team").aggregate(people=("unique", "who"), total=("sum", "hours"), entries="count")) }}
+
+{{ md.table(hours.pivot("who", "day", "hours")) }}
+
+{{ (entries | table.columnar).aggregate(mean=("mean", "hours"), most=("max", "hours"))["mean"][0] }}"""
+    )
+    (project_dir / "content_schematics" / "schematic1.yml").write_text(
+        """
+        content_schematics:
+          - name: report
+            template: report.md
+            target_formats: [ md ]
+            context:
+              entries:
+                - { who: ann, team: core, day: mon, hours: 3 }
+                - { who: bob, team: docs, day: mon, hours: 1 }
+                - { who: ann, team: core, day: tue, hours: 10 }
+                - { who: cat, team: core, day: tue, hours: 2 }
+        """
+    )
+
+    metadock = MetadockProject(project_dir)
+    assert metadock.render("report")["md"] == (
+        "| who | hours |\n| --- | --- |\n| ann | 10 |\n| ann | 3 |\n| cat | 2 |\n\n"
+        "| team | people | total | entries |\n| --- | --- | --- | --- |\n"
+        "| core | ['ann', 'cat'] | 15 | 3 |\n| docs | ['bob'] | 1 | 1 |\n\n"
+        "| who | mon | tue |\n| --- | --- | --- |\n| ann | 3 | 10 |\n| bob | 1 |  |\n| cat |  | 2 |\n\n"
+        "4.0"
+    )
+
+
+def test_env__columnar_table():
+    from metadock.env import MetadockColumnarTable, MetadockTableNamespace
+
+    table = MetadockColumnarTable.from_records([["name", "size"], ["a", "9"], ["b", "10"], ["c", "x"]])
+    assert table.column_names == ["name", "size"]
+    assert len(table) == 3
+    assert table.records()[0] == {"name": "a", "size": "9"}
+    assert table.sort_by("size")["name"] == ["a", "b", "c"]
+    assert table.where("size", ["9", 10], "in")["name"] == ["a", "b"]
+    assert table.where("name", "b", "!=").head(1)["name"] == ["a"]
+    assert MetadockColumnarTable.from_records([{"a": 1}, {"b": 2}]).columns == {"a": [1, ""], "b": ["", 2]}
+    assert len(MetadockColumnarTable.from_records([])) == 0
+
+    with pytest.raises(ValueError):
+        table.where("size", 1, "~")
+    with pytest.raises(ValueError):
+        table.aggregate(total="sum")
+    with pytest.raises(ValueError):
+        MetadockColumnarTable({"a": [1], "b": []})
+
+    # Conversions are reused within a render, and released along with it.
+    namespace = MetadockTableNamespace(None)
+    records = [{"a": 1}]
+    context, other_context = (jinja2.Template("").new_context() for _ in range(2))
+    assert namespace.from_records(context, records) is namespace.from_records(context, records)
+    assert namespace.from_records(context, list(records)) is not namespace.from_records(context, records)
+    assert namespace.from_records(other_context, records) is not namespace.from_records(context, records)
+    del context, other_context
+    gc.collect()
+    assert len(namespace._conversions) == 0
+
+
+def test_env__shared_base_environment(empty_metadock_project_dir, tmp_path, monkeypatch):
+    from metadock.env import MetadockNamespace, _compiled_template_code, base_jinja_environment
+
+    project_dir = empty_metadock_project_dir
+    (project_dir / "templated_documents" / "template1.md").write_text("{{ md.code(ref('other')) }}")
+    (project_dir / "templated_documents" / "other.md").write_text("{{ name }}")
+    (project_dir / "content_schematics" / "schematic1.yml").write_text(
+        """
+        content_schematics:
+          - name: example1
+            template: template1.md
+            target_formats: [ md ]
+          - name: other
+            template: other.md
+            target_formats: [ md ]
+            context:
+              name: first
+        """
+    )
+    other_dir = tmp_path / "other_project"
+    shutil.copytree(project_dir, other_dir)
+    (other_dir / "content_schematics" / "schematic1.yml").write_text(
+        (project_dir / "content_schematics" / "schematic1.yml").read_text().replace("first", "second")
+    )
+
+    # Projects construct no namespaces of their own; they only bind `ref` to themselves
+    base_environment = base_jinja_environment(False)
+    monkeypatch.setattr(MetadockNamespace, "__init__", lambda self, project: pytest.fail("namespace constructed"))
+    first, second = MetadockProject(project_dir), MetadockProject(other_dir)
+    assert first.environment is not second.environment
+    assert first.environment.globals["md"] is second.environment.globals["md"]
+    assert first.environment.globals["table"] is second.environment.globals["table"]
+    assert first.environment.filters is base_environment.filters
+    assert first.environment.globals["ref"].args == (first,)
+    assert base_environment.globals["ref"].__self__.project is None
+
+    assert first.render("example1")["md"] == "`first`"
+    hits = _compiled_template_code.cache_info().hits
+    assert second.render("example1")["md"] == "`second`"
+    assert _compiled_template_code.cache_info().hits == hits + 2
+
+
+def test_env__cache_fragment(empty_metadock_project_dir):
+    project_dir = empty_metadock_project_dir
+    (project_dir / "templated_documents" / "page.md").write_text(
+        """# {{ title }}
+{% cache "glossary", terms %}{{ terms | md.list }}{% endcache %}"""
+    )
+    (project_dir / "content_schematics" / "schematic1.yml").write_text(
+        """
+        content_schematics:
+          - name: page1
+            template: page.md
+            target_formats: [ md ]
+            context: { title: One, terms: [ a, b ] }
+          - name: page2
+            template: page.md
+            target_formats: [ md ]
+            context: { title: Two, terms: [ a, b ] }
+          - name: page3
+            template: page.md
+            target_formats: [ md ]
+            context: { title: Three, terms: [ c ] }
+        """
+    )
+
+    metadock = MetadockProject(project_dir, persist_fragments=True)
+    build_result = metadock.build()
+    assert (build_result.fragment_cache_hits, build_result.fragment_cache_misses) == (1, 2)
+    assert (project_dir / "generated_documents" / "page2.md").read_text() == "# Two\n- a\n- b"
+    assert (project_dir / "generated_documents" / "page3.md").read_text() == "# Three\n- c"
+
+    # Persisted fragments are reused by new projects, and by async renders.
+    fresh = MetadockProject(project_dir, persist_fragments=True)
+    build_result = fresh.build(["page1", "page3"])
+    assert (build_result.fragment_cache_hits, build_result.fragment_cache_misses) == (2, 0)
+    template = fresh.async_environment.from_string((project_dir / "templated_documents" / "page.md").read_text())
+    assert asyncio.run(template.render_async(title="Four", terms=["c"])) == "# Four\n- c"
+    assert asyncio.run(template.render_async(title="Five", terms=["d"])) == "# Five\n- d"
+    assert (fresh.fragment_cache.hits, fresh.fragment_cache.misses) == (3, 1)
+
+    # Without persistence, fragments are only shared within a project.
+    assert MetadockProject(project_dir).build(["page1"]).fragment_cache_misses == 1
+
+
+def test_env__cache_fragment__loaded_templates(empty_metadock_project_dir):
+    from metadock.env import MetadockColumnarTable
+
+    project_dir = empty_metadock_project_dir
+    (project_dir / "templated_documents" / "partials").mkdir()
+    (project_dir / "templated_documents" / "partials" / "terms.md").write_text("OLD {{ terms | join(',') }}")
+    (project_dir / "templated_documents" / "partials" / "glossary.md").write_text("{% include 'partials/terms.md' %}")
+    (project_dir / "templated_documents" / "page.md").write_text(
+        """{% cache "glossary", terms %}{% include "partials/glossary.md" %}{% endcache %}"""
+    )
+    (project_dir / "templated_documents" / "dynamic.md").write_text(
+        """{% cache "dynamic", terms %}{% include partial %}{% endcache %}"""
+    )
+    (project_dir / "templated_documents" / "object_key.md").write_text(
+        """{% cache "object", terms %}{{ terms | length }}{% endcache %}"""
+    )
+    (project_dir / "content_schematics" / "schematic1.yml").write_text(
+        """
+        content_schematics:
+          - name: page
+            template: page.md
+            target_formats: [ md ]
+            context: { terms: [ a, b ] }
+          - name: dynamic
+            template: dynamic.md
+            target_formats: [ md ]
+            context: { terms: [ a, b ], partial: partials/terms.md }
+        """
+    )
+
+    assert MetadockProject(project_dir, persist_fragments=True).render("page")["md"] == "OLD a,b"
+
+    # Changes to templates loaded by the block, directly or transitively, are new fragments.
+    (project_dir / "templated_documents" / "partials" / "terms.md").write_text("NEW {{ terms | join(',') }}")
+    metadock = MetadockProject(project_dir, persist_fragments=True)
+    assert metadock.render("page")["md"] == "NEW a,b"
+    assert metadock.render("page")["md"] == "NEW a,b"
+    assert (metadock.fragment_cache.hits, metadock.fragment_cache.misses) == (1, 1)
+
+    # Blocks which load templates by computed names are not cached.
+    assert metadock.render("dynamic")["md"] == "NEW a,b"
+    assert (metadock.fragment_cache.hits, metadock.fragment_cache.misses) == (1, 1)
+
+    # Keys must have a stable representation: equal tables share fragments, arbitrary objects are rejected.
+    template = metadock.environment.get_template("object_key.md")
+    from_records = MetadockColumnarTable.from_records
+    assert template.render(terms=from_records([{"a": 1}])) == template.render(terms=from_records([{"a": 1}])) == "1"
+    assert (metadock.fragment_cache.hits, metadock.fragment_cache.misses) == (2, 2)
+    with pytest.raises(TypeError, match="Cannot key a {% cache %} block by a value of type object"):
+        template.render(terms=object())
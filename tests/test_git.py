@@ -0,0 +1,73 @@
+import shutil
+import subprocess
+
+import pytest
+
+from metadock import Metadock, exceptions, git
+
+pytestmark = pytest.mark.skipif(shutil.which("git") is None, reason="git is not installed")
+
+
+def _git(directory, *args):
+    subprocess.run(
+        ["git", "-c", "user.name=metadock", "-c", "user.email=metadock@example.com", *args],
+        cwd=directory,
+        check=True,
+        capture_output=True,
+    )
+
+
+@pytest.fixture
+def git_project_dir(empty_metadock_project_dir):
+    project_dir = empty_metadock_project_dir
+    (project_dir / "templated_documents" / "page.md").write_text("{{ title }}")
+    (project_dir / "templated_documents" / "other.md").write_text("Other {{ title }}")
+    (project_dir / "templated_documents" / "index.md").write_text("Index of {{ ref('page') }}")
+    (project_dir / "content_schematics" / "titles.yml").write_text("title: Page")
+    (project_dir / "content_schematics" / "schematics.yml").write_text(
+        """
+        content_schematics:
+          - { name: page, template: page.md, target_formats: [ md ], context: { import: titles.yml } }
+          - { name: other, template: other.md, target_formats: [ md ], context: { title: Other } }
+          - { name: index, template: index.md, target_formats: [ md ] }
+        """
+    )
+    (project_dir.parent / ".gitignore").write_text(".metadock/.cache/\n")
+    _git(project_dir.parent, "init", "-q")
+    _git(project_dir.parent, "add", ".")
+    _git(project_dir.parent, "commit", "-q", "-m", "Initial commit")
+    return project_dir
+
+
+def test_git_changed_paths_since(git_project_dir):
+    repository_dir = git_project_dir.parent.resolve()
+    assert git.changed_paths_since("HEAD", git_project_dir) == []
+
+    (git_project_dir / "templated_documents" / "page.md").write_text("# {{ title }}")
+    (git_project_dir / "templated_documents" / "new.md").write_text("New")
+    (git_project_dir / ".cache").mkdir()
+    (git_project_dir / ".cache" / "ignored").write_text("Ignored")
+    assert git.changed_paths_since("HEAD", git_project_dir) == [
+        repository_dir / ".metadock" / "templated_documents" / "new.md",
+        repository_dir / ".metadock" / "templated_documents" / "page.md",
+    ]
+
+    # Committed changes are still changes since an earlier revision.
+    _git(repository_dir, "add", ".")
+    _git(repository_dir, "commit", "-q", "-m", "Change page")
+    assert len(git.changed_paths_since("HEAD~1", git_project_dir)) == 2
+
+    with pytest.raises(exceptions.MetadockProjectException, match="merge-base"):
+        git.changed_paths_since("unknown-ref", git_project_dir)
+
+
+def test_metadock_list_since(git_project_dir):
+    metadock = Metadock(git_project_dir.parent)
+    assert metadock.list(since="HEAD") == []
+
+    # Changes propagate through imports and ref() calls.
+    (git_project_dir / "content_schematics" / "titles.yml").write_text("title: Changed")
+    assert sorted(metadock.list(since="HEAD")) == ["index", "page"]
+    assert metadock.list(schematic_globs=["p*"], since="HEAD") == ["page"]
+    build_result = metadock.build(since="HEAD")
+    assert sorted(document.path.name for document in build_result.generated_documents) == ["index.md", "page.md"]
@@ -0,0 +1,108 @@
+import os
+
+import pytest
+
+from metadock.engine import MetadockProject
+from metadock.watch import MetadockWatcher
+
+
+@pytest.fixture
+def metadock_watcher(empty_metadock_project_dir):
+    project_dir = empty_metadock_project_dir
+    (project_dir / "templated_documents" / "greeting.md").write_text("Hello, {{ name }}!")
+    (project_dir / "templated_documents" / "farewell.md").write_text("Goodbye, {{ name }}!")
+    (project_dir / "content_schematics" / "people.yml").write_text("name: David")
+    (project_dir / "content_schematics" / "schematics.yml").write_text(
+        """
+        content_schematics:
+          - name: greeting
+            template: greeting.md
+            target_formats: [ md ]
+            context: { import: people.yml }
+          - name: farewell
+            template: farewell.md
+            target_formats: [ md ]
+            context:
+              name: Nobody
+        """
+    )
+    project = MetadockProject(project_dir)
+    project.build()
+    return MetadockWatcher(project, interval=0, debounce=0)
+
+
+def _touch(path, content):
+    path.write_text(content)
+    # Guarantee a distinct signature on filesystems with coarse mtime resolution.
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_watch__poll(metadock_watcher):
+    project_dir = metadock_watcher.project.directory
+    assert metadock_watcher.poll() == set()
+
+    _touch(project_dir / "templated_documents" / "greeting.md", "Hi, {{ name }}!")
+    assert metadock_watcher.poll() == {project_dir / "templated_documents" / "greeting.md"}
+    assert metadock_watcher.poll() == set()
+
+    (project_dir / "templated_documents" / "farewell.md").unlink()
+    assert metadock_watcher.poll() == {project_dir / "templated_documents" / "farewell.md"}
+
+
+def test_watch__poll_keeps_schematics_lazy(metadock_watcher, tmp_path):
+    project_dir = metadock_watcher.project.directory
+    (tmp_path / "people.yml").write_text("name: Outsider")
+    _touch(project_dir / "content_schematics" / "people.yml", "import: %s" % (tmp_path / "people.yml"))
+    project = MetadockProject(project_dir, snapshot_schematics=False)
+    assert list(project.content_schematics) == ["greeting", "farewell"]
+    watcher = MetadockWatcher(project, interval=0, debounce=0)
+
+    # Polling constructs no schematic, so the files they import are only watched once they are constructed
+    assert watcher.poll() == set()
+    assert project._content_schematic_files[project_dir / "content_schematics" / "schematics.yml"].pending
+    assert tmp_path / "people.yml" not in watcher.watched_paths()
+
+    assert project.render("greeting") == {"md": "Hello, Outsider!"}
+    assert tmp_path / "people.yml" in watcher.watched_paths()
+    watcher.poll()
+    _touch(tmp_path / "people.yml", "name: Insider")
+    assert watcher.poll() == {tmp_path / "people.yml"}
+
+
+def test_watch__wait_for_changes_coalesces_bursts(metadock_watcher):
+    project_dir = metadock_watcher.project.directory
+    pending_edits = [
+        lambda: None,
+        lambda: _touch(project_dir / "templated_documents" / "greeting.md", "Hi, {{ name }}!"),
+        lambda: _touch(project_dir / "templated_documents" / "farewell.md", "Bye, {{ name }}!"),
+        lambda: None,
+    ]
+
+    def _sleep(_):
+        pending_edits.pop(0)()
+
+    assert metadock_watcher.wait_for_changes(sleep=_sleep) == {
+        project_dir / "templated_documents" / "greeting.md",
+        project_dir / "templated_documents" / "farewell.md",
+    }
+    assert pending_edits == []
+
+
+def test_watch__rebuild_affected(metadock_watcher):
+    project_dir = metadock_watcher.project.directory
+
+    _touch(project_dir / "content_schematics" / "people.yml", "name: Dave")
+    build_result = metadock_watcher.rebuild(metadock_watcher.poll())
+
+    assert [gd.path.name for gd in build_result.generated_documents] == ["greeting.md"]
+    assert (project_dir / "generated_documents" / "greeting.md").read_text() == "Hello, Dave!"
+
+    metadock_watcher.template_globs = ["farewell.md"]
+    _touch(project_dir / "templated_documents" / "greeting.md", "Hi, {{ name }}!")
+    _touch(project_dir / "templated_documents" / "farewell.md", "Bye, {{ name }}!")
+    build_result = metadock_watcher.rebuild(metadock_watcher.poll())
+
+    assert [gd.path.name for gd in build_result.generated_documents] == ["farewell.md"]
+    assert (project_dir / "generated_documents" / "farewell.md").read_text() == "Bye, Nobody!"
+    assert (project_dir / "generated_documents" / "greeting.md").read_text() == "Hello, Dave!"
@@ -4,7 +4,7 @@ from pathlib import Path
 import pytest
 import yaml
 
-from metadock import yaml_utils
+from metadock import exceptions, yaml_utils
 
 
 @pytest.mark.parametrize(
@@ -111,3 +111,68 @@ def test_yaml_utils__resolve_all_imports(tmp_path):
     assert yaml_utils.resolve_all_imports(tmp_path, test_2_contents) == {
         "test": {"et_cetera": {"first_value": "David", "second_value": "Excelsior"}}
     }
+
+
+def test_yaml_utils__import_key__streamed(tmp_path):
+    (tmp_path / "rows.jsonl").write_text(
+        '{"sku": "a1", "stock": {"count": 3}}\n\n{"sku": "b2", "stock": {"count": 0}}\n'
+    )
+    (tmp_path / "rows.csv").write_text('sku,note\na1,"multi\nline"\nb2,plain\n')
+    (tmp_path / "data.json").write_text('{"inventory": {"import": "rows.jsonl", "key": "sku"}}')
+
+    imported_paths: set[Path] = set()
+    rows = yaml_utils.import_key(tmp_path, Path("rows.jsonl"), imported_paths=imported_paths)
+    assert isinstance(rows, yaml_utils.StreamedRows)
+    assert imported_paths == {tmp_path / "rows.jsonl"}
+    assert list(rows) == list(rows) == [{"sku": "a1", "stock": {"count": 3}}, {"sku": "b2", "stock": {"count": 0}}]
+    assert len(rows) == 2 and rows
+
+    assert list(yaml_utils.import_key(tmp_path, Path("rows.jsonl"), "stock.count")) == [3, 0]
+    csv_rows = yaml_utils.import_key(tmp_path, Path("rows.csv"))
+    assert list(csv_rows) == [{"sku": "a1", "note": "multi\nline"}, {"sku": "b2", "note": "plain"}]
+    assert len(csv_rows) == 2
+    assert list(yaml_utils.import_key(tmp_path, Path("data.json"), "inventory")) == ["a1", "b2"]
+
+    with pytest.raises(exceptions.MetadockYamlImportError):
+        list(yaml_utils.import_key(tmp_path, Path("rows.csv"), "missing"))
+
+    (tmp_path / "empty.csv").write_text("")
+    assert not yaml_utils.import_key(tmp_path, Path("empty.csv"))
+
+
+def test_yaml_utils__import_key__json_toml(tmp_path):
+    (tmp_path / "misc.yml").write_text("first_value: David")
+    (tmp_path / "data.json").write_text(
+        '{"services": [{"name": "api", "port": 8080, "public": true, "owner": null}], "misc": {"import": "misc.yml"}}'
+    )
+    (tmp_path / "data.toml").write_text('[release]\nversion = "3.0.1"\ndate = 2023-04-11\nbuild = 42\n')
+
+    imported_paths: set[Path] = set()
+    assert yaml_utils.import_key(tmp_path, Path("data.json"), "services.0.port") == 8080
+    assert yaml_utils.import_key(tmp_path, Path("data.json"), "misc", imported_paths) == {"first_value": "David"}
+    assert imported_paths == {tmp_path / "data.json", tmp_path / "misc.yml"}
+    assert yaml_utils.resolve_all_imports(
+        tmp_path, {"import": "data.json", "key": "services", "normalize": "true"}
+    ) == [{"name": "api", "port": "8080", "public": "true", "owner": "null"}]
+    assert yaml_utils.import_key(tmp_path, Path("data.toml"), "release", normalize=True) == {
+        "version": "3.0.1",
+        "date": "2023-04-11",
+        "build": "42",
+    }
+
+    with pytest.raises(exceptions.MetadockYamlImportError):
+        yaml_utils.import_key(tmp_path, Path("data.json"), "services.1")
+    (tmp_path / "broken.json").write_text("{")
+    with pytest.raises(exceptions.MetadockYamlImportError):
+        yaml_utils.import_key(tmp_path, Path("broken.json"))
+
+
+def test_yaml_utils__yaml_loader():
+    yaml_contents = yaml.load("- {name: a, description: %s}\n- {name: b}" % ("x" * 100), yaml_utils.MetadockYamlLoader)
+    assert yaml_contents == [{"name": "a", "description": "x" * 100}, {"name": "b"}]
+    first_key, second_key = next(iter(yaml_contents[0])), next(iter(yaml_contents[1]))
+    assert first_key is second_key
+    assert yaml_contents[0]["description"] is not yaml.load("x: %s" % ("x" * 100), yaml_utils.MetadockYamlLoader)["x"]
+
+    compacted = yaml_utils.compact({"items": [{"tags": ["a", "b"]}], "count": "2"})
+    assert compacted == {"items": ({"tags": ("a", "b")},), "count": "2"}